@@ -1,60 +1,196 @@
-from fastapi import HTTPException
+import hashlib
+import threading
+import time
+from collections import Counter
 
+import anyio
+import jwt
+from cachetools import TLRUCache
+from fastapi import Depends, Header, HTTPException, Request
+
+from . import config
 from .config import supabase
+from .metrics import SUPABASE_LATENCY
+from .tracing import start_span
 
+# Algoritmos que Supabase usa para firmar los access tokens
+ALLOWED_ALGORITHMS = {"HS256", "RS256", "ES256"}
 
-# Funcion para verificar si el usuario esta autenticado
-# devuelve el ide del usuario si esta autenticado
-def is_authenticated(authorization):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="No autorizado")
 
-    # Extraer token (quitar "Bearer ")
-    token = authorization.replace("Bearer ", "")
+def _token_ttu(_key, claims, now):
+    # La entrada expira con el token o con AUTH_CACHE_TTL, lo que ocurra primero
+    expires_at = now + config.AUTH_CACHE_TTL
+    if claims.get("exp"):
+        expires_at = min(expires_at, claims["exp"])
+    return expires_at
 
-    try:
-        user = supabase.auth.get_user(token)
-        return user.user.id
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Token inválido")
 
-def is_admin(authorization: str):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="No autorizado")
+# Claims verificados por sha256 del token (acotado por tamaño y por TTL)
+_token_cache = TLRUCache(maxsize=config.AUTH_CACHE_SIZE, ttu=_token_ttu, timer=time.time)
+_token_cache_lock = threading.Lock()
 
-    token = authorization.replace("Bearer ", "")
+# Contadores de instrumentacion: permiten comprobar que cada request
+# resuelve la identidad una sola vez
+auth_counters = Counter()
 
-    try:
-        user = supabase.auth.get_user(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Token inválido")
+# Limita los hilos usados por las llamadas bloqueantes de supabase/JWKS
+_auth_limiter = None
+
+_jwks_client = (
+    jwt.PyJWKClient(config.SUPABASE_JWKS_URL, lifespan=config.SUPABASE_JWKS_CACHE_TTL)
+    if config.SUPABASE_JWKS_URL
+    else None
+)
+
+
+def _verify_locally(token):
+    """
+    Verifica firma, expiracion y audiencia sin salir del proceso.
+    Devuelve None si no hay clave local para este token (se usa el fallback
+    por red) y lanza jwt.InvalidTokenError si el token es invalido.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm not in ALLOWED_ALGORITHMS:
+        raise jwt.InvalidAlgorithmError(f"Algoritmo no permitido: {algorithm}")
 
-    role_response = (
-        supabase
-        .table('roles')
-        .select('role')
-        .eq('id', user.user.id)
-        .execute()
+    if algorithm == "HS256":
+        if not config.SUPABASE_JWT_SECRET:
+            return None
+        key = config.SUPABASE_JWT_SECRET
+    else:
+        if _jwks_client is None:
+            return None
+        try:
+            key = _jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError:
+            return None
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=config.SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
     )
+    return {"id": claims["sub"], "email": claims.get("email"), "exp": claims["exp"]}
+
+
+def _fetch_remote_claims(token):
+    # Fallback: Supabase Auth valida el token por red
+    auth_counters["remote_lookup"] += 1
+    with start_span("supabase auth get_user", "CLIENT", remote_service="supabase"), \
+            SUPABASE_LATENCY.labels("auth", "get_user").time():
+        user = supabase.auth.get_user(token).user
+    exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    return {"id": user.id, "email": user.email, "exp": exp}
+
+
+def _resolve_claims(token):
+    claims = _verify_locally(token)
+    if claims is None:
+        claims = _fetch_remote_claims(token)
+    return claims
 
-    # 🔹 NO tiene registro en roles
-    if not role_response.data:
-        return "user"
 
-    # 🔹 Tiene rol
-    if role_response.data[0]['role'] == 'admin':
-        return "admin"
+async def run_blocking(func, *args):
+    """
+    Ejecuta una llamada bloqueante (cliente sync de supabase) en el pool de
+    hilos acotado por AUTH_THREADPOOL_SIZE para no frenar el event loop.
+    """
+    global _auth_limiter
+    if _auth_limiter is None:
+        _auth_limiter = anyio.CapacityLimiter(config.AUTH_THREADPOOL_SIZE)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_auth_limiter)
 
-    raise HTTPException(status_code=403, detail="Acceso denegado")
 
-def get_email(authorization: str):
+async def _get_claims(authorization):
     if not authorization:
         raise HTTPException(status_code=401, detail="No autorizado")
 
+    # Extraer token (quitar "Bearer ")
     token = authorization.replace("Bearer ", "")
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+
+    with _token_cache_lock:
+        claims = _token_cache.get(cache_key)
+    if claims is not None:
+        return claims
 
+    auth_counters["token_verified"] += 1
     try:
-        user = supabase.auth.get_user(token)
-        return user.user.email
+        claims = await run_blocking(_resolve_claims, token)
     except Exception:
-        raise HTTPException(status_code=401, detail="no se obtuvo el email desde la base de datos")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    with _token_cache_lock:
+        _token_cache[cache_key] = claims
+    return claims
+
+
+def _fetch_role(user_id):
+    with start_span("supabase select roles", "CLIENT", remote_service="supabase"), \
+            SUPABASE_LATENCY.labels("roles", "select").time():
+        return (
+            supabase
+            .table('roles')
+            .select('role')
+            .eq('id', user_id)
+            .execute()
+        )
+
+
+class Principal:
+    """
+    Usuario que hace la peticion. Se resuelve una sola vez por request y
+    lo comparten todos los routers a traves de las dependencias de abajo.
+    """
+
+    def __init__(self, id, email, role=None):
+        self.id = id
+        self.email = email
+        self.role = role
+
+
+async def resolve_principal(authorization):
+    claims = await _get_claims(authorization)
+    auth_counters["principal_resolved"] += 1
+    return Principal(claims["id"], claims.get("email"))
+
+
+async def resolve_role(principal):
+    if principal.role is None:
+        auth_counters["role_lookup"] += 1
+        role_response = await run_blocking(_fetch_role, principal.id)
+
+        # 🔹 NO tiene registro en roles
+        if not role_response.data:
+            principal.role = "user"
+        # 🔹 Tiene rol
+        elif role_response.data[0]['role'] == 'admin':
+            principal.role = "admin"
+        else:
+            raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    return principal.role
+
+
+# Dependencia: usuario autenticado (sin consultar roles)
+async def get_principal(request: Request, authorization: str = Header(None)):
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        principal = await resolve_principal(authorization)
+        request.state.principal = principal
+    return principal
+
+
+# Dependencia: usuario autenticado con su rol ("user" | "admin")
+async def get_principal_with_role(principal: Principal = Depends(get_principal)):
+    await resolve_role(principal)
+    return principal
+
+
+# Dependencia: solo admin
+async def require_admin(principal: Principal = Depends(get_principal_with_role)):
+    if principal.role != "admin":
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+    return principal
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from . import config
+from .invalidation import InvalidationLog
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(route, params):
+    """
+    Clave canonica: nombre de la ruta + query params ordenados, sin None.
+    Asi ?page=1&keyword=x y ?keyword=x&page=1 comparten entrada.
+    """
+    items = sorted((name, str(value)) for name, value in params.items() if value is not None)
+    return f"{route}?{urlencode(items)}"
+
+
+class CacheEntry:
+    def __init__(self, body, ttl, tags):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.ttl = ttl
+        self.tags = set(tags)
+        self.stored_at = time.monotonic()
+
+    @property
+    def age(self):
+        return time.monotonic() - self.stored_at
+
+
+class ResponseCache:
+    """
+    Cache LRU en memoria de respuestas JSON del gateway.
+
+    - Acotado por bytes y por numero de entradas.
+    - ETag fuerte (sha256 del cuerpo) y 304 con If-None-Match.
+    - stale-while-revalidate: pasado el TTL se sirve la copia vieja durante
+      `stale_ttl` segundos mientras se refresca en segundo plano.
+    - Invalidacion por etiquetas (ej. "search", "product:12"). Con `sync`
+      (InvalidationLog) las purgas llegan tambien a los demas workers.
+    """
+
+    def __init__(self, max_bytes, max_entries, stale_ttl, sync=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.sync = sync
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refreshing = {}
+        # Cambia en cada purga: una descarga iniciada antes de purgar no se guarda
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, body, ttl, tags=()):
+        entry = CacheEntry(body, ttl, tags)
+        if len(body) > self.max_bytes:
+            return entry
+
+        self._remove(key)
+        self._entries[key] = entry
+        self._bytes += len(body)
+
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+        return entry
+
+    def purge(self, *tags):
+        self._purge(tags)
+        if self.sync is not None:
+            try:
+                self.sync.publish(tags)
+            except OSError:
+                # Los demas workers sirven su copia hasta que caduque (TTL)
+                logger.exception("no se pudo anunciar la purga a los demas workers")
+
+    def _purge(self, tags):
+        self._generation += 1
+        for key in [k for k, entry in self._entries.items() if entry.tags & set(tags)]:
+            self._remove(key)
+
+    async def follow(self, interval):
+        """Aplica las purgas de los demas workers cada `interval` segundos."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Lectura de un fichero local pequeno: no merece un hilo
+                tags = self.sync.poll()
+            except OSError:
+                logger.exception("error al leer las purgas de otros workers")
+                continue
+            if tags:
+                self.stats["remote_purges"] += 1
+                self._purge(tags)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    async def _fetch_and_store(self, key, ttl, fetch, tags):
+        generation = self._generation
+        body = await fetch()
+        if generation != self._generation:
+            return CacheEntry(body, ttl, tags)
+        return self.put(key, body, ttl, tags)
+
+    def _refresh_in_background(self, key, ttl, fetch, tags):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch_and_store(key, ttl, fetch, tags)
+            except Exception:
+                # Se reintenta en la siguiente peticion que encuentre la entrada vieja
+                self.stats["refresh_errors"] += 1
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    async def serve(self, request: Request, key, ttl, fetch, tags=()):
+        """
+        Devuelve la respuesta cacheada para `key` o llama a `fetch()`
+        (corrutina que devuelve los bytes JSON del microservicio).
+        """
+        if not config.RESPONSE_CACHE_ENABLED:
+            return self._response(request, CacheEntry(await fetch(), ttl, tags), "BYPASS")
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.age <= entry.ttl:
+            status = "HIT"
+        elif entry is not None and entry.age <= entry.ttl + self.stale_ttl:
+            status = "STALE"
+            self._refresh_in_background(key, ttl, fetch, tags)
+        else:
+            status = "MISS"
+            entry = await self._fetch_and_store(key, ttl, fetch, tags)
+
+        if status != "MISS":
+            self._entries.move_to_end(key)
+        self.stats[status.lower()] += 1
+        return self._response(request, entry, status)
+
+    @staticmethod
+    def _response(request, entry, status):
+        headers = {
+            "ETag": entry.etag,
+            # El navegador puede guardar la copia pero debe revalidar con If-None-Match
+            "Cache-Control": "no-cache",
+            "X-Cache": status,
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            # Comparacion debil: el middleware de compresion entrega W/"..."
+            candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in candidates or entry.etag in candidates:
+                return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    stale_ttl=config.CACHE_STALE_WHILE_REVALIDATE,
+    sync=(
+        InvalidationLog(os.path.join(config.RESPONSE_CACHE_SYNC_DIR, "purges.log"))
+        if config.RESPONSE_CACHE_SYNC_DIR else None
+    ),
+)
@@ -0,0 +1,157 @@
+import zlib
+
+from . import config
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin el paquete solo se ofrece gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+
+def choose_encoding(accept_encoding):
+    """
+    Elige la codificacion segun Accept-Encoding (con q-values).
+    Preferencia: br, luego gzip. None si el cliente no acepta ninguna.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    def weight(encoding):
+        return accepted.get(encoding, accepted.get("*", 0.0))
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=weight)
+    return best if weight(best) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config.BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            # wbits=31: formato gzip (cabecera + crc)
+            self._zlib = zlib.compressobj(config.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._brotli = None
+
+    def compress(self, data):
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI: comprime con brotli o gzip segun Accept-Encoding.
+
+    - Solo tipos de texto/JSON y cuerpos de al menos COMPRESSION_MIN_SIZE
+      bytes; las respuestas pequenas salen tal cual.
+    - Respuestas en streaming se comprimen trozo a trozo.
+    - El ETag fuerte pasa a debil (W/...): la representacion comprimida no
+      es identica byte a byte a la original.
+    """
+
+    def __init__(self, app, minimum_size=None):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                # Primer trozo: se decide si la respuesta se comprime
+                response_start, start = start, None
+                if self._should_compress(response_start, body, more_body):
+                    compressor = _Compressor(encoding)
+                    response_start = self._compressed_start(response_start, encoding)
+                await send(response_start)
+
+            if compressor is None:
+                await send(message)
+                return
+
+            if more_body:
+                chunk = compressor.compress(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, start, body, more_body):
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        response_headers = {key.lower(): value for key, value in start.get("headers", [])}
+        if b"content-encoding" in response_headers:
+            return False
+        content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        # En streaming el tamano total solo se conoce si viene Content-Length
+        length = response_headers.get(b"content-length")
+        if length is not None:
+            return int(length) >= self.minimum_size
+        return more_body or len(body) >= self.minimum_size
+
+    @staticmethod
+    def _compressed_start(start, encoding):
+        headers = []
+        vary = None
+        for key, value in start.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            headers.append((key, value))
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+        return {**start, "headers": headers}
+
+
+def setup_compression(app):
+    if config.COMPRESSION_ENABLED:
+        app.add_middleware(CompressionMiddleware)
@@ -10,4 +10,136 @@ SUPABASE_ANON_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
 supabase: Client = create_client(
     SUPABASE_URL,
     SUPABASE_ANON_KEY
-)
\ No newline at end of file
+)
+
+# Microservicios downstream
+PRODUCTS_SERVICE_URL = os.getenv("PRODUCTS_SERVICE_URL", "http://localhost:5000")
+CART_SERVICE_URL = os.getenv("CART_SERVICE_URL", "http://localhost:5001")
+ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", "http://localhost:5002")
+PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL", "http://localhost:5003")
+
+# Pool de conexiones HTTP hacia los microservicios (un cliente por servicio)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+# Conexiones que se abren contra /health de cada servicio al arrancar (0 = desactivado)
+HTTP_PREWARM_CONNECTIONS = int(os.getenv("HTTP_PREWARM_CONNECTIONS", "2"))
+
+# Timeouts por servicio en segundos
+PRODUCTS_SERVICE_TIMEOUT = float(os.getenv("PRODUCTS_SERVICE_TIMEOUT", "10"))
+CART_SERVICE_TIMEOUT = float(os.getenv("CART_SERVICE_TIMEOUT", "10"))
+ORDER_SERVICE_TIMEOUT = float(os.getenv("ORDER_SERVICE_TIMEOUT", "10"))
+PAYMENT_SERVICE_TIMEOUT = float(os.getenv("PAYMENT_SERVICE_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+# Subida de /admin/products/import: el archivo se reenvia en streaming y
+# puede tardar mas que una peticion normal (la importacion sigue en segundo plano)
+IMPORT_UPLOAD_TIMEOUT = float(os.getenv("IMPORT_UPLOAD_TIMEOUT", "300"))
+
+# Verificacion local de los JWT de Supabase
+# HS256: secreto del proyecto (Settings > API > JWT Secret)
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+# Claves asimetricas (RS256/ES256): JWKS publicado por Supabase Auth, vacio = desactivado
+SUPABASE_JWKS_URL = os.getenv(
+    "SUPABASE_JWKS_URL", f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+)
+SUPABASE_JWKS_CACHE_TTL = int(os.getenv("SUPABASE_JWKS_CACHE_TTL", "600"))
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+# Cache de tokens verificados (clave = sha256 del token)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+# Hilos maximos para las llamadas bloqueantes de Supabase (auth y roles)
+AUTH_THREADPOOL_SIZE = int(os.getenv("AUTH_THREADPOOL_SIZE", "20"))
+
+# Cache de respuestas del catalogo en el gateway
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# TTL por ruta (segundos) y ventana extra en la que se sirve stale mientras se refresca
+CACHE_TTL_PRODUCT_SEARCH = float(os.getenv("CACHE_TTL_PRODUCT_SEARCH", "30"))
+CACHE_TTL_PRODUCT_DETAIL = float(os.getenv("CACHE_TTL_PRODUCT_DETAIL", "30"))
+CACHE_STALE_WHILE_REVALIDATE = float(os.getenv("CACHE_STALE_WHILE_REVALIDATE", "120"))
+# Directorio donde los workers se anuncian las purgas (app/core/invalidation.py);
+# vacio: cada purga solo vacia el cache del worker que la hizo
+RESPONSE_CACHE_SYNC_DIR = os.getenv("RESPONSE_CACHE_SYNC_DIR", "")
+# Cada cuantos segundos aplica cada worker las purgas de los demas
+RESPONSE_CACHE_SYNC_INTERVAL = float(os.getenv("RESPONSE_CACHE_SYNC_INTERVAL", "1"))
+
+# Agrupa GETs identicos concurrentes hacia los microservicios en una sola llamada
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+# Circuit breaker por microservicio (ventana deslizante de las ultimas N llamadas)
+CB_WINDOW_SIZE = int(os.getenv("CB_WINDOW_SIZE", "20"))
+CB_MINIMUM_CALLS = int(os.getenv("CB_MINIMUM_CALLS", "10"))
+CB_FAILURE_RATE_THRESHOLD = float(os.getenv("CB_FAILURE_RATE_THRESHOLD", "0.5"))
+# Una llamada es lenta si tarda mas de CB_SLOW_CALL_SECONDS
+CB_SLOW_CALL_SECONDS = float(os.getenv("CB_SLOW_CALL_SECONDS", "3"))
+CB_SLOW_CALL_RATE_THRESHOLD = float(os.getenv("CB_SLOW_CALL_RATE_THRESHOLD", "0.8"))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", "15"))
+CB_HALF_OPEN_CALLS = int(os.getenv("CB_HALF_OPEN_CALLS", "3"))
+
+# Bulkheads: llamadas concurrentes maximas por microservicio
+PRODUCTS_BULKHEAD_LIMIT = int(os.getenv("PRODUCTS_BULKHEAD_LIMIT", "50"))
+CART_BULKHEAD_LIMIT = int(os.getenv("CART_BULKHEAD_LIMIT", "30"))
+ORDER_BULKHEAD_LIMIT = int(os.getenv("ORDER_BULKHEAD_LIMIT", "30"))
+PAYMENT_BULKHEAD_LIMIT = int(os.getenv("PAYMENT_BULKHEAD_LIMIT", "20"))
+# Espera maxima por un hueco en el bulkhead antes de responder 503 (segundos)
+BULKHEAD_MAX_WAIT = float(os.getenv("BULKHEAD_MAX_WAIT", "0.05"))
+
+# Reintentos de GETs idempotentes hacia los microservicios
+RETRY_MAX_RETRIES = int(os.getenv("RETRY_MAX_RETRIES", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_CAP = float(os.getenv("RETRY_BACKOFF_CAP", "1"))
+# Presupuesto global: reintentos <= max(RATIO * peticiones, MIN_PER_SECOND * ventana)
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv("RETRY_BUDGET_WINDOW_SECONDS", "10"))
+
+# Hedging: segunda peticion si la primera supera el percentil HEDGE_QUANTILE
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.01"))
+
+# Trazas distribuidas (W3C traceparent). Sin destino configurado no se exporta nada
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "api-gateway")
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+# Collector compatible con Zipkin v2, ej. http://jaeger:9411/api/v2/spans
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+
+# Logging estructurado (ver app/core/log.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "512"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_ACCESS = os.getenv("LOG_ACCESS", "true").lower() == "true"
+# Muestreo por prefijo de ruta, ej. "/products/search=0.05,/health=0"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Compresion de respuestas (brotli si esta instalado, si no gzip)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Por debajo de este tamano (bytes) comprimir cuesta mas de lo que ahorra
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Rate limiting (token bucket) por usuario autenticado o por IP
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory" (por proceso) o "redis" (compartido entre replicas, requiere el paquete redis)
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Limites por grupo de rutas: grupo=peticiones_por_segundo:rafaga
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS", "catalog=10:30,cart=5:15,orders=2:10,checkout=0.5:3"
+)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Procesos que comparten los limites con el store "memory": cada worker
+# aplica 1/N de RATE_LIMITS para que el total se acerque a lo configurado.
+# Por defecto los workers de start.sh en produccion (WEB_CONCURRENCY)
+RATE_LIMIT_WORKERS = int(os.getenv(
+    "RATE_LIMIT_WORKERS",
+    os.getenv("WEB_CONCURRENCY", "1") if os.getenv("APP_ENV") == "production" else "1",
+))
+# Usar X-Forwarded-For como IP del cliente (solo detras de un proxy de confianza)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import Request
+
+from . import config
+from .cache import response_cache
+from .metrics import InstrumentedTransport
+from .resilience import Bulkhead, CircuitBreaker, ResilientTransport
+
+
+class ServiceClients:
+    """
+    Un httpx.AsyncClient de larga vida por microservicio.
+
+    Cada cliente mantiene su propio pool de conexiones keep-alive, su base_url
+    y su timeout, asi los routers solo indican la ruta relativa. Todas las
+    llamadas pasan por el circuit breaker y el bulkhead del servicio.
+    """
+
+    def __init__(self, transport=None):
+        limits = httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.breakers = {}
+        self.bulkheads = {}
+
+        def build(name, base_url, timeout, bulkhead_limit):
+            self.breakers[name] = CircuitBreaker(
+                name,
+                window_size=config.CB_WINDOW_SIZE,
+                minimum_calls=config.CB_MINIMUM_CALLS,
+                failure_rate_threshold=config.CB_FAILURE_RATE_THRESHOLD,
+                slow_call_seconds=config.CB_SLOW_CALL_SECONDS,
+                slow_call_rate_threshold=config.CB_SLOW_CALL_RATE_THRESHOLD,
+                open_seconds=config.CB_OPEN_SECONDS,
+                half_open_calls=config.CB_HALF_OPEN_CALLS,
+            )
+            self.bulkheads[name] = Bulkhead(name, bulkhead_limit, config.BULKHEAD_MAX_WAIT)
+            inner = InstrumentedTransport(
+                transport or httpx.AsyncHTTPTransport(limits=limits, http2=config.HTTP2_ENABLED),
+                name,
+            )
+            return httpx.AsyncClient(
+                base_url=base_url,
+                timeout=httpx.Timeout(timeout, connect=config.HTTP_CONNECT_TIMEOUT),
+                transport=ResilientTransport(inner, self.breakers[name], self.bulkheads[name]),
+            )
+
+        self.products = build(
+            "products", config.PRODUCTS_SERVICE_URL,
+            config.PRODUCTS_SERVICE_TIMEOUT, config.PRODUCTS_BULKHEAD_LIMIT,
+        )
+        self.cart = build(
+            "cart", config.CART_SERVICE_URL,
+            config.CART_SERVICE_TIMEOUT, config.CART_BULKHEAD_LIMIT,
+        )
+        self.order = build(
+            "order", config.ORDER_SERVICE_URL,
+            config.ORDER_SERVICE_TIMEOUT, config.ORDER_BULKHEAD_LIMIT,
+        )
+        self.payment = build(
+            "payment", config.PAYMENT_SERVICE_URL,
+            config.PAYMENT_SERVICE_TIMEOUT, config.PAYMENT_BULKHEAD_LIMIT,
+        )
+
+    def all(self):
+        return {
+            "products": self.products,
+            "cart": self.cart,
+            "order": self.order,
+            "payment": self.payment,
+        }
+
+    def circuits(self):
+        return {
+            name: {
+                "breaker": self.breakers[name].snapshot(),
+                "bulkhead": self.bulkheads[name].snapshot(),
+            }
+            for name in self.breakers
+        }
+
+    async def prewarm(self, connections=config.HTTP_PREWARM_CONNECTIONS):
+        """
+        Abre `connections` conexiones por servicio contra /health para que las
+        primeras peticiones reales no paguen el handshake TCP.
+        Un servicio caido no impide que arranque el gateway.
+        """
+        if connections <= 0:
+            return
+
+        async def touch(client):
+            try:
+                await client.get("/health")
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(
+            *(touch(client) for client in self.all().values() for _ in range(connections))
+        )
+
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self.all().values()))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    clients = ServiceClients()
+    await clients.prewarm()
+    app.state.clients = clients
+    # Purgas del cache de respuestas hechas por los demas workers
+    follow = None
+    if response_cache.sync is not None:
+        follow = asyncio.create_task(response_cache.follow(config.RESPONSE_CACHE_SYNC_INTERVAL))
+    try:
+        yield
+    finally:
+        if follow is not None:
+            follow.cancel()
+        await clients.aclose()
+
+
+# Dependencia para inyectar los clientes en los routers
+def get_clients(request: Request) -> ServiceClients:
+    return request.app.state.clients
@@ -0,0 +1,94 @@
+"""
+Purgas del cache de respuestas compartidas entre los workers uvicorn.
+
+Cada worker tiene su propio response_cache: una purga solo vaciaria el
+del worker que atendio la escritura. InvalidationLog es un fichero de
+solo anadir en RESPONSE_CACHE_SYNC_DIR donde cada worker publica las
+etiquetas que purgo; los demas lo leen cada RESPONSE_CACHE_SYNC_INTERVAL
+segundos y las purgan tambien (ver ResponseCache.follow).
+
+- Cada linea es "<pid> <etiqueta>,<etiqueta>,..."; un worker ignora sus
+  propias lineas.
+- Las lineas se escriben con O_APPEND y una sola write() de a lo sumo
+  MAX_LINE_BYTES: no se mezclan entre procesos.
+- Pasado `max_bytes` el que publica borra el fichero y el siguiente crea
+  uno nuevo. Los lectores conservan abierto el anterior, lo terminan de
+  leer y pasan al nuevo.
+- Es best-effort: si se pierde una linea las entradas caducan con su TTL.
+"""
+import os
+
+MAX_LINE_BYTES = 4096
+
+
+class InvalidationLog:
+    def __init__(self, path, max_bytes=1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.pid = os.getpid()
+        self._file = None
+        self._pending = b""
+
+    def _open(self, at_end):
+        if self._file is not None:
+            self._file.close()
+        fd = os.open(self.path, os.O_RDONLY | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, "rb")
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+        self._pending = b""
+
+    def publish(self, values):
+        """Anuncia `values` (etiquetas sin comas ni espacios) a los demas workers."""
+        values = list(dict.fromkeys(values))
+        if not values:
+            return
+        prefix = f"{self.pid} "
+        lines, line = [], prefix
+        for value in values:
+            if len(line) + len(value) + 2 > MAX_LINE_BYTES:
+                lines.append(line.rstrip(",") + "\n")
+                line = prefix
+            line += value + ","
+        lines.append(line.rstrip(",") + "\n")
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            for line in lines:
+                os.write(fd, line.encode())
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.max_bytes:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                # Otro worker ya lo roto
+                pass
+
+    def poll(self):
+        """Valores publicados por otros workers desde la ultima llamada."""
+        if self._file is None:
+            # Lo anterior a la primera lectura no afecta a un cache recien creado
+            self._open(at_end=True)
+        values = self._read()
+        # Rotado: se termino de leer el anterior, el nuevo se lee desde el principio
+        try:
+            rotated = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self._open(at_end=False)
+            values += self._read()
+        return values
+
+    def _read(self):
+        data = self._pending + self._file.read()
+        # Una linea a medio escribir se completa en la siguiente lectura
+        complete, _, self._pending = data.rpartition(b"\n")
+        values = []
+        for line in complete.decode().splitlines():
+            pid, _, joined = line.partition(" ")
+            if pid != str(self.pid) and joined:
+                values += joined.split(",")
+        return values
@@ -0,0 +1,210 @@
+"""
+Logging estructurado: una linea JSON por registro, sin bloquear las peticiones.
+
+- Los handlers solo encolan (QueueHandler); un hilo (QueueListener) formatea
+  y escribe en stdout.
+- LOG_LEVEL: nivel minimo (INFO por defecto).
+- LOG_SAMPLE_RATES: muestreo por prefijo de ruta de los registros por debajo
+  de WARNING, decidido una vez por peticion. Ej. "/products/search=0.05,/health=0".
+- LOG_MAX_FIELD_CHARS: tope de caracteres por campo.
+- LOG_ACCESS: una linea por peticion con ruta, estado y duracion.
+
+Variables en app/core/config.py.
+
+Los modulos usan logging.getLogger(__name__) y pasan datos con extra=.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import reprlib
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import config
+from .tracing import current_span
+
+
+# Atributos propios de LogRecord: el resto llega por extra= y se exporta como campo
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+# Decision de muestreo de la peticion en curso (WARNING y superiores siempre pasan)
+_sampled = contextvars.ContextVar("log_sampled", default=True)
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 2
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 10
+_repr.maxstring = _repr.maxother = 120
+
+
+def parse_sample_rates(value):
+    """ "/products/search=0.05,/health=0" -> {"/products/search": 0.05, "/health": 0.0}"""
+    rates = {}
+    for rule in filter(None, (part.strip() for part in (value or "").split(","))):
+        prefix, _, rate = rule.partition("=")
+        rates[prefix.strip()] = float(rate)
+    return rates
+
+
+def sample_rate(path, rates):
+    # Gana el prefijo mas largo; sin regla se registra todo
+    matches = [prefix for prefix in rates if path.startswith(prefix)]
+    return rates[max(matches, key=len)] if matches else 1.0
+
+
+def begin_request(path, rates):
+    return _sampled.set(random.random() < sample_rate(path, rates))
+
+
+def end_request(token):
+    _sampled.reset(token)
+
+
+def truncate(value, limit):
+    """
+    Acota un campo del log. Las colecciones se resumen con reprlib, que solo
+    recorre los primeros elementos: el coste no crece con el tamano del payload.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else _repr.repr(value)
+    if len(text) > limit:
+        return f"{text[:limit]}...[{len(text) - limit} truncados]"
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.msg,
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RESERVED and value is not None
+        )
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampledQueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler del hilo de la peticion: filtra por muestreo, acota los campos y
+    encola. Formatear y escribir lo hace el hilo del QueueListener. Con la
+    cola llena el registro se descarta en lugar de bloquear.
+    """
+
+    def __init__(self, log_queue, max_field_chars, trace_id):
+        super().__init__(log_queue)
+        self.max_field_chars = max_field_chars
+        self.trace_id = trace_id
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        return super().filter(record)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = truncate(record.getMessage(), self.max_field_chars)
+        record.args = None
+        if record.exc_info:
+            record.exc_text = truncate(logging.Formatter().formatException(record.exc_info), 4000)
+            record.exc_info = None
+        for key in vars(record).keys() - _RESERVED:
+            setattr(record, key, truncate(getattr(record, key), self.max_field_chars))
+        record.trace_id = self.trace_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler = None
+
+
+def configure(service, level, max_field_chars, queue_size, trace_id):
+    """Instala el handler con cola en el logger raiz (una sola vez por proceso)."""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    _handler = SampledQueueHandler(queue.Queue(queue_size), max_field_chars, trace_id)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter(service))
+    listener = logging.handlers.QueueListener(_handler.queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    return _handler
+
+
+def _trace_id():
+    span = current_span()
+    return span.trace_id if span else None
+
+
+class LoggingMiddleware:
+    """Middleware ASGI: decide el muestreo de la peticion y escribe el log de acceso."""
+
+    def __init__(self, app):
+        self.app = app
+        self.rates = parse_sample_rates(config.LOG_SAMPLE_RATES)
+        self.access = logging.getLogger("access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = begin_request(scope["path"], self.rates)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if config.LOG_ACCESS:
+                self.access.info(
+                    "request",
+                    extra={
+                        "method": scope["method"],
+                        "route": getattr(scope.get("route"), "path", "unmatched"),
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    },
+                )
+            end_request(token)
+
+
+def setup_logging(app):
+    configure(
+        config.TRACE_SERVICE_NAME, config.LOG_LEVEL, config.LOG_MAX_FIELD_CHARS,
+        config.LOG_QUEUE_SIZE, _trace_id,
+    )
+    app.add_middleware(LoggingMiddleware)
@@ -0,0 +1,210 @@
+import os
+import re
+import time
+
+import httpx
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .tracing import start_span
+
+REQUEST_LATENCY = Histogram(
+    "gateway_request_duration_seconds",
+    "Latencia de las peticiones al gateway",
+    ["method", "route"],
+)
+REQUESTS_TOTAL = Counter(
+    "gateway_requests_total",
+    "Peticiones al gateway por codigo de estado",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "gateway_requests_in_flight",
+    "Peticiones en curso en el gateway",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DOWNSTREAM_LATENCY = Histogram(
+    "gateway_downstream_duration_seconds",
+    "Latencia de las llamadas httpx a los microservicios",
+    ["service", "method", "route", "status"],
+)
+SUPABASE_LATENCY = Histogram(
+    "supabase_query_duration_seconds",
+    "Latencia de las consultas a Supabase",
+    ["table", "operation"],
+)
+
+
+def route_template(path):
+    # /products/12 -> /products/{id}: evita una serie por cada id
+    return re.sub(r"/\d+", "/{id}", path)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia, codigo de estado y peticiones en vuelo por ruta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # FastAPI deja la ruta resuelta en el scope (plantilla, no la URL real)
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS_TOTAL.labels(method, route, str(status)).inc()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Envuelve el transporte httpx de un servicio para medir cada llamada y
+    abrir su span CLIENT, propagando `traceparent` al microservicio.
+    """
+
+    def __init__(self, transport, service):
+        self._transport = transport
+        self.service = service
+
+    async def handle_async_request(self, request):
+        route = route_template(request.url.path)
+        start = time.perf_counter()
+        status = "error"
+        with start_span(
+            f"{request.method} {route}", "CLIENT",
+            {"http.method": request.method, "http.url": str(request.url)},
+            remote_service=self.service,
+        ) as span:
+            request.headers["traceparent"] = span.traceparent
+            try:
+                response = await self._transport.handle_async_request(request)
+                status = str(response.status_code)
+                span.set_tag("http.status_code", status)
+                return response
+            finally:
+                DOWNSTREAM_LATENCY.labels(
+                    self.service, request.method, route, status
+                ).observe(time.perf_counter() - start)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class GatewayCollector:
+    """
+    Exporta en cada scrape los contadores que ya mantienen los modulos del
+    gateway (auth, cache, single-flight, reintentos, breakers). No anade
+    coste a las peticiones.
+
+    Con varios workers esos contadores son del proceso que atiende el
+    scrape: `worker` anade su pid como etiqueta para no mezclar series.
+    """
+
+    def __init__(self, app, worker=None):
+        self.app = app
+        self.worker = worker
+
+    def _family(self, kind, name, documentation, labels=()):
+        labels = [*labels, "worker"] if self.worker else list(labels)
+        return kind(name, documentation, labels=labels)
+
+    def _add(self, family, labels, value):
+        family.add_metric([*labels, self.worker] if self.worker else list(labels), value)
+
+    def collect(self):
+        from .Auth import auth_counters
+        from .cache import response_cache
+        from .ratelimit import rate_limit_stats
+        from .retry import retry_budget, retry_stats
+        from .singleflight import singleflight
+
+        for name, counters in (
+            ("gateway_auth", auth_counters),
+            ("gateway_response_cache", response_cache.stats),
+            ("gateway_singleflight", singleflight.stats),
+            ("gateway_retry", retry_stats),
+            ("gateway_retry_budget", retry_budget.stats),
+            ("gateway_rate_limit", rate_limit_stats),
+        ):
+            family = self._family(CounterMetricFamily, f"{name}_events", f"Eventos de {name}", ["event"])
+            for event, value in counters.items():
+                self._add(family, [event], value)
+            yield family
+
+        ratio = self._family(
+            GaugeMetricFamily,
+            "gateway_singleflight_coalescing_ratio",
+            "Fraccion de GETs resueltos con una llamada ya en vuelo",
+        )
+        self._add(ratio, [], singleflight.coalescing_ratio)
+        yield ratio
+
+        cache_bytes = self._family(GaugeMetricFamily, "gateway_response_cache_bytes", "Bytes en el cache de respuestas")
+        self._add(cache_bytes, [], response_cache.size_bytes)
+        yield cache_bytes
+
+        clients = getattr(self.app.state, "clients", None)
+        if clients is None:
+            return
+        state = self._family(
+            GaugeMetricFamily,
+            "gateway_circuit_open", "1 si el circuito del servicio no esta cerrado", ["service", "state"],
+        )
+        in_flight = self._family(
+            GaugeMetricFamily, "gateway_bulkhead_in_flight", "Llamadas en vuelo por servicio", ["service"]
+        )
+        for service, breaker in clients.breakers.items():
+            self._add(state, [service, breaker.state], 0 if breaker.state == breaker.CLOSED else 1)
+            self._add(in_flight, [service], clients.bulkheads[service].in_flight)
+        yield state
+        yield in_flight
+
+
+def setup_metrics(app):
+    app.add_middleware(MetricsMiddleware)
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Varios workers (start.sh): histogramas y contadores agregados entre
+        # procesos + los contadores internos del worker que responde
+        def registry():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            registry.register(GatewayCollector(app, worker=str(os.getpid())))
+            return registry
+    else:
+        REGISTRY.register(GatewayCollector(app))
+
+        def registry():
+            return REGISTRY
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(registry()), media_type=CONTENT_TYPE_LATEST)
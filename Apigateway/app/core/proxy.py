@@ -0,0 +1,55 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Cabeceras del microservicio que describen el cuerpo y se reenvian tal cual
+FORWARDED_HEADERS = (
+    "content-type",
+    "content-length",
+    "content-encoding",
+    "etag",
+    "last-modified",
+    "cache-control",
+)
+
+
+async def _relay(response):
+    # El cierre libera la conexion del pool y el hueco del bulkhead,
+    # tambien si el cliente se desconecta a mitad de la respuesta
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+async def stream_response(response):
+    """
+    Convierte una respuesta httpx abierta con stream=True en una
+    StreamingResponse con el mismo estado y cabeceras, sin decodificar el
+    JSON. Las respuestas no 2xx se leen enteras y se lanzan como
+    HTTPException con el cuerpo del microservicio en `detail`.
+    """
+    if not response.is_success:
+        try:
+            await response.aread()
+            try:
+                detail = response.json()
+            except ValueError:
+                detail = response.text
+        finally:
+            await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    headers = {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers}
+    return StreamingResponse(_relay(response), status_code=response.status_code, headers=headers)
+
+
+async def proxy(client, method, url, **kwargs):
+    """
+    Pasa la llamada al microservicio y devuelve su cuerpo en streaming.
+    Para rutas que no modifican la respuesta: la memoria del gateway no
+    crece con el tamano del cuerpo.
+    """
+    request = client.build_request(method, url, **kwargs)
+    response = await client.send(request, stream=True)
+    return await stream_response(response)
@@ -0,0 +1,207 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from cachetools import TLRUCache
+from fastapi import Depends, HTTPException, Request
+
+from . import config
+from .Auth import Principal, get_principal
+
+logger = logging.getLogger(__name__)
+
+rate_limit_stats = Counter()
+
+
+@lru_cache(maxsize=8)
+def parse_limits(value):
+    """ "catalog=10:30,cart=5:15" -> {"catalog": (10.0, 30), "cart": (5.0, 15)}"""
+    limits = {}
+    for rule in filter(None, (part.strip() for part in value.split(","))):
+        name, _, spec = rule.partition("=")
+        rate, _, burst = spec.partition(":")
+        limits[name.strip()] = (float(rate), int(burst or math.ceil(float(rate))))
+    return limits
+
+
+class RateLimitResult:
+    def __init__(self, allowed, tokens, rate, burst):
+        self.allowed = allowed
+        self.limit = burst
+        self.remaining = max(0, int(tokens))
+        # Segundos hasta que haya un token (429) y hasta que el bucket este lleno
+        self.retry_after = 0 if allowed else math.ceil((1 - tokens) / rate)
+        self.reset = math.ceil((burst - tokens) / rate)
+
+    def headers(self):
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class MemoryStore:
+    """
+    Buckets en memoria del proceso. Un bucket inactivo caduca cuando ya se
+    habria rellenado entero, asi la memoria queda acotada por los clientes
+    activos (y por RATE_LIMIT_MAX_KEYS).
+    """
+
+    def __init__(self, max_keys):
+        self._buckets = TLRUCache(maxsize=max_keys, ttu=lambda key, value, now: value[2], timer=time.monotonic)
+        self._lock = threading.Lock()
+
+    async def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (burst, now, None))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return RateLimitResult(allowed, tokens, rate, burst)
+
+
+# Bucket atomico en Redis; el reloj es el del servidor para que todas las replicas coincidan
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStore:
+    """
+    Buckets compartidos entre replicas del gateway. Si Redis no responde la
+    peticion pasa (fail-open): el limitador no debe tumbar el gateway.
+    """
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key, rate, burst):
+        try:
+            allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst])
+        except Exception:
+            rate_limit_stats["store_errors"] += 1
+            logger.warning("rate limit store no disponible", exc_info=True)
+            return RateLimitResult(True, burst, rate, burst)
+        return RateLimitResult(bool(allowed), float(tokens), rate, burst)
+
+
+def build_store():
+    if config.RATE_LIMIT_STORE == "redis":
+        return RedisStore(config.RATE_LIMIT_REDIS_URL)
+    return MemoryStore(config.RATE_LIMIT_MAX_KEYS)
+
+
+store = build_store()
+
+
+def local_limit(rate, burst):
+    """
+    Parte del limite que aplica este proceso. Los buckets en memoria son
+    por worker: con N workers y el limite entero cada cliente tendria N
+    veces lo configurado. Con reparto parejo de conexiones, 1/N por worker
+    suma aproximadamente el limite; la rafaga minima es 1 por worker.
+    """
+    workers = config.RATE_LIMIT_WORKERS
+    if workers <= 1 or isinstance(store, RedisStore):
+        return rate, burst
+    return rate / workers, max(1, math.ceil(burst / workers))
+
+
+def client_ip(request: Request):
+    if config.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _check(request, group, identity):
+    limits = parse_limits(config.RATE_LIMITS)
+    if not config.RATE_LIMIT_ENABLED or group not in limits:
+        return
+
+    rate, burst = local_limit(*limits[group])
+    result = await store.take(f"{group}:{identity}", rate, burst)
+    # Las cabeceras RateLimit-* las anade RateLimitHeadersMiddleware
+    request.state.rate_limit = result
+    if not result.allowed:
+        rate_limit_stats[f"rejected_{group}"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas peticiones, intenta de nuevo mas tarde",
+            headers=result.headers(),
+        )
+    rate_limit_stats[f"allowed_{group}"] += 1
+
+
+def rate_limit(group):
+    """Dependencia: limita por IP del cliente (rutas anonimas)."""
+
+    async def dependency(request: Request):
+        await _check(request, group, f"ip:{client_ip(request)}")
+
+    return dependency
+
+
+def user_rate_limit(group):
+    """Dependencia: limita por id del usuario autenticado."""
+
+    async def dependency(request: Request, principal: Principal = Depends(get_principal)):
+        await _check(request, group, f"user:{principal.id}")
+
+    return dependency
+
+
+class RateLimitHeadersMiddleware:
+    """Anade RateLimit-* a las respuestas de las rutas limitadas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                result = scope.get("state", {}).get("rate_limit")
+                if result is not None and result.allowed:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode(), value.encode()) for name, value in result.headers().items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def setup_rate_limit(app):
+    app.add_middleware(RateLimitHeadersMiddleware)
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from collections import Counter, deque
+
+import httpx
+
+
+class ServiceUnavailableError(httpx.RequestError):
+    """La llamada se rechazo sin salir del gateway (circuito abierto o bulkhead lleno)."""
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    pass
+
+
+class BulkheadFullError(ServiceUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker con ventana deslizante de las ultimas `window_size` llamadas.
+
+    - closed: las llamadas pasan; si la tasa de errores (fallos de red o 5xx)
+      o la de llamadas lentas supera su umbral, se abre.
+    - open: se rechaza todo durante `open_seconds`.
+    - half_open: se dejan pasar `half_open_calls` llamadas de prueba; si todas
+      van bien se cierra, si alguna falla vuelve a abrirse.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name,
+        window_size,
+        minimum_calls,
+        failure_rate_threshold,
+        slow_call_seconds,
+        slow_call_rate_threshold,
+        open_seconds,
+        half_open_calls,
+    ):
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.stats = Counter()
+        self._window = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    @property
+    def failure_rate(self):
+        return sum(failed for failed, _ in self._window) / len(self._window) if self._window else 0.0
+
+    @property
+    def slow_call_rate(self):
+        return sum(slow for _, slow in self._window) / len(self._window) if self._window else 0.0
+
+    def before_call(self):
+        """Devuelve True si la llamada es de prueba (half_open); lanza si esta abierto."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"Circuito abierto para {self.name}")
+            self._transition(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_calls:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(f"Circuito semiabierto para {self.name}")
+            self._probes_in_flight += 1
+            return True
+
+        return False
+
+    def release_probe(self):
+        self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, failed, elapsed, probe):
+        slow = elapsed >= self.slow_call_seconds
+        self.stats["failures" if failed else "successes"] += 1
+
+        if probe:
+            self.release_probe()
+            if self.state != self.HALF_OPEN:
+                return
+            if failed or slow:
+                self._transition(self.OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(self.CLOSED)
+            return
+
+        if self.state != self.CLOSED:
+            # Llamada iniciada antes de abrir el circuito
+            return
+
+        self._window.append((failed, slow))
+        if len(self._window) >= self.minimum_calls and (
+            self.failure_rate >= self.failure_rate_threshold
+            or self.slow_call_rate >= self.slow_call_rate_threshold
+        ):
+            self._transition(self.OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        self.stats[f"to_{state}"] += 1
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        if state == self.CLOSED:
+            self._window.clear()
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 3),
+            "slow_call_rate": round(self.slow_call_rate, 3),
+            "calls_in_window": len(self._window),
+            "stats": dict(self.stats),
+        }
+
+
+class Bulkhead:
+    """Limita las llamadas concurrentes en vuelo hacia un microservicio."""
+
+    def __init__(self, name, max_concurrent, max_wait):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.stats = Counter()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self):
+        try:
+            if self.max_wait > 0:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            elif self._semaphore.locked():
+                raise asyncio.TimeoutError
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise BulkheadFullError(f"Demasiadas llamadas en vuelo hacia {self.name}")
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def snapshot(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "stats": dict(self.stats),
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Libera el hueco del bulkhead cuando se termina de leer la respuesta."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte httpx que pasa cada llamada por el circuit breaker y el
+    bulkhead del microservicio. Los rechazos son httpx.RequestError, asi que
+    los routers los tratan igual que un servicio caido (503).
+    """
+
+    def __init__(self, transport, breaker, bulkhead):
+        self._transport = transport
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    async def handle_async_request(self, request):
+        probe = self.breaker.before_call()
+        try:
+            await self.bulkhead.acquire()
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        start = time.monotonic()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            self.bulkhead.release()
+            self.breaker.record(True, time.monotonic() - start, probe)
+            raise
+        except BaseException:
+            # Cancelada (cliente desconectado, hedging...): no cuenta como fallo
+            self.bulkhead.release()
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        self.breaker.record(response.status_code >= 500, time.monotonic() - start, probe)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self.bulkhead.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,178 @@
+import asyncio
+import random
+import re
+import time
+from collections import Counter, defaultdict, deque
+
+import httpx
+
+from . import config
+from .resilience import ServiceUnavailableError
+
+# Respuestas que indican un fallo transitorio del microservicio
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Presupuesto global de reintentos sobre una ventana deslizante.
+    Evita que los reintentos multipliquen la carga de un servicio caido:
+    como mucho `ratio` reintentos por peticion (con un minimo por segundo).
+    """
+
+    def __init__(self, ratio, min_per_second, window_seconds):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self.stats = Counter()
+        self._requests = deque()
+        self._retries = deque()
+
+    def _trim(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_withdraw(self):
+        now = time.monotonic()
+        self._trim(now)
+        allowed = max(self.ratio * len(self._requests), self.min_per_second * self.window_seconds)
+        if len(self._retries) >= allowed:
+            self.stats["exhausted"] += 1
+            return False
+        self._retries.append(now)
+        return True
+
+
+class LatencyTracker:
+    """Ultimas latencias correctas por ruta, para calcular el retardo del hedge."""
+
+    def __init__(self, size=200):
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+
+    def observe(self, key, seconds):
+        self._samples[key].append(seconds)
+
+    def quantile(self, key, q):
+        samples = self._samples.get(key)
+        if not samples or len(samples) < config.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+retry_budget = RetryBudget(
+    ratio=config.RETRY_BUDGET_RATIO,
+    min_per_second=config.RETRY_BUDGET_MIN_PER_SECOND,
+    window_seconds=config.RETRY_BUDGET_WINDOW_SECONDS,
+)
+latencies = LatencyTracker()
+retry_stats = Counter()
+
+
+def _route_key(client, url):
+    # /products/12 y /products/13 comparten estadisticas de latencia
+    return str(client.base_url) + re.sub(r"/\d+", "/{id}", url)
+
+
+def _backoff(attempt):
+    # Full jitter: aleatorio entre 0 y base * 2^intento (con tope)
+    return random.uniform(0, min(config.RETRY_BACKOFF_CAP, config.RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+def _send(client, url, params, stream):
+    return client.send(client.build_request("GET", url, params=params), stream=stream)
+
+
+def _discard(task):
+    # Respuesta en streaming que no se usa: hay que cerrarla para liberar la conexion
+    if task.done() and not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(task.result().aclose())
+
+
+def _is_good(task):
+    return (
+        not task.cancelled()
+        and task.exception() is None
+        and task.result().status_code not in RETRYABLE_STATUS
+    )
+
+
+async def _hedged_get(client, url, params, delay, stream):
+    first = asyncio.ensure_future(_send(client, url, params, stream))
+    second = None
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done or not retry_budget.try_withdraw():
+            return await first
+
+        retry_stats["hedged"] += 1
+        second = asyncio.ensure_future(_send(client, url, params, stream))
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if _is_good(task):
+                    if task is second:
+                        retry_stats["hedge_won"] += 1
+                        _discard(first)
+                    else:
+                        _discard(second)
+                    return task.result()
+
+        # Las dos fallaron: se propaga el resultado de la original
+        _discard(second)
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def idempotent_get(client, url, params=None, hedge=False, stream=False):
+    """
+    GET con reintentos (backoff con jitter, limitados por el presupuesto
+    global) y, si `hedge` y HEDGING_ENABLED, peticion duplicada cuando la
+    original tarda mas que el p95 reciente de la ruta.
+    Con `stream` la respuesta se devuelve sin leer el cuerpo (ver proxy.py).
+    Solo para llamadas idempotentes.
+    """
+    key = _route_key(client, url)
+    retry_budget.record_request()
+    attempt = 0
+
+    while True:
+        delay = None
+        if hedge and config.HEDGING_ENABLED:
+            delay = latencies.quantile(key, config.HEDGE_QUANTILE)
+
+        start = time.monotonic()
+        try:
+            if delay is not None:
+                response = await _hedged_get(
+                    client, url, params, max(delay, config.HEDGE_MIN_DELAY), stream
+                )
+            else:
+                response = await _send(client, url, params, stream)
+        except ServiceUnavailableError:
+            # Circuito abierto o bulkhead lleno: reintentar solo suma carga
+            raise
+        except httpx.TransportError:
+            if attempt >= config.RETRY_MAX_RETRIES or not retry_budget.try_withdraw():
+                raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                latencies.observe(key, time.monotonic() - start)
+                return response
+            if attempt >= config.RETRY_MAX_RETRIES or not retry_budget.try_withdraw():
+                return response
+            await response.aclose()
+
+        attempt += 1
+        retry_stats["retries"] += 1
+        await asyncio.sleep(_backoff(attempt))
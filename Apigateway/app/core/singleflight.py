@@ -0,0 +1,51 @@
+import asyncio
+from collections import Counter
+
+from . import config
+from .retry import idempotent_get
+
+
+class SingleFlight:
+    """
+    Coalescing de peticiones: si llegan varias llamadas identicas mientras
+    una esta en vuelo, todas esperan el mismo resultado en lugar de lanzar
+    una peticion nueva al microservicio.
+
+    Solo debe usarse con operaciones idempotentes (GET).
+    """
+
+    def __init__(self):
+        self.stats = Counter()
+        self._in_flight = {}
+
+    @property
+    def coalescing_ratio(self):
+        """Fraccion de llamadas que se resolvieron con una peticion ajena."""
+        total = self.stats["leader"] + self.stats["shared"]
+        return self.stats["shared"] / total if total else 0.0
+
+    async def do(self, key, fn):
+        task = self._in_flight.get(key)
+        if task is None:
+            self.stats["leader"] += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["shared"] += 1
+
+        # shield: si un cliente cancela, la llamada sigue para el resto
+        return await asyncio.shield(task)
+
+    async def get(self, client, url, params=None, hedge=False):
+        """
+        GET coalescido (con reintentos y hedging de idempotent_get).
+        Las respuestas compartidas ya tienen el cuerpo leido.
+        """
+        if not config.SINGLEFLIGHT_ENABLED:
+            return await idempotent_get(client, url, params=params, hedge=hedge)
+
+        key = (str(client.base_url), url, tuple(sorted((params or {}).items())))
+        return await self.do(key, lambda: idempotent_get(client, url, params=params, hedge=hedge))
+
+singleflight = SingleFlight()
@@ -0,0 +1,225 @@
+"""
+Trazas distribuidas con propagacion W3C `traceparent`.
+
+El gateway abre un span SERVER por peticion (o continua la traza del
+frontend si llega `traceparent`), un span CLIENT por cada llamada httpx a
+un microservicio (inyectando `traceparent` para que el servicio cuelgue
+sus spans del mismo trace) y uno por cada consulta a Supabase Auth.
+Los spans se exportan en segundo plano en formato Zipkin v2 (JSON) a
+TRACE_EXPORT_FILE y/o TRACE_COLLECTOR_URL.
+"""
+import atexit
+import contextvars
+import json
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from . import config
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, kind, trace_id, parent_id, sampled, service, tags=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.service = service
+        self.remote_service = None
+        self.tags = dict(tags or {})
+        self.timestamp = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_tag(self, key, value):
+        self.tags[key] = str(value)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_zipkin(self):
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "timestamp": int(self.timestamp * 1_000_000),
+            "duration": max(1, int(self.duration * 1_000_000)),
+            "localEndpoint": {"serviceName": self.service},
+            "tags": self.tags,
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.remote_service:
+            span["remoteEndpoint"] = {"serviceName": self.remote_service}
+        return span
+
+
+class SpanExporter:
+    """Cola acotada + hilo en segundo plano: exportar nunca bloquea una peticion."""
+
+    def __init__(self, file_path, collector_url, batch_size=100):
+        self.file_path = file_path
+        self.collector_url = collector_url
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.file_path or self.collector_url)
+
+    def export(self, span):
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="span-exporter")
+            self._thread.start()
+            atexit.register(self.flush)
+        try:
+            self._queue.put_nowait(span.to_zipkin())
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self._queue.get(block=block, timeout=1 if block else None))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            if self.file_path:
+                with open(self.file_path, "a", encoding="utf-8") as output:
+                    output.writelines(json.dumps(span) + "\n" for span in batch)
+            if self.collector_url:
+                body = json.dumps(batch).encode()
+                post = urllib.request.Request(
+                    self.collector_url, data=body, headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(post, timeout=5).close()
+        except Exception:
+            # Las trazas son best-effort: si el collector falla se descartan
+            self.dropped += len(batch)
+
+    def _run(self):
+        while True:
+            self._write(self._drain(block=True))
+
+    def flush(self):
+        while not self._queue.empty():
+            self._write(self._drain(block=False))
+
+
+exporter = SpanExporter(config.TRACE_EXPORT_FILE, config.TRACE_COLLECTOR_URL)
+
+
+def parse_traceparent(header):
+    match = TRACEPARENT.match((header or "").strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, int(flags, 16) & 1 == 1
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _new_span(name, kind, parent, tags):
+    current = _current_span.get()
+    if parent:
+        trace_id, parent_id, sampled = parent
+    elif current:
+        trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < config.TRACE_SAMPLE_RATE
+    return Span(name, kind, trace_id, parent_id, sampled, config.TRACE_SERVICE_NAME, tags)
+
+
+def _end_span(span):
+    span.finish()
+    if span.sampled:
+        exporter.export(span)
+
+
+@contextmanager
+def start_span(name, kind="INTERNAL", tags=None, remote_service=None):
+    """Span hijo del span actual (o raiz de una traza nueva)."""
+    span = _new_span(name, kind, None, tags)
+    span.remote_service = remote_service
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_tag("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        _end_span(span)
+
+
+class TracingMiddleware:
+    """Middleware ASGI: span SERVER por peticion y `traceparent` en la respuesta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        span = _new_span(scope["method"], "SERVER", parent, {"http.method": scope["method"]})
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                span.set_tag("http.status_code", message["status"])
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"traceparent", span.traceparent.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except Exception as e:
+            span.set_tag("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            span.name = f"{scope['method']} {route}"
+            span.set_tag("http.route", route)
+            _end_span(span)
+
+
+def setup_tracing(app):
+    app.add_middleware(TracingMiddleware)
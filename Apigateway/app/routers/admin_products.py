@@ -1,62 +1,162 @@
-from fastapi import APIRouter, Header, Path, HTTPException
-from ..core.Auth import is_authenticated, is_admin
-import httpx
-import os 
+from typing import Literal, Optional
 
-PRODUCTS_SERVICE_URL = os.getenv("PRODUCTS_SERVICE_URL", "http://localhost:5000")
+import httpx
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, Path, HTTPException, Query, Request, Response
+from ..core import config
+from ..core.Auth import Principal, require_admin
+from ..core.cache import response_cache
+from ..core.http import ServiceClients, get_clients
+from ..core.proxy import proxy
 
 router = APIRouter(
     prefix="/admin/products",
     tags=["Admin Products"]
 )
 
+# Importaciones terminadas cuyo cache ya se purgo (una sola vez por trabajo).
+# Acotado: pasada una hora un trabajo viejo se olvida y, si alguien vuelve
+# a consultarlo, solo cuesta una purga mas
+IMPORT_FINISHED = ("done", "failed")
+_purged_imports = TTLCache(maxsize=1000, ttl=3600)
+
 @router.get("/getall")
 async def admin_get_products(
-    authorization: str = Header(...)):
+    format: Literal["json", "ndjson"] = Query("json"),
+    principal: Principal = Depends(require_admin),
+    clients: ServiceClients = Depends(get_clients)):
     """
     SOLO ADMIN
 
     Devuelve:
-    - Lista completa de productos
+    - Lista completa de productos: {"products": [...]} o, con
+      ?format=ndjson, un producto por linea. ProductMsvc la genera por
+      paginas y el gateway la reenvia en streaming sin decodificarla.
     """
-    print("peticion admin_get_products recibida")
-    role = is_admin(authorization)
-    if role != "admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{PRODUCTS_SERVICE_URL}/allproducts"
-            )
-        print("Response from product service:", response)
-        return response.json()
+        return await proxy(clients.products, "GET", "/allproducts", params={"format": format})
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
 
 # crear un producto 
 @router.post("/add")
 async def admin_create_product(
-    authorization: str = Header(...),
-    product_data: dict = None
+    principal: Principal = Depends(require_admin),
+    product_data: dict = None,
+    clients: ServiceClients = Depends(get_clients),
 ):
-    role = is_admin(authorization)
-    if role != "admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{PRODUCTS_SERVICE_URL}/add",
-                json=product_data
-            )
-        return response.json()
+        response = await proxy(
+            clients.products, "POST", "/add",
+            json=product_data
+        )
+        # El catalogo cambio: las busquedas cacheadas ya no son validas
+        response_cache.purge("search")
+        return response
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/import", status_code=202)
+async def admin_import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    mode: Literal["upsert", "update"] = Query("upsert"),
+    batch_size: Optional[int] = Query(None, gt=0),
+    principal: Principal = Depends(require_admin),
+    clients: ServiceClients = Depends(get_clients),
+):
+    """
+    SOLO ADMIN
+
+    Body:
+    - Archivo CSV (con cabecera) o NDJSON, un producto por fila. El
+      formato sale de ?format= o del Content-Type (text/csv,
+      application/x-ndjson)
+
+    Query:
+    - mode: "upsert" crea o actualiza por id; "update" solo edita existentes
+
+    Devuelve:
+    - 202 con el job_id; el progreso se consulta en /admin/products/import/{job_id}
+    """
+    params = {"mode": mode}
+    if format:
+        params["format"] = format
+    if batch_size:
+        params["batch_size"] = batch_size
+    headers = {}
+    if "content-type" in request.headers:
+        headers["Content-Type"] = request.headers["content-type"]
+
+    try:
+        # El cuerpo se reenvia en streaming, sin cargarlo en memoria
+        response = await proxy(
+            clients.products, "POST", "/products/import",
+            params=params,
+            content=request.stream(),
+            headers=headers,
+            timeout=httpx.Timeout(config.IMPORT_UPLOAD_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        )
+        # Las filas se escriben en segundo plano: el cache se purga cuando
+        # la consulta de estado ve el trabajo terminado
+        return response
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/import/{job_id}")
+async def admin_import_status(
+    job_id: int = Path(...),
+    principal: Principal = Depends(require_admin),
+    clients: ServiceClients = Depends(get_clients),
+):
+    """
+    SOLO ADMIN
+
+    Devuelve:
+    - Estado del trabajo de importacion: status, processed, written,
+      failed y los errores por fila
+
+    La primera consulta que ve el trabajo terminado purga las busquedas y
+    las fichas de producto cacheadas: la importacion no informa que ids
+    toco, asi que se purgan todas.
+    """
+    try:
+        response = await clients.products.get(f"/products/import/{job_id}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
+
+    if not response.is_success:
+        try:
+            detail = response.json()
+        except ValueError:
+            detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    status = response.json().get("datos", {}).get("status")
+    if status in IMPORT_FINISHED and job_id not in _purged_imports:
+        _purged_imports[job_id] = True
+        response_cache.purge("search", "product")
+    return Response(content=response.content, media_type="application/json")
+
+
 @router.get("/{product_id}")
 async def admin_get_product(
     product_id: int = Path(...),
-    authorization: str = Header(...)
+    principal: Principal = Depends(require_admin)
 ):
     """
     SOLO ADMIN
@@ -69,7 +169,7 @@ async def admin_get_product(
 
 @router.post("")
 async def admin_create_product(
-    authorization: str = Header(...)
+    principal: Principal = Depends(require_admin)
 ):
     """
     SOLO ADMIN
@@ -86,8 +186,9 @@ async def admin_create_product(
 @router.put("/edit/{product_id}")
 async def admin_update_product(
     product_id: int = Path(...),
-    authorization: str = Header(...),
-    product_data: dict = None
+    principal: Principal = Depends(require_admin),
+    product_data: dict = None,
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     SOLO ADMIN
@@ -98,16 +199,17 @@ async def admin_update_product(
     Devuelve:
     - Producto actualizado
     """
-    role = is_admin(authorization,)
-    if role != "admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.put(
-                f"{PRODUCTS_SERVICE_URL}/edit/{product_id}",
-                json=product_data
-            )
-        return response.json()
+        response = await proxy(
+            clients.products, "PUT", f"/edit/{product_id}",
+            json=product_data
+        )
+        response_cache.purge("search", f"product:{product_id}")
+        return response
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -115,7 +217,8 @@ async def admin_update_product(
 @router.delete("/delete/{product_id}")
 async def admin_delete_product(
     product_id: int = Path(...),
-    authorization: str = Header(...)
+    principal: Principal = Depends(require_admin),
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     SOLO ADMIN
@@ -124,14 +227,15 @@ async def admin_delete_product(
     - Mensaje de confirmación
     """
 
-    role = is_admin(authorization)
-    if role != "admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.delete(
-                f"{PRODUCTS_SERVICE_URL}/delete/{product_id}",
-            )
-        return response.json()
+        response = await proxy(
+            clients.products, "DELETE", f"/delete/{product_id}",
+        )
+        response_cache.purge("search", f"product:{product_id}")
+        return response
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"Products service unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,18 +1,45 @@
-import os
+import asyncio
+import logging
 
 import httpx
-from fastapi import APIRouter, Body, Header, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException
 
-from ..core.Auth import is_authenticated
+from ..core.Auth import Principal, get_principal
+from ..core.http import ServiceClients, get_clients
+from ..core.proxy import proxy
+from ..core.ratelimit import user_rate_limit
+from ..core.retry import idempotent_get
+from ..core.singleflight import singleflight
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
-CART_SERVICE_URL = os.getenv("CART_SERVICE_URL", "http://localhost:5001")
-PRODUCTS_SERVICE_URL = os.getenv("PRODUCTS_SERVICE_URL", "http://localhost:5000")
+logger = logging.getLogger(__name__)
 
 
-@router.post("")
-async def get_cart(authorization: str = Header(...)):
+async def _available(clients, product_id):
+    """
+    Stock menos las reservas activas de otras ordenes (/availability del
+    Product Service). None si no se pudo consultar.
+    """
+    try:
+        response = await idempotent_get(clients.products, "/availability", params={"ids": product_id})
+        if response.status_code == 200:
+            rows = response.json()["datos"]
+            return rows[0]["available"] if rows else None
+        logger.warning(
+            "availability no disponible",
+            extra={"product_id": product_id, "status": response.status_code},
+        )
+    except httpx.RequestError:
+        logger.warning("availability no disponible", extra={"product_id": product_id})
+    return None
+
+
+@router.post("", dependencies=[Depends(user_rate_limit("cart"))])
+async def get_cart(
+    principal: Principal = Depends(get_principal),
+    clients: ServiceClients = Depends(get_clients),
+):
     """
     USUARIO AUTENTICADO
 
@@ -22,20 +49,10 @@ async def get_cart(authorization: str = Header(...)):
     - Consulta el microservicio Cart vía POST
     """
     try:
-        # Validar token y obtener user_id
-        user_id = is_authenticated(authorization)
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                f"{CART_SERVICE_URL}/cart", json={"user_id": user_id}
-            )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code, detail=response.json()
-            )
+        # Token ya validado por get_principal
+        user_id = principal.id
 
-        return response.json()
+        return await proxy(clients.cart, "POST", "/cart", json={"user_id": user_id})
 
     except httpx.RequestError as e:
         raise HTTPException(
@@ -43,10 +60,11 @@ async def get_cart(authorization: str = Header(...)):
         )
 
 
-@router.post("/items")
+@router.post("/items", dependencies=[Depends(user_rate_limit("cart"))])
 async def add_to_cart(
-    authorization: str = Header(...),
+    principal: Principal = Depends(get_principal),
     body: dict = Body(...),
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     USUARIO AUTENTICADO
@@ -58,17 +76,17 @@ async def add_to_cart(
     }
     """
     try:
-        # 1. Autenticación
-        user_id = is_authenticated(authorization)
+        # 1. Usuario ya validado por get_principal
+        user_id = principal.id
 
         product_id = body["product_id"]
         quantity = body.get("quantity", 1)
 
-        # 2. Consultar microservicio Products
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            product_response = await client.get(
-                f"{PRODUCTS_SERVICE_URL}/products/{product_id}"
-            )
+        # 2. Consultar microservicio Products: producto y disponibilidad a la vez
+        product_response, available = await asyncio.gather(
+            singleflight.get(clients.products, f"/products/{product_id}"),
+            _available(clients, product_id),
+        )
 
         if product_response.status_code == 404:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
@@ -100,7 +118,12 @@ async def add_to_cart(
                 status_code=400, detail="La cantidad debe ser mayor a cero"
             )
 
-        if product.get("stock") is not None and quantity > product["stock"]:
+        # Lo apartado por otras ordenes no se puede comprar; si la
+        # disponibilidad no se pudo consultar se valida contra el stock
+        # (la reserva de /order/create vuelve a comprobarlo)
+        if available is None:
+            available = product.get("stock")
+        if available is not None and quantity > available:
             raise HTTPException(
                 status_code=400, detail="Cantidad solicitada no disponible"
             )
@@ -116,17 +139,7 @@ async def add_to_cart(
         }
 
         # 5. Enviar al microservicio Cart
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            cart_response = await client.post(
-                f"{CART_SERVICE_URL}/cart/add", json=payload
-            )
-
-        if cart_response.status_code != 200:
-            raise HTTPException(
-                status_code=cart_response.status_code, detail=cart_response.json()
-            )
-
-        return cart_response.json()
+        return await proxy(clients.cart, "POST", "/cart/add", json=payload)
 
     except KeyError:
         raise HTTPException(status_code=400, detail="product_id es requerido")
@@ -135,10 +148,11 @@ async def add_to_cart(
         raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
 
 
-@router.delete("/items")
+@router.delete("/items", dependencies=[Depends(user_rate_limit("cart"))])
 async def remove_from_cart(
-    authorization: str = Header(...),
+    principal: Principal = Depends(get_principal),
     body: dict = Body(...),
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     USUARIO AUTENTICADO
@@ -149,27 +163,15 @@ async def remove_from_cart(
     }
     """
     try:
-        # Validar token y obtener user_id
-        user_id = is_authenticated(authorization)
+        # Token ya validado por get_principal
+        user_id = principal.id
 
         payload = {
             "user_id": user_id,
             "product_id": body["product_id"],
         }
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.delete(
-                f"{CART_SERVICE_URL}/cart/remove",
-                params=payload,
-            )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=response.json(),
-            )
-
-        return response.json()
+        return await proxy(clients.cart, "DELETE", "/cart/remove", params=payload)
 
     except KeyError:
         raise HTTPException(
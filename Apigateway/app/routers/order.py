@@ -1,78 +1,135 @@
-import os
+import logging
 
 import httpx
-from fastapi import APIRouter, Body, Header, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
 
-from ..core.Auth import is_authenticated, is_admin
+from ..core.Auth import Principal, get_principal, get_principal_with_role
+from ..core.http import ServiceClients, get_clients
+from ..core.proxy import stream_response
+from ..core.ratelimit import user_rate_limit
+from ..core.retry import idempotent_get
 
 router = APIRouter(prefix="/order", tags=["order"])
 
-CART_SERVICE_URL = os.getenv("CART_SERVICE_URL", "http://localhost:5001")
-ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", "http://localhost:5002")
+logger = logging.getLogger(__name__)
 
-@router.post("/create")
-async def create_order(authorization: str = Header(...)):
+@router.post("/create", dependencies=[Depends(user_rate_limit("checkout"))])
+async def create_order(
+    principal: Principal = Depends(get_principal),
+    clients: ServiceClients = Depends(get_clients),
+):
     """
     1. Valida usuario
     2. Obtiene carrito
-    3. Crea orden
+    3. Crea orden y reserva su stock; sin stock la orden se cancela
     4. Vacía carrito, si primero se vaciase habria que ejecutar compensasion 
     """
     try:
-        # 1️⃣ Autenticación
-        user_id = is_authenticated(authorization)
+        # 1️⃣ Usuario ya validado por get_principal
+        user_id = principal.id
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        # 2️⃣ Obtener carrito
+        cart_response = await clients.cart.post(
+            "/cart",
+            json={"user_id": user_id}
+        )
 
-            # 2️⃣ Obtener carrito
-            cart_response = await client.post(
-                f"{CART_SERVICE_URL}/cart",
-                json={"user_id": user_id}
+        if cart_response.status_code != 200:
+            raise HTTPException(
+                status_code=400,
+                detail="Could not retrieve cart"
             )
 
-            if cart_response.status_code != 200:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Could not retrieve cart"
-                )
-
-            cart = cart_response.json()
-            items = cart.get("items", [])
-
-            if not items:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cart is empty"
-                )
-
-            # 3️⃣ Crear orden en Order Service
-            order_payload = {
-                "user_id": user_id,
-                "items": items
-            }
-
-            order_response = await client.post(
-                f"{ORDER_SERVICE_URL}/orders",
-                json=order_payload
+        cart = cart_response.json()
+        items = cart.get("items", [])
+
+        if not items:
+            raise HTTPException(
+                status_code=400,
+                detail="Cart is empty"
             )
 
-            if order_response.status_code != 201:
-                raise HTTPException(
-                    status_code=order_response.status_code,
-                    detail=order_response.json()
-                )
+        # 3️⃣ Crear orden en Order Service
+        order_payload = {
+            "user_id": user_id,
+            "items": items
+        }
+
+        order_response = await clients.order.post(
+            "/orders",
+            json=order_payload
+        )
 
-            order_data = order_response.json()
+        if order_response.status_code != 201:
+            raise HTTPException(
+                status_code=order_response.status_code,
+                detail=order_response.json()
+            )
 
-            # 4️⃣ Limpiar carrito
-            await client.post(
-                f"{CART_SERVICE_URL}/cart/clear",
-                json={"user_id": user_id}
+        order_data = order_response.json()
+
+        # 3️⃣.5 Reservar el stock de la orden (todo o nada, vence a los
+        # RESERVATION_TTL_SECONDS del Product Service si no se paga)
+        try:
+            reservation_response = await clients.products.post(
+                "/reservations",
+                json={
+                    "order_id": order_data["order_id"],
+                    "items": [
+                        {"product_id": item["product_id"], "quantity": item["quantity"]}
+                        for item in items
+                    ],
+                }
             )
+        except httpx.RequestError as e:
+            # Sin respuesta no se sabe si se reservo: la orden se cancela igual
+            reservation_response = None
+            detail = f"Products service unavailable: {str(e)}"
+
+        if reservation_response is None or reservation_response.status_code != 201:
+            # Compensación: la orden sin stock apartado se cancela y el
+            # carrito se conserva para que el usuario lo ajuste
+            await clients.order.patch(
+                f"/orders/{order_data['order_id']}",
+                json={"status": "cancelled"}
+            )
+            if reservation_response is None:
+                # Si la reserva llego a crearse no debe apartar stock hasta
+                # vencer; si esto tambien falla, vence a los TTL segundos
+                try:
+                    await clients.products.post(f"/reservations/{order_data['order_id']}/release")
+                except httpx.RequestError:
+                    logger.warning(
+                        "no se pudo liberar la reserva de la orden cancelada",
+                        extra={"order_id": order_data["order_id"]},
+                    )
+            else:
+                try:
+                    detail = reservation_response.json()
+                except ValueError:
+                    detail = reservation_response.text
+                if isinstance(detail, dict):
+                    detail = detail.get("error", detail)
+            logger.info(
+                "orden cancelada sin stock",
+                extra={"order_id": order_data["order_id"], "detail": detail},
+            )
+            unavailable = reservation_response is None or reservation_response.status_code >= 500
+            raise HTTPException(
+                status_code=503 if unavailable else 409,
+                detail=detail
+            )
+
+        # 4️⃣ Limpiar carrito
+        await clients.cart.post(
+            "/cart/clear",
+            json={"user_id": user_id}
+        )
 
         return {
             "message": "Order created successfully",
-            "order_id": order_data["order_id"]
+            "order_id": order_data["order_id"],
+            "reserved_until": reservation_response.json()["expires_at"]
         }
 
     except httpx.RequestError:
@@ -81,28 +138,27 @@ async def create_order(authorization: str = Header(...)):
             detail="Service unavailable"
         )
 
-@router.get("/check-pending")
-async def check_pending_order(authorization: str = Header(...)):
+@router.get("/check-pending", dependencies=[Depends(user_rate_limit("orders"))])
+async def check_pending_order(
+    principal: Principal = Depends(get_principal),
+    clients: ServiceClients = Depends(get_clients),
+):
     """
     Verifica si el usuario tiene una orden pendiente
     """
     try:
-        # 1️⃣ Validar usuario
-        user_id = is_authenticated(authorization)
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{ORDER_SERVICE_URL}/check-pending",
-                params={"user_id": user_id}
-            )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=response.json()
-            )
+        # 1️⃣ Usuario ya validado por get_principal
+        user_id = principal.id
+
+        response = await idempotent_get(
+            clients.order,
+            "/check-pending",
+            params={"user_id": user_id},
+            hedge=True,
+            stream=True,
+        )
 
-        return response.json()
+        return await stream_response(response)
 
     except httpx.RequestError:
         raise HTTPException(
@@ -110,31 +166,29 @@ async def check_pending_order(authorization: str = Header(...)):
             detail="Order service unavailable"
         )
 
-@router.get("/list")
-async def list_orders(authorization: str = Header(...)):
+@router.get("/list", dependencies=[Depends(user_rate_limit("orders"))])
+async def list_orders(
+    principal: Principal = Depends(get_principal_with_role),
+    clients: ServiceClients = Depends(get_clients),
+):
     """
     Lista todas las órdenes del usuario autenticado
     o todas si el usuario es admin
     """
     try:
-        # 1️⃣ Validar usuario
-        user_id = is_authenticated(authorization)
-        role = is_admin(authorization)
-        print("role founded", role)
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{ORDER_SERVICE_URL}/orderslist",
-                params={"user_id": user_id,
-                "role": role}
-            )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=response.json()
-            )
+        # 1️⃣ Usuario ya validado por get_principal
+        user_id = principal.id
+        role = principal.role
+        response = await idempotent_get(
+            clients.order,
+            "/orderslist",
+            params={"user_id": user_id,
+            "role": role},
+            hedge=True,
+            stream=True,
+        )
 
-        return response.json()
+        return await stream_response(response)
 
     except httpx.RequestError:
         raise HTTPException(
@@ -145,39 +199,52 @@ async def list_orders(authorization: str = Header(...)):
 @router.patch("/update/{order_id}/")
 async def update_order_status(
     order_id: int,
-    authorization: str = Header(...),
-    body: dict = Body(...)
+    principal: Principal = Depends(get_principal_with_role),
+    body: dict = Body(...),
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     Body:
     {
       "status": "completed" | "cancelled | shipped |" 
     }
+    Un usuario solo puede cambiar sus propias órdenes; un admin, cualquiera.
     """
-    try:
-        is_authenticated(authorization)
+    status = body.get("status")
+    if not status:
+        raise HTTPException(status_code=400, detail="status is required")
 
-        status = body.get("status")
-        if not status:
-            raise HTTPException(status_code=400, detail="status is required")
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.patch(
-                f"{ORDER_SERVICE_URL}/orders/{order_id}",
-                json={"status": status}
-            )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=response.json()
-            )
-
-        return response.json()
+    payload = {"status": status}
+    if principal.role != "admin":
+        # El Order Service responde 404 si la orden no es del usuario
+        payload["user_id"] = principal.id
 
+    try:
+        response = await clients.order.patch(f"/orders/{order_id}", json=payload)
     except httpx.RequestError:
         raise HTTPException(
             status_code=503,
             detail="Order service unavailable"
         )
 
+    if not response.is_success:
+        try:
+            detail = response.json()
+        except ValueError:
+            detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    if status == "cancelled":
+        # Devuelve el stock apartado (o ya descontado) por la orden. La orden
+        # ya esta cancelada: un fallo aqui no cambia la respuesta
+        try:
+            release = await clients.products.post(f"/reservations/{order_id}/release")
+            if release.status_code != 200:
+                logger.warning("no se pudo liberar la reserva", extra={"order_id": order_id})
+        except httpx.RequestError as e:
+            logger.warning(
+                "no se pudo liberar la reserva",
+                extra={"order_id": order_id, "error": str(e)},
+            )
+
+    return Response(content=response.content, media_type="application/json")
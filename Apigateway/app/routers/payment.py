@@ -1,23 +1,26 @@
-import os
+import logging
 import random
-import httpx
-from fastapi import APIRouter, Body, Header, HTTPException
 
-from ..core.Auth import is_authenticated,get_email
+from fastapi import APIRouter, Body, Depends, HTTPException
+
+from ..core.Auth import Principal, get_principal
+from ..core.cache import response_cache
+from ..core.http import ServiceClients, get_clients
+from ..core.ratelimit import user_rate_limit
+from ..core.retry import idempotent_get
 
 router = APIRouter(prefix="/payment", tags=["payment"])
 
-ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", "http://localhost:5002")
-PAYMENT_SERVICE_URL = os.getenv("PAYMENT_SERVICE_URL", "http://localhost:5003")
-PRODUCTS_SERVICE_URL = os.getenv("PRODUCTS_SERVICE_URL", "http://localhost:5000")
+logger = logging.getLogger(__name__)
 
 
 
 # esta api llamara a un microservicio de pagos en express que sera el encargado de gestionar los recibos y metodos de pago
-@router.post("/process-payment")
+@router.post("/process-payment", dependencies=[Depends(user_rate_limit("checkout"))])
 async def process_payment(
     payload: dict = Body(...),
-    authorization: str = Header(...)
+    principal: Principal = Depends(get_principal),
+    clients: ServiceClients = Depends(get_clients),
 ):
     """
     Payload:
@@ -27,89 +30,104 @@ async def process_payment(
     }
     """
 
-    # 1️⃣ Auth (NO compensable)
-    user_id = is_authenticated(authorization)
+    # 1️⃣ Auth (NO compensable), resuelta una sola vez por get_principal
+    user_id = principal.id
     ship_info = payload["ship_info"]
     address = ship_info.get("address","")
-    print("usuario validado")
-    print("llego esta address",address)
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-
-        # 2️⃣ Obtener orden pendiente
-        order_resp = await client.get(
-            f"{ORDER_SERVICE_URL}/check-pending",
-            params={"user_id": user_id}
-        )
 
-        if not order_resp.json()["has_pending"]:
-            raise HTTPException(400, "No pending order")
-
-        order = order_resp.json()["order"]
-        print("orden pendiente obtenida:")
-        # Flags para compensación
-        stock_reduced = False
-        receipt_created = False
-
-        try:
-            # 3️⃣ Reducir stock (COMPENSABLE)
-            stock_resp = await client.post(
-                f"{PRODUCTS_SERVICE_URL}/reduce-stock",
+    # 2️⃣ Obtener orden pendiente
+    order_resp = await idempotent_get(
+        clients.order,
+        "/check-pending",
+        params={"user_id": user_id}
+    )
+
+    if not order_resp.json()["has_pending"]:
+        raise HTTPException(400, "No pending order")
+
+    order = order_resp.json()["order"]
+    logger.info("orden pendiente obtenida", extra={"order_id": order["id"]})
+    # Flags para compensación
+    stock_committed = False
+    receipt_created = False
+    # Orden creada antes de las reservas: se compensa con /restore-stock
+    legacy_stock = False
+
+    try:
+        # 3️⃣ Confirmar la reserva: descuenta el stock apartado (COMPENSABLE)
+        stock_resp = await clients.products.post(f"/reservations/{order['id']}/confirm")
+        if stock_resp.status_code == 404:
+            legacy_stock = True
+            stock_resp = await clients.products.post(
+                "/reduce-stock",
                 json={"items": order["order_items"]}
             )
-            stock_reduced = True
-            print("stock reducido exitosamente")
-            # 4️⃣ Simular pasarela de pago (NO compensable)
-            if random.random() < 0.3:
-                print("fallo en la pasarela de pago")
-                raise Exception("Payment gateway rejected the transaction")
-
-            # 4️⃣.5 Agregar dirección a la orden
-            address_resp = await client.patch(
-                f"{ORDER_SERVICE_URL}/address/{order['id']}",
-                json={"address": address}
-            )
-            print("dirección agregada a la orden exitosamente")
-
-            # 5️⃣ Crear recibo (COMPENSABLE)
-            email = get_email(authorization)
-            print(payload["paymentInfo"])
-            receipt_resp = await client.post(
-                f"{PAYMENT_SERVICE_URL}/receipts",
-                json={
-                    "order_id": order["id"],
-                    "user_id": user_id,
-                    "amount": order["total_price"],
-                    "payment_info": payload["paymentInfo"],
-                    "ship_info": payload["ship_info"],
-                    "receipt_items": order["order_items"],
-                    "user_email": email
-                }
-            )
-            receipt_id = receipt_resp.json()["receipt_id"]
-            receipt_created = True
+        # Todo o nada: si falla no se desconto ningun item y no hay que restaurar
+        if stock_resp.status_code != 200:
+            raise Exception(stock_resp.json().get("error", "Stock reduction failed"))
+        stock_committed = True
+        # El detalle cacheado de estos productos muestra stock viejo
+        response_cache.purge(*(f"product:{item['product_id']}" for item in order["order_items"]))
+        logger.info("stock confirmado", extra={"order_id": order["id"]})
+
+        # 4️⃣ Simular pasarela de pago (NO compensable)
+        # Va despues del stock: un cobro no se puede deshacer, el stock si
+        if random.random() < 0.3:
+            logger.warning("fallo en la pasarela de pago", extra={"order_id": order["id"]})
+            raise Exception("Payment gateway rejected the transaction")
+
+        # 4️⃣.5 Agregar dirección a la orden
+        address_resp = await clients.order.patch(
+            f"/address/{order['id']}",
+            json={"address": address}
+        )
+        logger.info("direccion agregada a la orden", extra={"order_id": order["id"]})
+
+        # 5️⃣ Crear recibo (COMPENSABLE)
+        email = principal.email
+        if not email:
+            raise HTTPException(401, "no se obtuvo el email desde la base de datos")
+        receipt_resp = await clients.payment.post(
+            "/receipts",
+            json={
+                "order_id": order["id"],
+                "user_id": user_id,
+                "amount": order["total_price"],
+                "payment_info": payload["paymentInfo"],
+                "ship_info": payload["ship_info"],
+                "receipt_items": order["order_items"],
+                "user_email": email
+            }
+        )
+        receipt_id = receipt_resp.json()["receipt_id"]
+        receipt_created = True
 
-            # 6️⃣ Actualizar orden a PAID (COMPENSABLE)
-            await client.patch(
-                f"{ORDER_SERVICE_URL}/orders/{order['id']}",
-                json={"status": "paid"}
-            )
+        # 6️⃣ Actualizar orden a PAID (COMPENSABLE)
+        await clients.order.patch(
+            f"/orders/{order['id']}",
+            json={"status": "paid"}
+        )
 
-        except Exception as e:
-            # 🔁 COMPENSACIONES
-            if receipt_created:
-                await client.delete(
-                    f"{PAYMENT_SERVICE_URL}/receipts/{receipt_id}"
-                )
+    except Exception as e:
+        # 🔁 COMPENSACIONES
+        if receipt_created:
+            await clients.payment.delete(
+                f"/receipts/{receipt_id}"
+            )
 
-            if stock_reduced:
-                await client.post(
-                    f"{PRODUCTS_SERVICE_URL}/restore-stock",
+        if stock_committed:
+            if legacy_stock:
+                await clients.products.post(
+                    "/restore-stock",
                     json={"items": order["order_items"]}
                 )
-                print("stock restaurado exitosamente")
+            else:
+                # Libera la reserva confirmada y devuelve su stock
+                await clients.products.post(f"/reservations/{order['id']}/release")
+            response_cache.purge(*(f"product:{item['product_id']}" for item in order["order_items"]))
+            logger.warning("stock restaurado tras fallo del pago", extra={"order_id": order["id"]})
 
-            raise HTTPException(400, str(e))
+        raise HTTPException(400, str(e))
 
 
     return {
@@ -1,40 +1,55 @@
-import os
-from typing import Optional
-import os 
+from typing import List, Literal, Optional
+
 import httpx
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, Request
 
-router = APIRouter(prefix="/products", tags=["Products"])
+from ..core import config
+from ..core.cache import cache_key, response_cache
+from ..core.http import ServiceClients, get_clients
+from ..core.proxy import proxy
+from ..core.ratelimit import rate_limit
+from ..core.singleflight import singleflight
 
-PRODUCTS_SERVICE_URL = os.getenv("PRODUCTS_SERVICE_URL", "http://localhost:5000")
+router = APIRouter(prefix="/products", tags=["Products"])
 
-@router.get("/search")
+@router.get("/search", dependencies=[Depends(rate_limit("catalog"))])
 async def search_products(
+    request: Request,
     category: Optional[str] = Query(None),
     keyword: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
     max_price: Optional[float] = Query(None),
     page: int = Query(1),
     page_size: int = Query(8),
+    cursor: Optional[str] = Query(None, description="Paginación por cursor: vacío para la primera página, luego next_cursor"),
+    count: Optional[Literal["exact", "planned", "estimated", "none"]] = Query(None),
+    facets: Optional[str] = Query(None, description="Agregados en la respuesta: category, price o category,price"),
+    clients: ServiceClients = Depends(get_clients),
 ):
     params = {
         "category": category,
         "keyword": keyword,
         "min_price": min_price,
         "max_price": max_price,
-        "page": page,
         "page_size": page_size,
+        "cursor": cursor,
+        "count": count,
+        "facets": facets,
     }
+    # Con cursor la pagina no aplica: no se envia ni separa entradas del cache
+    if cursor is None:
+        params["page"] = page
 
     # Elimina los parámetros None para no enviarlos
     params = {k: v for k, v in params.items() if v is not None}
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{PRODUCTS_SERVICE_URL}/products/search",
-                params=params,
-            )
+    async def fetch():
+        response = await singleflight.get(
+            clients.products,
+            "/products/search",
+            params=params,
+            hedge=True,
+        )
 
         # Si el microservicio responde con error
         if response.status_code != 200:
@@ -42,7 +57,16 @@ async def search_products(
                 status_code=response.status_code, detail=response.json()
             )
 
-        return response.json()
+        return response.content
+
+    try:
+        return await response_cache.serve(
+            request,
+            cache_key("search", params),
+            ttl=config.CACHE_TTL_PRODUCT_SEARCH,
+            fetch=fetch,
+            tags=("search",),
+        )
 
     except httpx.RequestError as e:
         raise HTTPException(
@@ -50,11 +74,41 @@ async def search_products(
         )
 
 
-@router.get("/{product_id}")
-async def get_product_detail(product_id: int = Path(..., gt=0)):
+@router.post("/batch", dependencies=[Depends(rate_limit("catalog"))])
+async def get_products_batch(
+    ids: List[int] = Body(..., embed=True, min_length=1),
+    fields: Optional[List[str]] = Body(None, embed=True),
+    clients: ServiceClients = Depends(get_clients),
+):
+    """
+    Varios productos en una sola llamada a ProductMsvc.
+
+    Body: {"ids": [1, 2, 3], "fields": ["id", "name", "price"] (opcional)}
+    Respuesta: {"exito": true, "datos": [...], "no_encontrados": [...]}
+    """
+    payload = {"ids": ids}
+    if fields is not None:
+        payload["fields"] = fields
+
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{PRODUCTS_SERVICE_URL}/products/{product_id}")
+        return await proxy(clients.products, "POST", "/products/batch", json=payload)
+
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=503, detail=f"Products service unavailable: {str(e)}"
+        )
+
+
+@router.get("/{product_id}", dependencies=[Depends(rate_limit("catalog"))])
+async def get_product_detail(
+    request: Request,
+    product_id: int = Path(..., gt=0),
+    clients: ServiceClients = Depends(get_clients),
+):
+    async def fetch():
+        response = await singleflight.get(
+            clients.products, f"/products/{product_id}", hedge=True
+        )
 
         if response.status_code == 404:
             raise HTTPException(status_code=404, detail="Producto no encontrado")
@@ -62,8 +116,17 @@ async def get_product_detail(product_id: int = Path(..., gt=0)):
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail=response.text)
 
-        print(response.json())
-        return response.json()
+        return response.content
+
+    try:
+        return await response_cache.serve(
+            request,
+            cache_key(f"product:{product_id}", {}),
+            ttl=config.CACHE_TTL_PRODUCT_DETAIL,
+            fetch=fetch,
+            # "product": todas las fichas, para purgas masivas (importaciones)
+            tags=(f"product:{product_id}", "product"),
+        )
 
     except httpx.RequestError as e:
         raise HTTPException(
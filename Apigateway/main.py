@@ -1,16 +1,40 @@
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
 from supabase_auth.types import User
 
-from app.core.Auth import is_authenticated
+from app.core.Auth import Principal, get_principal
 from app.core.config import supabase
+from app.core.compression import setup_compression
 from app.core.cors import setup_cors
+from app.core.http import ServiceClients, get_clients, lifespan
+from app.core.log import setup_logging
+from app.core.metrics import setup_metrics
+from app.core.ratelimit import setup_rate_limit
+from app.core.resilience import ServiceUnavailableError
+from app.core.tracing import setup_tracing
 from app.routers import admin_products, cart, products,order,payment
 
-app = FastAPI(title="API Gateway")
+# orjson serializa los dicts que devuelven las rutas mas rapido que json
+app = FastAPI(title="API Gateway", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 setup_cors(app)
 
+# Cabeceras RateLimit-* de las rutas limitadas (ver app/core/ratelimit.py)
+setup_rate_limit(app)
+
+# gzip/brotli segun Accept-Encoding
+setup_compression(app)
+
+# Metricas Prometheus en /metrics
+setup_metrics(app)
+
+# Logs JSON con cola; va dentro de las trazas para incluir trace_id
+setup_logging(app)
+
+# Trazas distribuidas (traceparent hacia los microservicios)
+setup_tracing(app)
+
 # Routers
 app.include_router(products.router)
 app.include_router(admin_products.router)
@@ -18,15 +42,23 @@ app.include_router(cart.router)
 app.include_router(order.router)
 app.include_router(payment.router)
 
+# Circuito abierto o bulkhead lleno fuera de un try de los routers
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
 @app.get("/example")
-async def ruta_protegida(authorization: str = Header(None)):
-    Userid = is_authenticated(authorization)
-    if not Userid:
-        raise HTTPException(status_code=401, detail="No autorizado")
-    else:
-        return {"mensaje": "Acceso permitido", "usuario": Userid}
+async def ruta_protegida(principal: Principal = Depends(get_principal)):
+    return {"mensaje": "Acceso permitido", "usuario": principal.id}
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "OK"}
+
+
+@app.get("/health/circuits")
+async def circuits_status(clients: ServiceClients = Depends(get_clients)):
+    """Estado de los circuit breakers y bulkheads por microservicio."""
+    return clients.circuits()
@@ -0,0 +1,30 @@
+#!/bin/sh
+# APP_ENV=production: varios workers uvicorn con uvloop y httptools.
+# Cualquier otro valor: un proceso con --reload para desarrollo.
+set -e
+export PORT="${PORT:-8000}"
+
+if [ "$APP_ENV" = "production" ]; then
+    # Exportado: los workers lo leen para repartir los limites del rate
+    # limit en memoria (ver RATE_LIMIT_WORKERS en app/core/config.py)
+    export WEB_CONCURRENCY="${WEB_CONCURRENCY:-$(nproc)}"
+    # Cada worker escribe sus metricas aqui y /metrics las agrega
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    # Los workers se anuncian aqui las purgas del cache de respuestas
+    export RESPONSE_CACHE_SYNC_DIR="${RESPONSE_CACHE_SYNC_DIR:-/tmp/response-cache-sync}"
+    rm -rf "$RESPONSE_CACHE_SYNC_DIR"
+    mkdir -p "$RESPONSE_CACHE_SYNC_DIR"
+    # exec: uvicorn recibe SIGTERM directamente; cada worker deja de aceptar
+    # conexiones, termina las peticiones en curso y cierra los pools (lifespan)
+    exec uvicorn main:app \
+        --host 0.0.0.0 --port "$PORT" \
+        --workers "$WEB_CONCURRENCY" \
+        --loop uvloop --http httptools \
+        --timeout-keep-alive "${KEEPALIVE_TIMEOUT:-5}" \
+        --timeout-graceful-shutdown "${GRACEFUL_TIMEOUT:-20}" \
+        --no-access-log
+fi
+
+exec uvicorn main:app --host 0.0.0.0 --port "$PORT" --reload
@@ -0,0 +1,98 @@
+"""
+Benchmark: cliente httpx nuevo por peticion vs cliente compartido con pool.
+
+Levanta un backend HTTP/1.1 local (o usa --url) y mide p50/p99 de ambos
+patrones con la misma concurrencia.
+
+    python test/benchHttpPool.py --requests 2000 --concurrency 50
+    python test/benchHttpPool.py --url http://localhost:5000/health
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_backend():
+    ThreadingHTTPServer.request_queue_size = 512
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/health"
+
+
+async def run(url, total, concurrency, shared):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    pooled = httpx.AsyncClient(timeout=10.0, limits=limits) if shared else None
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if shared:
+                response = await pooled.get(url)
+            else:
+                # Patron anterior de los routers
+                async with httpx.AsyncClient(timeout=10.0) as client:
+                    response = await client.get(url)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    if pooled:
+        await pooled.aclose()
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "rps": total / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = start_backend()
+
+    for name, shared in (("cliente por peticion", False), ("cliente compartido", True)):
+        result = asyncio.run(run(url, args.requests, args.concurrency, shared))
+        print(
+            f"{name:<22} p50={result['p50']:.2f}ms "
+            f"p99={result['p99']:.2f}ms rps={result['rps']:.0f}"
+        )
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: serializacion (json vs orjson) y bytes enviados (sin comprimir,
+gzip, brotli) para payloads grandes de catalogo y de ordenes.
+
+    python test/benchSerialization.py
+    python test/benchSerialization.py --products 5000 --orders 2000 --repeat 20
+"""
+import argparse
+import gzip
+import random
+import statistics
+import time
+
+import brotli
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def catalog(size):
+    categories = ["Running", "Futbol", "Basket", "Training", "Casual"]
+    return {
+        "products": [
+            {
+                "id": i,
+                "name": f"Zapatilla modelo {i}",
+                "description": "Zapatilla ligera con suela de goma y malla transpirable. " * 3,
+                "price": round(random.uniform(20, 250), 2),
+                "category": random.choice(categories),
+                "stock": random.randint(0, 500),
+                "imageurl": f"https://cdn.example.com/products/{i}.webp",
+            }
+            for i in range(size)
+        ]
+    }
+
+
+def orders(size):
+    return [
+        {
+            "id": i,
+            "user_id": f"3f0c5d2e-8a4b-4c1d-9e7f-{i:012d}",
+            "status": random.choice(["pending", "paid", "cancelled"]),
+            "total_price": round(random.uniform(20, 900), 2),
+            "created_at": "2025-11-03T18:25:43.511Z",
+            "address": "Calle Falsa 123, Santiago",
+            "order_items": [
+                {"product_id": random.randint(1, 5000), "quantity": random.randint(1, 4), "price": 59.9}
+                for _ in range(random.randint(1, 6))
+            ],
+        }
+        for i in range(size)
+    ]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def report(name, payload, repeat):
+    json_ms, body = timed(lambda: JSONResponse(payload).body, repeat)
+    orjson_ms, _ = timed(lambda: ORJSONResponse(payload).body, repeat)
+    gzip_ms, gzipped = timed(lambda: gzip.compress(body, 6), repeat)
+    br_ms, brotlied = timed(lambda: brotli.compress(body, quality=4), repeat)
+
+    print(f"{name}")
+    print(f"  serializar  json   {json_ms:8.2f} ms")
+    print(f"              orjson {orjson_ms:8.2f} ms  ({json_ms / orjson_ms:.1f}x)")
+    print(f"  bytes       plano  {len(body):>10,}")
+    print(f"              gzip   {len(gzipped):>10,}  ({len(body) / len(gzipped):.1f}x, {gzip_ms:.2f} ms)")
+    print(f"              br     {len(brotlied):>10,}  ({len(body) / len(brotlied):.1f}x, {br_ms:.2f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(7)
+    report(f"/admin/products/getall ({args.products} productos)", catalog(args.products), args.repeat)
+    report(f"/order/list como admin ({args.orders} ordenes)", orders(args.orders), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: perfil de desarrollo vs produccion (start.sh con APP_ENV).
+
+Arranca el servicio con cada perfil, espera a /health y lanza la misma
+carga contra la ruta indicada. Desarrollo: uvicorn --reload / flask run
+con debug. Produccion: uvicorn con workers + uvloop/httptools / gunicorn.
+
+    python test/benchServing.py --service gateway --requests 5000 --concurrency 64
+    python test/benchServing.py --service product --path /health
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SERVICES = {
+    "gateway": ("Apigateway", 8000),
+    "product": ("ProductMsvc", 5000),
+    "cart": ("cartService", 5001),
+    "order": ("OrderService", 5002),
+}
+
+
+def start(service, profile, port):
+    directory, _ = SERVICES[service]
+    env = {
+        **os.environ,
+        "APP_ENV": profile,
+        "PORT": str(port),
+        "LOG_ACCESS": "false",
+        "HTTP_PREWARM_CONNECTIONS": "0",
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    env.setdefault("VITE_SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("VITE_SUPABASE_ANON_KEY", "bench")
+    return subprocess.Popen(
+        ["sh", "start.sh"],
+        cwd=os.path.join(ROOT, directory),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+async def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no respondio en {timeout}s")
+
+
+async def load(url, requests, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def run(args):
+    _, port = SERVICES[args.service]
+    port += 1000
+    for profile in ("development", "production"):
+        process = start(args.service, profile, port)
+        try:
+            await wait_ready(f"http://127.0.0.1:{port}/health")
+            await load(f"http://127.0.0.1:{port}{args.path}", 200, args.concurrency)
+            result = await load(f"http://127.0.0.1:{port}{args.path}", args.requests, args.concurrency)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=30)
+        print(
+            f"{args.service:8} {profile:12} {result['rps']:8.0f} req/s  "
+            f"p50 {result['p50']:7.2f} ms  p99 {result['p99']:7.2f} ms  errores {result['errors']}"
+        )
+        await asyncio.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--service", choices=SERVICES, default="gateway")
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import httpx
+import pytest
+
+# Los tests unitarios importan el gateway directamente, sin .env real
+os.environ.setdefault("VITE_SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_JWKS_URL", "")
+# Las pruebas de carga no deben chocar con el limitador; testRateLimit lo activa
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def downstream():
+    """
+    Sustituye los microservicios por handlers en memoria.
+    Uso: downstream["products"] = lambda request: httpx.Response(200, json=...)
+    """
+    from app.core import config
+    from app.core.http import ServiceClients
+    from main import app
+
+    handlers = {}
+    services = {
+        httpx.URL(config.PRODUCTS_SERVICE_URL).netloc: "products",
+        httpx.URL(config.CART_SERVICE_URL).netloc: "cart",
+        httpx.URL(config.ORDER_SERVICE_URL).netloc: "order",
+        httpx.URL(config.PAYMENT_SERVICE_URL).netloc: "payment",
+    }
+
+    async def dispatch(request):
+        response = handlers[services[request.url.netloc]](request)
+        if hasattr(response, "__await__"):
+            response = await response
+        return response
+
+    app.state.clients = ServiceClients(transport=httpx.MockTransport(dispatch))
+    yield handlers
+    del app.state.clients
+
+
+@pytest.fixture
+async def gateway():
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        yield client
@@ -0,0 +1,88 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from app.core import Auth
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+
+
+def make_token(**overrides):
+    claims = {
+        "sub": "user-123",
+        "email": "user@test.com",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+    claims.update(overrides)
+    return "Bearer " + jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+class RemoteAuthCalled(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def local_secret(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    Auth._token_cache.clear()
+
+    def fail_remote(token):
+        raise RemoteAuthCalled()
+
+    monkeypatch.setattr(Auth.supabase.auth, "get_user", fail_remote)
+
+
+@pytest.mark.anyio
+async def test_valid_token_is_verified_locally():
+    authorization = make_token()
+    principal = await Auth.resolve_principal(authorization)
+    assert principal.id == "user-123"
+    assert principal.email == "user@test.com"
+
+
+@pytest.mark.anyio
+async def test_expired_token_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        await Auth.resolve_principal(make_token(exp=int(time.time()) - 10))
+    assert error.value.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_wrong_audience_or_signature_is_rejected():
+    with pytest.raises(HTTPException):
+        await Auth.resolve_principal(make_token(aud="anon-service"))
+
+    forged = jwt.encode({"sub": "x", "aud": "authenticated", "exp": int(time.time()) + 60},
+                        "otro-secreto-de-al-menos-32-bytes!!", algorithm="HS256")
+    with pytest.raises(HTTPException):
+        await Auth.resolve_principal("Bearer " + forged)
+
+
+@pytest.mark.anyio
+async def test_verified_claims_are_cached(monkeypatch):
+    authorization = make_token()
+    await Auth.resolve_principal(authorization)
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("el token no deberia volver a verificarse")
+
+    monkeypatch.setattr(Auth, "_verify_locally", fail_decode)
+    assert (await Auth.resolve_principal(authorization)).id == "user-123"
+
+
+@pytest.mark.anyio
+async def test_falls_back_to_supabase_without_local_key(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", None)
+
+    class User:
+        id = "user-remote"
+        email = "remote@test.com"
+
+    class Response:
+        user = User()
+
+    monkeypatch.setattr(Auth.supabase.auth, "get_user", lambda token: Response())
+    assert (await Auth.resolve_principal(make_token())).id == "user-remote"
@@ -0,0 +1,83 @@
+import time
+
+import anyio
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+from main import app
+
+SLOW_AUTH_SECONDS = 0.3
+
+
+class User:
+    def __init__(self, token):
+        self.id = f"user-{token[-6:]}"
+        self.email = "slow@test.com"
+
+
+class Response:
+    def __init__(self, token):
+        self.user = User(token)
+
+
+@pytest.fixture(autouse=True)
+def slow_supabase(monkeypatch):
+    # Sin clave local: todas las peticiones caen en el fallback por red
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", None)
+    Auth._token_cache.clear()
+
+    def slow_get_user(token):
+        time.sleep(SLOW_AUTH_SECONDS)
+        return Response(token)
+
+    monkeypatch.setattr(Auth.supabase.auth, "get_user", slow_get_user)
+
+
+def token(n):
+    return jwt.encode({"sub": str(n), "exp": int(time.time()) + 60, "n": n}, "k" * 32)
+
+
+@pytest.mark.anyio
+async def test_slow_auth_does_not_serialize_requests():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        statuses = []
+
+        async def call(n):
+            response = await client.get("/example", headers={"Authorization": f"Bearer {token(n)}"})
+            statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            for n in range(10):
+                tg.start_soon(call, n)
+        elapsed = time.perf_counter() - start
+
+    assert statuses == [200] * 10
+    # En serie serian 10 * 0.3s = 3s
+    assert elapsed < SLOW_AUTH_SECONDS * 3
+
+
+@pytest.mark.anyio
+async def test_event_loop_stays_responsive_during_slow_auth():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        health_latency = None
+
+        async def health():
+            nonlocal health_latency
+            await anyio.sleep(0.05)
+            start = time.perf_counter()
+            await client.get("/health")
+            health_latency = time.perf_counter() - start
+
+        async def slow_request():
+            await client.get("/example", headers={"Authorization": f"Bearer {token(1)}"})
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(slow_request)
+            tg.start_soon(health)
+
+    assert health_latency < SLOW_AUTH_SECONDS / 2
@@ -0,0 +1,74 @@
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+AUTHORIZATION = "Bearer " + jwt.encode(
+    {"sub": "user-1", "email": "user@test.com", "aud": "authenticated",
+     "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+PRODUCT = {"id": 1, "name": "Teclado", "price": 80, "imageurl": "x.png", "stock": 5}
+
+
+@pytest.fixture(autouse=True)
+def auth(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    Auth._token_cache.clear()
+
+
+@pytest.fixture
+def cart_calls(downstream):
+    calls = []
+
+    def cart(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, json={"exito": True})
+
+    downstream["cart"] = cart
+    return calls
+
+
+def products_service(downstream, availability):
+    def handler(request):
+        if request.url.path == "/availability":
+            return availability(request)
+        return httpx.Response(200, json={"exito": True, "datos": PRODUCT})
+
+    downstream["products"] = handler
+
+
+async def add(gateway, quantity):
+    return await gateway.post(
+        "/cart/items",
+        json={"product_id": 1, "quantity": quantity},
+        headers={"Authorization": AUTHORIZATION},
+    )
+
+
+@pytest.mark.anyio
+async def test_units_held_by_other_orders_cannot_be_added(gateway, downstream, cart_calls):
+    products_service(downstream, lambda request: httpx.Response(
+        200, json={"exito": True, "datos": [{"product_id": 1, "stock": 5, "held": 3, "available": 2}]}
+    ))
+
+    rejected = await add(gateway, 3)
+    accepted = await add(gateway, 2)
+
+    assert rejected.status_code == 400
+    assert accepted.status_code == 200
+    assert [call["quantity"] for call in cart_calls] == [2]
+
+
+@pytest.mark.anyio
+async def test_stock_is_checked_when_availability_fails(gateway, downstream, cart_calls):
+    products_service(downstream, lambda request: httpx.Response(500, json={"exito": False}))
+
+    assert (await add(gateway, 6)).status_code == 400
+    assert (await add(gateway, 5)).status_code == 200
@@ -0,0 +1,71 @@
+import json
+
+import httpx
+import pytest
+
+from app.core import config
+from app.core.compression import choose_encoding
+
+CATALOG = {"products": [{"id": i, "name": f"Producto {i}", "price": 10.5} for i in range(200)]}
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+    assert choose_encoding("*") == "br"
+
+
+@pytest.mark.anyio
+async def test_large_json_is_compressed_with_negotiated_encoding(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(200, json=CATALOG)
+
+    br = await gateway.get("/products/search", headers={"Accept-Encoding": "br"})
+    gz = await gateway.get("/products/search", headers={"Accept-Encoding": "gzip"})
+
+    # httpx descomprime: se compara el JSON y los bytes realmente recibidos
+    plain_size = len(json.dumps(CATALOG))
+    assert br.headers["content-encoding"] == "br"
+    assert br.json() == CATALOG
+    assert br.num_bytes_downloaded < plain_size / 5
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.json() == CATALOG
+    assert gz.num_bytes_downloaded < plain_size / 5
+    assert gz.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.anyio
+async def test_small_bodies_are_sent_uncompressed(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(200, json={"exito": True, "datos": {}})
+
+    response = await gateway.get("/products/7", headers={"Accept-Encoding": "gzip, br"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"exito": True, "datos": {}}
+
+
+@pytest.mark.anyio
+async def test_compressed_etag_is_weak_and_still_revalidates(gateway, downstream, monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", True)
+    from app.core.cache import response_cache
+
+    response_cache.clear()
+    downstream["products"] = lambda request: httpx.Response(200, json=CATALOG)
+
+    first = await gateway.get("/products/search?keyword=etag", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    second = await gateway.get(
+        "/products/search?keyword=etag",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+
+    assert etag.startswith('W/"')
+    assert second.status_code == 304
+    response_cache.clear()
@@ -0,0 +1,53 @@
+import pytest
+
+from app.core import invalidation
+from app.core.invalidation import InvalidationLog
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "purges.log")
+
+
+def worker(path, pid, **kwargs):
+    log = InvalidationLog(path, **kwargs)
+    log.pid = pid
+    return log
+
+
+def test_workers_receive_the_tags_purged_by_the_others(path):
+    first, second = worker(path, 101), worker(path, 102)
+    first.poll()
+    second.poll()
+
+    first.publish(["search", "product:1", "search"])
+    second.publish(["product:2"])
+
+    assert first.poll() == ["product:2"]
+    assert second.poll() == ["search", "product:1"]
+    assert first.poll() == second.poll() == []
+
+
+def test_long_purges_are_split_into_bounded_lines(path, monkeypatch):
+    monkeypatch.setattr(invalidation, "MAX_LINE_BYTES", 24)
+    reader = worker(path, 102)
+    reader.poll()
+    tags = [f"product:{id}" for id in range(10)]
+
+    worker(path, 101).publish(tags)
+
+    with open(path) as log:
+        assert all(len(line) <= 24 for line in log)
+    assert reader.poll() == tags
+
+
+def test_readers_follow_the_log_across_a_rotation(path):
+    writer, reader = worker(path, 101, max_bytes=16), worker(path, 102)
+    reader.poll()
+
+    # La segunda linea pasa de max_bytes: el fichero se borra tras escribirla
+    writer.publish(["search"])
+    writer.publish(["product:1", "product:2"])
+    writer.publish(["product:3"])
+
+    assert reader.poll() == ["search", "product:1", "product:2", "product:3"]
@@ -0,0 +1,65 @@
+import json
+import logging
+import queue
+
+from app.core import log
+
+
+def make_handler():
+    return log.SampledQueueHandler(queue.Queue(10), max_field_chars=50, trace_id=lambda: "t" * 32)
+
+
+def record(level=logging.INFO, **extra):
+    return logging.getLogger("test").makeRecord("test", level, __file__, 1, "mensaje %s", ("x",), None, extra=extra)
+
+
+def test_large_payloads_are_summarised_without_walking_them():
+    orders = [{"id": i, "items": list(range(100))} for i in range(100_000)]
+    handler = make_handler()
+
+    prepared = handler.prepare(record(orders=orders, note="a" * 500))
+
+    assert prepared.msg == "mensaje x"
+    assert len(prepared.orders) < 120
+    assert prepared.note.endswith("...[450 truncados]")
+    assert prepared.trace_id == "t" * 32
+
+
+def test_sampling_drops_info_but_keeps_warnings():
+    handler = make_handler()
+    token = log.begin_request("/health", log.parse_sample_rates("/health=0,/products=1"))
+    try:
+        assert not handler.filter(record(logging.INFO))
+        assert handler.filter(record(logging.WARNING))
+    finally:
+        log.end_request(token)
+
+    assert handler.filter(record(logging.INFO))
+
+
+def test_sample_rate_uses_longest_prefix():
+    rates = log.parse_sample_rates("/products=1, /products/search=0.05")
+
+    assert log.sample_rate("/products/search", rates) == 0.05
+    assert log.sample_rate("/products/7", rates) == 1
+    assert log.sample_rate("/cart", rates) == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = log.SampledQueueHandler(queue.Queue(1), max_field_chars=50, trace_id=lambda: None)
+
+    handler.handle(record())
+    handler.handle(record())
+
+    assert handler.dropped == 1
+
+
+def test_formatter_emits_one_json_object_with_extra_fields():
+    prepared = make_handler().prepare(record(order_id=7))
+
+    line = json.loads(log.JsonFormatter("api-gateway").format(prepared))
+
+    assert line["msg"] == "mensaje x"
+    assert line["service"] == "api-gateway"
+    assert line["order_id"] == 7
+    assert line["trace_id"] == "t" * 32
@@ -0,0 +1,23 @@
+import httpx
+import pytest
+
+from app.core import config
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_exposes_route_and_downstream_series(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(200, json={"exito": True, "datos": {}})
+
+    await gateway.get("/products/7")
+    body = (await gateway.get("/metrics")).text
+
+    assert 'gateway_requests_total{method="GET",route="/products/{product_id}",status="200"}' in body
+    assert 'gateway_request_duration_seconds_bucket{le="0.005",method="GET",route="/products/{product_id}"}' in body
+    assert 'gateway_downstream_duration_seconds_count{method="GET",route="/products/{id}",service="products",status="200"}' in body
+    assert "gateway_requests_in_flight" in body
+    assert 'gateway_circuit_open{service="products",state="closed"} 0.0' in body
@@ -0,0 +1,186 @@
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+from main import app
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+AUTHORIZATION = "Bearer " + jwt.encode(
+    {"sub": "user-1", "email": "user@test.com", "aud": "authenticated",
+     "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+CART_ITEMS = [
+    {"product_id": 1, "product_name": "A", "product_price": 10, "quantity": 2},
+    {"product_id": 2, "product_name": "B", "product_price": 5, "quantity": 1},
+]
+
+
+class Roles:
+    """Tabla roles: sin fila el usuario es "user"."""
+
+    def __init__(self, role=None):
+        self.data = [{"role": role}] if role else []
+
+
+@pytest.fixture(autouse=True)
+def auth(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(Auth, "_fetch_role", lambda user_id: Roles())
+    Auth._token_cache.clear()
+
+
+@pytest.fixture
+def services(downstream):
+    calls = []
+
+    def record(service, status=200, body=None):
+        def handler(request):
+            calls.append((service, request.method, request.url.path,
+                          json.loads(request.content) if request.content else None))
+            return httpx.Response(status, json=body if body is not None else {})
+        return handler
+
+    created = record("order", 201, {"order_id": 7})
+    updated = record("order")
+
+    downstream["cart"] = record("cart", body={"exito": True, "items": CART_ITEMS})
+    downstream["order"] = lambda request: (created if request.url.path == "/orders" else updated)(request)
+    return calls, record
+
+
+@pytest.mark.anyio
+async def test_create_order_reserves_stock_before_clearing_the_cart(gateway, downstream, services):
+    calls, record = services
+    downstream["products"] = record(
+        "products", 201, {"exito": True, "expires_at": "2030-01-01T00:00:00+00:00"}
+    )
+
+    response = await gateway.post("/order/create", headers={"Authorization": AUTHORIZATION})
+
+    assert response.status_code == 200
+    assert response.json()["reserved_until"] == "2030-01-01T00:00:00+00:00"
+    assert [call[:3] for call in calls] == [
+        ("cart", "POST", "/cart"),
+        ("order", "POST", "/orders"),
+        ("products", "POST", "/reservations"),
+        ("cart", "POST", "/cart/clear"),
+    ]
+    assert calls[2][3] == {
+        "order_id": 7,
+        "items": [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}],
+    }
+
+
+@pytest.mark.anyio
+async def test_create_order_without_stock_cancels_the_order_and_keeps_the_cart(gateway, downstream, services):
+    calls, record = services
+    downstream["products"] = record(
+        "products", 409, {"exito": False, "error": "Insufficient stock for product 2"}
+    )
+
+    response = await gateway.post("/order/create", headers={"Authorization": AUTHORIZATION})
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Insufficient stock for product 2"
+    assert [call[:3] for call in calls] == [
+        ("cart", "POST", "/cart"),
+        ("order", "POST", "/orders"),
+        ("products", "POST", "/reservations"),
+        ("order", "PATCH", "/orders/7"),
+    ]
+    assert calls[3][3] == {"status": "cancelled"}
+
+
+@pytest.mark.anyio
+async def test_create_order_cancels_the_order_when_the_reservation_call_fails(gateway, downstream, services):
+    calls, record = services
+    released = record("products")
+
+    def products(request):
+        if request.url.path == "/reservations":
+            raise httpx.ReadTimeout("timeout", request=request)
+        return released(request)
+
+    downstream["products"] = products
+
+    response = await gateway.post("/order/create", headers={"Authorization": AUTHORIZATION})
+
+    assert response.status_code == 503
+    # Ni la orden queda pendiente ni una reserva creada sin respuesta aparta stock
+    assert [call[:3] for call in calls] == [
+        ("cart", "POST", "/cart"),
+        ("order", "POST", "/orders"),
+        ("order", "PATCH", "/orders/7"),
+        ("products", "POST", "/reservations/7/release"),
+    ]
+    assert calls[2][3] == {"status": "cancelled"}
+
+
+@pytest.mark.anyio
+async def test_cancelling_an_order_releases_its_reservation(gateway, downstream, services):
+    calls, record = services
+    downstream["products"] = record("products", 200, {"exito": True, "released": 2})
+
+    response = await gateway.patch(
+        "/order/update/7/", json={"status": "cancelled"}, headers={"Authorization": AUTHORIZATION}
+    )
+
+    assert response.status_code == 200
+    assert [call[:3] for call in calls] == [
+        ("order", "PATCH", "/orders/7"),
+        ("products", "POST", "/reservations/7/release"),
+    ]
+    # Un usuario solo cancela sus propias ordenes
+    assert calls[0][3] == {"status": "cancelled", "user_id": "user-1"}
+
+
+@pytest.mark.anyio
+async def test_admin_can_update_any_order(gateway, downstream, services, monkeypatch):
+    monkeypatch.setattr(Auth, "_fetch_role", lambda user_id: Roles("admin"))
+    calls, record = services
+
+    response = await gateway.patch(
+        "/order/update/7/", json={"status": "shipped"}, headers={"Authorization": AUTHORIZATION}
+    )
+
+    assert response.status_code == 200
+    assert calls == [("order", "PATCH", "/orders/7", {"status": "shipped"})]
+
+
+@pytest.mark.anyio
+async def test_cancelling_someone_elses_order_releases_nothing(gateway, downstream, services):
+    calls, record = services
+    downstream["order"] = record("order", 404, {"error": "Order not found"})
+
+    response = await gateway.patch(
+        "/order/update/7/", json={"status": "cancelled"}, headers={"Authorization": AUTHORIZATION}
+    )
+
+    assert response.status_code == 404
+    assert [call[:3] for call in calls] == [("order", "PATCH", "/orders/7")]
+
+
+@pytest.mark.anyio
+async def test_cancel_succeeds_when_the_release_call_fails(gateway, downstream, services):
+    calls, record = services
+
+    def products(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    downstream["products"] = products
+
+    response = await gateway.patch(
+        "/order/update/7/", json={"status": "cancelled"}, headers={"Authorization": AUTHORIZATION}
+    )
+
+    # La orden ya esta cancelada: el fallo de la liberacion no cambia la respuesta
+    assert response.status_code == 200
+    assert [call[:3] for call in calls] == [("order", "PATCH", "/orders/7")]
+    # La respuesta del Order Service se leyo entera: el bulkhead queda libre
+    assert app.state.clients.bulkheads["order"].snapshot()["in_flight"] == 0
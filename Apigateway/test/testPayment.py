@@ -0,0 +1,122 @@
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+from app.routers import payment
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+AUTHORIZATION = "Bearer " + jwt.encode(
+    {"sub": "user-1", "email": "user@test.com", "aud": "authenticated",
+     "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+ORDER = {"id": 7, "total_price": 10, "order_items": [{"product_id": 1, "quantity": 1}]}
+
+
+@pytest.fixture(autouse=True)
+def auth(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(payment.random, "random", lambda: 0.9)
+    Auth._token_cache.clear()
+
+
+@pytest.fixture
+def order_service(downstream):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/check-pending":
+            return httpx.Response(200, json={"has_pending": True, "order": ORDER})
+        return httpx.Response(200, json={})
+
+    downstream["order"] = handler
+    downstream["payment"] = lambda request: httpx.Response(201, json={"receipt_id": 3})
+    return calls
+
+
+def products_service(downstream, responses):
+    """Responde por ruta y registra las llamadas al Product Service."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        status, body = responses.get(request.url.path, (200, {"exito": True}))
+        return httpx.Response(status, json=body)
+
+    downstream["products"] = handler
+    return calls
+
+
+async def pay(gateway):
+    return await gateway.post(
+        "/payment/process-payment",
+        json={"paymentInfo": {}, "ship_info": {"address": "Calle 1"}},
+        headers={"Authorization": AUTHORIZATION},
+    )
+
+
+@pytest.mark.anyio
+async def test_payment_confirms_the_reservation(gateway, downstream, order_service):
+    product_calls = products_service(downstream, {})
+
+    response = await pay(gateway)
+
+    assert response.status_code == 200
+    assert product_calls == ["/reservations/7/confirm"]
+    assert order_service == ["/check-pending", "/address/7", "/orders/7"]
+
+
+@pytest.mark.anyio
+async def test_rejected_confirmation_stops_the_saga_without_release(gateway, downstream, order_service):
+    product_calls = products_service(downstream, {
+        "/reservations/7/confirm": (409, {"error": "Insufficient stock for product 1"}),
+    })
+
+    response = await pay(gateway)
+
+    assert response.status_code == 400
+    assert "Insufficient stock for product 1" in response.json()["detail"]
+    # La confirmacion es todo o nada: no hay nada que devolver
+    assert product_calls == ["/reservations/7/confirm"]
+    assert order_service == ["/check-pending"]
+
+
+@pytest.mark.anyio
+async def test_payment_failure_releases_the_confirmed_stock(gateway, downstream, order_service, monkeypatch):
+    monkeypatch.setattr(payment.random, "random", lambda: 0.1)
+    product_calls = products_service(downstream, {})
+
+    response = await pay(gateway)
+
+    assert response.status_code == 400
+    # El stock se toma antes de cobrar: un rechazo del pago lo devuelve
+    assert product_calls == ["/reservations/7/confirm", "/reservations/7/release"]
+
+
+@pytest.mark.anyio
+async def test_failure_after_confirmation_releases_the_reservation(gateway, downstream, order_service):
+    product_calls = products_service(downstream, {})
+    downstream["payment"] = lambda request: httpx.Response(500, json={"error": "smtp"})
+
+    response = await pay(gateway)
+
+    assert response.status_code == 400
+    assert product_calls == ["/reservations/7/confirm", "/reservations/7/release"]
+
+
+@pytest.mark.anyio
+async def test_order_without_reservation_falls_back_to_reduce_stock(gateway, downstream, order_service):
+    product_calls = products_service(downstream, {
+        "/reservations/7/confirm": (404, {"error": "La orden 7 no tiene reserva"}),
+    })
+    downstream["payment"] = lambda request: httpx.Response(500, json={"error": "smtp"})
+
+    response = await pay(gateway)
+
+    assert response.status_code == 400
+    assert product_calls == ["/reservations/7/confirm", "/reduce-stock", "/restore-stock"]
@@ -0,0 +1,71 @@
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+from app.routers import payment
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+AUTHORIZATION = "Bearer " + jwt.encode(
+    {"sub": "user-1", "email": "user@test.com", "aud": "authenticated",
+     "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+
+
+class RoleResponse:
+    data = [{"role": "admin"}]
+
+
+@pytest.fixture(autouse=True)
+def auth(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(Auth, "_fetch_role", lambda user_id: RoleResponse())
+    Auth._token_cache.clear()
+    Auth.auth_counters.clear()
+
+
+@pytest.mark.anyio
+async def test_list_orders_resolves_principal_once(gateway, downstream):
+    downstream["order"] = lambda request: httpx.Response(200, json=[{"id": 1}])
+
+    response = await gateway.get("/order/list", headers={"Authorization": AUTHORIZATION})
+
+    assert response.status_code == 200
+    assert Auth.auth_counters["principal_resolved"] == 1
+    assert Auth.auth_counters["token_verified"] == 1
+    assert Auth.auth_counters["role_lookup"] == 1
+
+
+@pytest.mark.anyio
+async def test_process_payment_resolves_principal_once(gateway, downstream, monkeypatch):
+    monkeypatch.setattr(payment.random, "random", lambda: 0.9)
+    order = {"id": 7, "total_price": 10, "order_items": [{"product_id": 1, "quantity": 1}]}
+
+    def order_service(request):
+        if request.url.path == "/check-pending":
+            return httpx.Response(200, json={"has_pending": True, "order": order})
+        return httpx.Response(200, json={})
+
+    downstream["order"] = order_service
+    downstream["products"] = lambda request: httpx.Response(200, json={})
+    downstream["payment"] = lambda request: httpx.Response(201, json={"receipt_id": 3})
+
+    response = await gateway.post(
+        "/payment/process-payment",
+        json={"paymentInfo": {}, "ship_info": {"address": "Calle 1"}},
+        headers={"Authorization": AUTHORIZATION},
+    )
+
+    assert response.status_code == 200
+    assert Auth.auth_counters["principal_resolved"] == 1
+    assert Auth.auth_counters["role_lookup"] == 0
+
+
+@pytest.mark.anyio
+async def test_missing_token_is_rejected(gateway, downstream):
+    response = await gateway.post("/cart")
+    assert response.status_code == 401
@@ -0,0 +1,44 @@
+import json
+
+import httpx
+import pytest
+
+
+@pytest.mark.anyio
+async def test_batch_is_a_single_downstream_call(gateway, downstream):
+    calls = []
+
+    def batch(request):
+        calls.append((request.method, request.url.path, json.loads(request.content)))
+        return httpx.Response(
+            200, json={"exito": True, "datos": [{"id": 2}, {"id": 1}], "no_encontrados": [9]}
+        )
+
+    downstream["products"] = batch
+
+    response = await gateway.post(
+        "/products/batch", json={"ids": [2, 1, 9], "fields": ["name", "price"]}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["no_encontrados"] == [9]
+    assert calls == [("POST", "/products/batch", {"ids": [2, 1, 9], "fields": ["name", "price"]})]
+
+
+@pytest.mark.anyio
+async def test_batch_rejects_empty_id_list(gateway, downstream):
+    response = await gateway.post("/products/batch", json={"ids": []})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_batch_propagates_microservice_errors(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(
+        400, json={"exito": False, "error": "Máximo 200 ids por consulta"}
+    )
+
+    response = await gateway.post("/products/batch", json={"ids": list(range(1, 300))})
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "Máximo 200 ids por consulta"
@@ -0,0 +1,168 @@
+import httpx
+import pytest
+
+from app.core import Auth, config, retry
+from app.core.Auth import Principal
+
+# Formato que el gateway nunca produciria al re-serializar: prueba que pasa tal cual
+RAW_CATALOG = b'{"products":  [' + b",".join(b'{"id": %d}' % i for i in range(5000)) + b"]}"
+
+
+@pytest.fixture(autouse=True)
+def as_admin(monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(config, "RETRY_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(retry, "retry_budget", retry.RetryBudget(0.1, 1, 10))
+    admin = Principal("admin-1", "admin@test.com", role="admin")
+    app.dependency_overrides[Auth.require_admin] = lambda: admin
+    app.dependency_overrides[Auth.get_principal_with_role] = lambda: admin
+    app.dependency_overrides[Auth.get_principal] = lambda: admin
+    yield
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.anyio
+async def test_body_is_streamed_byte_for_byte(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(
+        200, content=RAW_CATALOG, headers={"Content-Type": "application/json"}
+    )
+
+    response = await gateway.get("/admin/products/getall", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.content == RAW_CATALOG
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["content-length"] == str(len(RAW_CATALOG))
+
+
+@pytest.mark.anyio
+async def test_ndjson_catalog_is_forwarded_chunk_by_chunk(gateway, downstream):
+    formats = []
+
+    async def lines():
+        for i in range(3):
+            yield b'{"id": %d}\n' % i
+
+    def handler(request):
+        formats.append(request.url.params["format"])
+        return httpx.Response(200, content=lines(), headers={"Content-Type": "application/x-ndjson"})
+
+    downstream["products"] = handler
+
+    response = await gateway.get("/admin/products/getall?format=ndjson", headers={"Accept-Encoding": "identity"})
+    invalid = await gateway.get("/admin/products/getall?format=xml")
+
+    assert formats == ["ndjson"]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == ['{"id": 0}', '{"id": 1}', '{"id": 2}']
+    assert invalid.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_streamed_body_is_compressed_and_releases_the_bulkhead(gateway, downstream):
+    from main import app
+
+    async def chunks():
+        for _ in range(50):
+            yield b" " * 1024
+        yield b"[]"
+
+    downstream["order"] = lambda request: httpx.Response(
+        200, content=chunks(), headers={"Content-Type": "application/json"}
+    )
+
+    response = await gateway.get("/order/list", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == []
+    assert app.state.clients.bulkheads["order"].in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_error_status_is_wrapped_with_downstream_body(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(
+        404, json={"exito": False, "error": "Producto no encontrado"}
+    )
+
+    response = await gateway.delete("/admin/products/delete/99")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": {"exito": False, "error": "Producto no encontrado"}}
+
+
+@pytest.mark.anyio
+async def test_streamed_get_is_retried_and_closes_the_failed_attempt(gateway, downstream):
+    from main import app
+
+    calls = 0
+
+    def flaky(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(503, json={"error": "busy"})
+        return httpx.Response(200, json=[{"id": 1}])
+
+    downstream["order"] = flaky
+
+    response = await gateway.get("/order/list")
+
+    assert response.json() == [{"id": 1}]
+    assert calls == 2
+    assert app.state.clients.bulkheads["order"].in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_import_upload_is_forwarded_with_its_content_type(gateway, downstream):
+    received = []
+
+    def handler(request):
+        received.append((request.url.path, dict(request.url.params), request.headers["content-type"], request.read()))
+        return httpx.Response(202, json={"exito": True, "job_id": 7, "status": "queued"})
+
+    downstream["products"] = handler
+    body = b"name,price\nTeclado,80\n" * 1000
+
+    response = await gateway.post(
+        "/admin/products/import?mode=update&batch_size=100",
+        content=body,
+        headers={"Content-Type": "text/csv"},
+    )
+    invalid = await gateway.post("/admin/products/import?mode=replace", content=body)
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == 7
+    assert received == [("/products/import", {"mode": "update", "batch_size": "100"}, "text/csv", body)]
+    assert invalid.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_finished_import_purges_cached_searches_and_products_once(gateway, downstream):
+    from app.core.cache import response_cache
+    from app.routers import admin_products
+
+    statuses = iter(["running", "done", "done"])
+    downstream["products"] = lambda request: httpx.Response(
+        200, json={"exito": True, "datos": {"id": 8, "status": next(statuses)}}
+    )
+    response_cache.clear()
+    admin_products._purged_imports.clear()
+
+    def seed():
+        response_cache.put("search?keyword=x", b"[]", 60, tags=("search",))
+        response_cache.put("product:3?", b"{}", 60, tags=("product:3", "product"))
+
+    seed()
+    running = await gateway.get("/admin/products/import/8")
+    assert running.json()["datos"]["status"] == "running"
+    assert len(response_cache) == 2
+
+    await gateway.get("/admin/products/import/8")
+    assert len(response_cache) == 0
+
+    # Las consultas siguientes del mismo trabajo no vuelven a purgar
+    seed()
+    await gateway.get("/admin/products/import/8")
+    assert len(response_cache) == 2
+    response_cache.clear()
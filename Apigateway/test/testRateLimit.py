@@ -0,0 +1,98 @@
+import time
+
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth, config, ratelimit
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+
+
+def bearer(user_id):
+    token = jwt.encode(
+        {"sub": user_id, "email": f"{user_id}@test.com", "aud": "authenticated",
+         "exp": int(time.time()) + 3600},
+        SECRET,
+        algorithm="HS256",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    monkeypatch.setattr(config, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "RATE_LIMITS", "catalog=1:3,cart=1:2")
+    monkeypatch.setattr(config, "RATE_LIMIT_WORKERS", 1)
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(ratelimit, "store", ratelimit.MemoryStore(1000))
+    Auth._token_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_memory_bucket_refills_at_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = ratelimit.MemoryStore(10)
+
+    results = [await store.take("k", rate=2, burst=2) for _ in range(3)]
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[2].retry_after == 1
+
+    now[0] += 0.5
+    assert (await store.take("k", rate=2, burst=2)).allowed
+
+
+def test_memory_limits_are_split_across_workers(monkeypatch):
+    monkeypatch.setattr(config, "RATE_LIMIT_WORKERS", 4)
+
+    assert ratelimit.local_limit(10, 30) == (2.5, 8)
+    # Siempre al menos una peticion de rafaga por worker
+    assert ratelimit.local_limit(0.5, 3) == (0.125, 1)
+
+    # Redis ya es compartido: el limite va entero
+    monkeypatch.setattr(ratelimit, "store", object.__new__(ratelimit.RedisStore))
+    assert ratelimit.local_limit(10, 30) == (10, 30)
+
+
+@pytest.mark.anyio
+async def test_anonymous_route_is_limited_per_ip_with_headers(gateway, downstream):
+    downstream["products"] = lambda request: httpx.Response(200, json={"products": []})
+
+    responses = [await gateway.get("/products/search") for _ in range(4)]
+
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["ratelimit-limit"] == "3"
+    assert responses[0].headers["ratelimit-remaining"] == "2"
+    assert responses[3].headers["retry-after"] == "1"
+    assert responses[3].headers["ratelimit-remaining"] == "0"
+
+
+@pytest.mark.anyio
+async def test_authenticated_route_is_limited_per_user(gateway, downstream):
+    downstream["cart"] = lambda request: httpx.Response(200, json={"exito": True, "items": []})
+
+    noisy = [(await gateway.post("/cart", headers=bearer("noisy"))).status_code for _ in range(3)]
+    quiet = await gateway.post("/cart", headers=bearer("quiet"))
+
+    assert noisy == [200, 200, 429]
+    # Otro usuario desde la misma IP conserva su propio bucket
+    assert quiet.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_rejected_requests_never_reach_the_microservice(gateway, downstream):
+    calls = 0
+
+    def product(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json={"exito": True, "datos": {}})
+
+    downstream["products"] = product
+
+    for _ in range(10):
+        await gateway.get("/products/1")
+
+    assert calls == 3
@@ -0,0 +1,97 @@
+import anyio
+import httpx
+import pytest
+
+from app.core import config
+from app.core.resilience import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "CB_MINIMUM_CALLS", 4)
+    monkeypatch.setattr(config, "CB_OPEN_SECONDS", 60)
+
+
+def make_breaker(**overrides):
+    settings = dict(
+        window_size=10, minimum_calls=4, failure_rate_threshold=0.5,
+        slow_call_seconds=1.0, slow_call_rate_threshold=0.8,
+        open_seconds=0.05, half_open_calls=2,
+    )
+    settings.update(overrides)
+    return CircuitBreaker("products", **settings)
+
+
+def test_breaker_opens_on_error_rate_and_recovers_through_half_open():
+    breaker = make_breaker()
+    for failed in (False, True, True, True):
+        breaker.record(failed, 0.01, breaker.before_call())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(httpx.RequestError):
+        breaker.before_call()
+
+    anyio.run(anyio.sleep, 0.06)
+    assert breaker.before_call() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(False, 0.01, True)
+    breaker.record(False, 0.01, breaker.before_call())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 2.0, breaker.before_call())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.anyio
+async def test_open_circuit_fails_fast_with_503(gateway, downstream):
+    calls = 0
+
+    def broken(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(500, json={"error": "boom"})
+
+    downstream["products"] = broken
+    for _ in range(4):
+        await gateway.get("/products/1")
+
+    response = await gateway.get("/products/1")
+    circuits = (await gateway.get("/health/circuits")).json()
+
+    assert response.status_code == 503
+    assert calls == 4
+    assert circuits["products"]["breaker"]["state"] == "open"
+    assert circuits["cart"]["breaker"]["state"] == "closed"
+
+
+@pytest.fixture
+def small_bulkhead(monkeypatch):
+    monkeypatch.setattr(config, "PRODUCTS_BULKHEAD_LIMIT", 2)
+    monkeypatch.setattr(config, "BULKHEAD_MAX_WAIT", 0)
+
+
+@pytest.mark.anyio
+async def test_bulkhead_caps_in_flight_calls(small_bulkhead, gateway, downstream):
+    from main import app
+
+    async def slow(request):
+        await anyio.sleep(0.1)
+        return httpx.Response(200, json={"exito": True, "datos": {}})
+
+    downstream["products"] = slow
+    statuses = []
+
+    async def hit(n):
+        statuses.append((await gateway.get(f"/products/{n + 1}")).status_code)
+
+    async with anyio.create_task_group() as tg:
+        for n in range(5):
+            tg.start_soon(hit, n)
+
+    assert sorted(statuses) == [200, 200, 503, 503, 503]
+    assert app.state.clients.bulkheads["products"].in_flight == 0
@@ -0,0 +1,148 @@
+import time
+
+import anyio
+import httpx
+import jwt
+import pytest
+
+from app.core import Auth
+from app.core.cache import ResponseCache, cache_key, response_cache
+from app.core.invalidation import InvalidationLog
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+ADMIN = "Bearer " + jwt.encode(
+    {"sub": "admin-1", "aud": "authenticated", "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+
+
+class AdminRole:
+    data = [{"role": "admin"}]
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(monkeypatch):
+    monkeypatch.setattr(Auth.config, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(Auth, "_fetch_role", lambda user_id: AdminRole())
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+@pytest.fixture
+def products(downstream):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"exito": True, "datos": {"id": 1, "version": len(calls)}})
+
+    downstream["products"] = handler
+    return calls
+
+
+def test_cache_key_is_canonical():
+    assert cache_key("search", {"page": 1, "keyword": "x", "category": None}) == \
+        cache_key("search", {"keyword": "x", "page": 1})
+
+
+@pytest.mark.anyio
+async def test_second_read_is_served_from_cache(gateway, products):
+    first = await gateway.get("/products/1")
+    second = await gateway.get("/products/1")
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+    assert len(products) == 1
+
+
+@pytest.mark.anyio
+async def test_if_none_match_returns_304(gateway, products):
+    etag = (await gateway.get("/products/search", params={"keyword": "zapato"})).headers["etag"]
+
+    response = await gateway.get(
+        "/products/search", params={"keyword": "zapato"}, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.anyio
+async def test_stale_entry_is_served_and_refreshed(gateway, products, monkeypatch):
+    await gateway.get("/products/1")
+    entry = response_cache.get(cache_key("product:1", {}))
+    entry.stored_at -= entry.ttl + 1
+
+    stale = await gateway.get("/products/1")
+    await anyio.sleep(0.01)
+
+    assert stale.headers["x-cache"] == "STALE"
+    assert stale.json()["datos"]["version"] == 1
+    assert (await gateway.get("/products/1")).json()["datos"]["version"] == 2
+
+
+@pytest.mark.anyio
+async def test_admin_edit_purges_cached_product(gateway, products):
+    await gateway.get("/products/1")
+    await gateway.put("/admin/products/edit/1", json={"price": 10}, headers={"Authorization": ADMIN})
+
+    response = await gateway.get("/products/1")
+
+    assert response.headers["x-cache"] == "MISS"
+
+
+@pytest.mark.anyio
+async def test_search_forwards_cursor_and_count_and_caches_each_page(gateway, downstream):
+    queries = []
+
+    def handler(request):
+        queries.append(dict(request.url.params))
+        return httpx.Response(200, json={"products": [], "next_cursor": None})
+
+    downstream["products"] = handler
+
+    await gateway.get("/products/search", params={"cursor": "", "count": "planned"})
+    await gateway.get("/products/search", params={"cursor": "abc"})
+    cached = await gateway.get("/products/search", params={"cursor": "abc", "page": 5})
+    rejected = await gateway.get("/products/search", params={"count": "approximate"})
+
+    # Con cursor no se envia page: la misma pagina comparte entrada de cache
+    assert queries == [
+        {"page_size": "8", "cursor": "", "count": "planned"},
+        {"page_size": "8", "cursor": "abc"},
+    ]
+    assert cached.headers["x-cache"] == "HIT"
+    assert rejected.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_purges_reach_the_other_workers(tmp_path):
+    path = str(tmp_path / "purges.log")
+    workers = []
+    for pid in (101, 102):
+        sync = InvalidationLog(path)
+        sync.pid = pid
+        sync.poll()
+        workers.append(ResponseCache(max_bytes=1024, max_entries=10, stale_ttl=0, sync=sync))
+    writer, reader = workers
+    for cache in workers:
+        cache.put("product:1", b"{}", 30, ["product:1"])
+        cache.put("search", b"[]", 30, ["search"])
+
+    writer.purge("product:1")
+    assert writer.get("product:1") is None
+    # Sin aplicar las purgas de los demas el otro worker seguiria sirviendo su copia
+    assert reader.get("product:1") is not None
+
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(reader.follow, 0.01)
+        await anyio.sleep(0.1)
+        tasks.cancel_scope.cancel()
+
+    assert reader.get("product:1") is None
+    assert reader.get("search") is not None
+    # Lo que publico el mismo worker no se vuelve a aplicar
+    assert writer.sync.poll() == []
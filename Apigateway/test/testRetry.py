@@ -0,0 +1,91 @@
+import time
+
+import anyio
+import httpx
+import pytest
+
+from app.core import config, retry
+from app.core.cache import response_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "RETRY_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(retry, "retry_budget", retry.RetryBudget(0.1, 1, 10))
+    monkeypatch.setattr(retry, "latencies", retry.LatencyTracker())
+    retry.retry_stats.clear()
+    response_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_dropped_connection_is_retried(downstream):
+    from main import app
+
+    calls = 0
+
+    def flaky(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, json={"has_pending": False, "order": None})
+
+    downstream["order"] = flaky
+    result = await retry.idempotent_get(app.state.clients.order, "/check-pending")
+    assert result.status_code == 200
+    assert calls == 2
+
+
+@pytest.fixture
+def breaker_never_opens(monkeypatch):
+    monkeypatch.setattr(config, "CB_MINIMUM_CALLS", 1000)
+
+
+@pytest.mark.anyio
+async def test_retry_budget_limits_amplification(breaker_never_opens, downstream, monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(retry, "retry_budget", retry.RetryBudget(0.1, 0, 10))
+    calls = 0
+
+    def down(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    downstream["products"] = down
+    for _ in range(20):
+        await retry.idempotent_get(app.state.clients.products, "/products/1")
+
+    # 20 peticiones con presupuesto del 10%: como mucho 2 reintentos en total
+    assert calls <= 22
+    assert retry.retry_budget.stats["exhausted"] > 0
+
+
+@pytest.mark.anyio
+async def test_hedged_request_cuts_tail_latency(downstream, monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(config, "HEDGING_ENABLED", True)
+    client = app.state.clients.products
+    key = retry._route_key(client, "/products/1")
+    for _ in range(config.HEDGE_MIN_SAMPLES):
+        retry.latencies.observe(key, 0.01)
+
+    calls = 0
+
+    async def slow_first(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await anyio.sleep(1)
+        return httpx.Response(200, json={"call": calls})
+
+    downstream["products"] = slow_first
+    start = time.perf_counter()
+    response = await retry.idempotent_get(client, "/products/1", hedge=True)
+
+    assert time.perf_counter() - start < 0.5
+    assert response.json() == {"call": 2}
+    assert retry.retry_stats["hedge_won"] == 1
@@ -0,0 +1,94 @@
+import anyio
+import httpx
+import pytest
+
+from app.core import config
+from app.core.cache import response_cache
+from app.core.singleflight import SingleFlight, singleflight
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    # Se mide el coalescing solo, sin que el cache absorba las lecturas
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "PRODUCTS_BULKHEAD_LIMIT", 500)
+    response_cache.clear()
+    singleflight.stats.clear()
+
+
+@pytest.mark.anyio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = 0
+
+    async def slow():
+        nonlocal executions
+        executions += 1
+        await anyio.sleep(0.05)
+        return "ok"
+
+    results = []
+
+    async def call():
+        results.append(await flight.do("key", slow))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(20):
+            tg.start_soon(call)
+
+    assert results == ["ok"] * 20
+    assert executions == 1
+    assert flight.coalescing_ratio == 19 / 20
+
+
+@pytest.mark.anyio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def failing():
+        await anyio.sleep(0.01)
+        raise httpx.ConnectError("down")
+
+    errors = []
+
+    async def call():
+        try:
+            await flight.do("key", failing)
+        except httpx.ConnectError:
+            errors.append(1)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(5):
+            tg.start_soon(call)
+
+    assert len(errors) == 5
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("enabled", [False, True])
+async def test_hot_product_load_downstream_qps(gateway, downstream, monkeypatch, enabled):
+    """Carga: 200 GET concurrentes sobre 5 productos."""
+    monkeypatch.setattr(config, "SINGLEFLIGHT_ENABLED", enabled)
+    downstream_calls = 0
+
+    async def products(request):
+        nonlocal downstream_calls
+        downstream_calls += 1
+        await anyio.sleep(0.05)
+        return httpx.Response(200, json={"exito": True, "datos": {"id": 1}})
+
+    downstream["products"] = products
+
+    async def hit(n):
+        response = await gateway.get(f"/products/{n % 5 + 1}")
+        assert response.status_code == 200
+
+    async with anyio.create_task_group() as tg:
+        for n in range(200):
+            tg.start_soon(hit, n)
+
+    if enabled:
+        assert downstream_calls <= 10
+        assert singleflight.coalescing_ratio >= 0.95
+    else:
+        assert downstream_calls == 200
@@ -0,0 +1,84 @@
+import json
+
+import httpx
+import pytest
+
+from app.core import config, tracing
+
+INCOMING = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    spans = []
+    monkeypatch.setattr(tracing.exporter, "export", lambda span: spans.append(span.to_zipkin()))
+    return spans
+
+
+def test_parse_traceparent_rejects_invalid_headers():
+    assert tracing.parse_traceparent(INCOMING) == (
+        "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True,
+    )
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert tracing.parse_traceparent("basura") is None
+    assert tracing.parse_traceparent(None) is None
+
+
+@pytest.mark.anyio
+async def test_trace_continues_from_client_to_microservice(gateway, downstream, exported):
+    seen = []
+
+    def product(request):
+        seen.append(request.headers["traceparent"])
+        return httpx.Response(200, json={"exito": True, "datos": {}})
+
+    downstream["products"] = product
+
+    response = await gateway.get("/products/7", headers={"traceparent": INCOMING})
+
+    server, client = (
+        next(span for span in exported if span["kind"] == kind) for kind in ("SERVER", "CLIENT")
+    )
+    assert server["traceId"] == client["traceId"] == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert server["parentId"] == "00f067aa0ba902b7"
+    assert server["name"] == "GET /products/{product_id}"
+    assert client["parentId"] == server["id"]
+    assert client["remoteEndpoint"] == {"serviceName": "products"}
+    # El microservicio recibe el span CLIENT como padre
+    assert seen == [f"00-{client['traceId']}-{client['id']}-01"]
+    assert response.headers["traceparent"] == f"00-{server['traceId']}-{server['id']}-01"
+
+
+@pytest.mark.anyio
+async def test_unsampled_traces_propagate_without_exporting(gateway, downstream, exported, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_SAMPLE_RATE", 0)
+    seen = []
+
+    def product(request):
+        seen.append(request.headers["traceparent"])
+        return httpx.Response(200, json={"exito": True, "datos": {}})
+
+    downstream["products"] = product
+
+    await gateway.get("/products/7")
+
+    assert exported == []
+    assert seen[0].endswith("-00")
+
+
+def test_exporter_writes_zipkin_json_lines(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = tracing.SpanExporter(str(path), None)
+    span = tracing.Span("GET /health", "SERVER", "a" * 32, None, True, "api-gateway")
+    span.finish()
+
+    exporter._write([span.to_zipkin()])
+
+    line = json.loads(path.read_text())
+    assert line["traceId"] == "a" * 32
+    assert line["localEndpoint"] == {"serviceName": "api-gateway"}
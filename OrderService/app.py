@@ -1,13 +1,24 @@
+import logging
+import os
+
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
-from config import supabase
+from config import repository
+from log import setup_logging
+from metrics import setup_metrics
+from tracing import setup_tracing
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+setup_metrics(app)
+setup_tracing(app, "order-service")
+setup_logging(app, "order-service")
+
+logger = logging.getLogger(__name__)
 
 
 @app.route("/health")
@@ -35,7 +46,7 @@ def create_order():
 
     user_id = data.get("user_id")
     items = data.get("items", [])
-    print("ITEMS RECEIVED:", items)
+    logger.debug("items recibidos", extra={"items": items})
 
     if not user_id or not items:
         return jsonify({
@@ -53,33 +64,23 @@ def create_order():
             "error": "Invalid item format"
         }), 400
 
-    # 2️⃣ Crear orden
-    order_response = supabase.table("orders").insert({
-        "user_id": user_id,
-        "total_price": total_price,
-        "status": "pending"
-    }).execute()
-
-    if not order_response.data:
-        return jsonify({
-            "error": "Failed to create order"
-        }), 500
-
-    order_id = order_response.data[0]["id"]
-
-    # 3️⃣ Crear items
+    # 2️⃣ Crear orden y sus items
     order_items = []
 
     for item in items:
         order_items.append({
-            "order_id": order_id,
             "product_id": item["product_id"],
             "product_name": item.get("product_name"),
             "quantity": item["quantity"],
             "price": item["product_price"]
         })
 
-    supabase.table("order_items").insert(order_items).execute()
+    order_id = repository.create_order(user_id, total_price, order_items)
+
+    if order_id is None:
+        return jsonify({
+            "error": "Failed to create order"
+        }), 500
 
     return jsonify({
         "order_id": order_id,
@@ -109,35 +110,11 @@ def check_pending_order():
             "error": "user_id is required"
         }), 400
 
-    response = (
-        supabase
-        .table("orders")
-        .select("""
-            id,
-            user_id,
-            status,
-            total_price,
-            created_at,
-            order_items (
-                id,
-                product_id,
-                product_name,
-                quantity,
-                price
-            )
-        """)
-        .eq("user_id", user_id)
-        .eq("status", "pending")
-        .order("created_at", desc=True)
-        .limit(1)
-        .execute()
-    )
-
-    has_pending = len(response.data) > 0
+    order = repository.pending_order(user_id)
 
     return jsonify({
-        "has_pending": has_pending,
-        "order": response.data[0] if has_pending else None
+        "has_pending": order is not None,
+        "order": order
     }), 200
 
 
@@ -166,46 +143,20 @@ def list_orders():
             "error": "user_id and role are required"
         }), 400
     if role == "admin":
-        response = (
-        supabase
-        .table("orders")
-        .select("""
-            id,
-            user_id,
-            status,
-            total_price,
-            created_at,
-            shipping_address,
-            order_items (
-                id,
-                product_id,
-                product_name,
-                quantity,
-                price
-            )
-        """)
-        .order("created_at", desc=True)
-        .execute()
-    )
+        orders = repository.all_orders()
     else:
-        response = (
-            supabase
-            .table("orders")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .execute()
-            )
-
-    print("ORDERS FETCHED:", response.data)
-    return jsonify(response.data), 200
+        orders = repository.user_orders(user_id)
+
+    logger.debug("ordenes obtenidas", extra={"count": len(orders)})
+    return jsonify(orders), 200
 
 @app.route("/orders/<int:order_id>", methods=["PATCH"])
 def update_order(order_id):
     """
     Body:
     {
-      "status": "completed" | "cancelled" | ...
+      "status": "completed" | "cancelled" | ...,
+      "user_id": "uuid"  (opcional: solo actualiza si la orden es suya)
     }
     """
     data = request.get_json()
@@ -214,15 +165,9 @@ def update_order(order_id):
     if not status:
         return jsonify({"error": "status is required"}), 400
 
-    response = (
-        supabase
-        .table("orders")
-        .update({"status": status})
-        .eq("id", order_id)
-        .execute()
-    )
+    updated = repository.update_order(order_id, {"status": status}, data.get("user_id"))
 
-    if not response.data:
+    if not updated:
         return jsonify({"error": "Order not found"}), 404
 
     return jsonify({
@@ -248,15 +193,9 @@ def add_address_to_order(order_id):
     if not address:
         return jsonify({"error": "address is required"}), 400
 
-    response = (
-        supabase
-        .table("orders")
-        .update({"shipping_address": address})
-        .eq("id", order_id)
-        .execute()
-    )
+    updated = repository.update_order(order_id, {"shipping_address": address})
 
-    if not response.data:
+    if not updated:
         return jsonify({"error": "Order not found"}), 404
 
     return jsonify({
@@ -267,4 +206,4 @@ def add_address_to_order(order_id):
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5002, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5002, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Acceso a `orders` y `order_items`. Dos implementaciones con la misma
+interfaz; DB_BACKEND (config.py) elige cual usa la app:
+
+- SupabaseRepository ("supabase", por defecto): PostgREST por HTTPS.
+- PostgresRepository ("postgres"): conexion directa con pool y sentencias
+  preparadas (db.py).
+"""
+ORDER_ITEMS_EMBED = """
+    order_items (
+        id,
+        product_id,
+        product_name,
+        quantity,
+        price
+    )
+"""
+
+
+class SupabaseRepository:
+    def __init__(self, client):
+        self._client = client
+
+    def create_order(self, user_id, total_price, items):
+        """Inserta la orden pendiente y sus items; devuelve el id (None si falla)."""
+        response = self._client.table("orders").insert({
+            "user_id": user_id,
+            "total_price": total_price,
+            "status": "pending"
+        }).execute()
+        if not response.data:
+            return None
+
+        order_id = response.data[0]["id"]
+        self._client.table("order_items").insert(
+            [{"order_id": order_id, **item} for item in items]
+        ).execute()
+        return order_id
+
+    def pending_order(self, user_id):
+        rows = (
+            self._client
+            .table("orders")
+            .select(f"id, user_id, status, total_price, created_at, {ORDER_ITEMS_EMBED}")
+            .eq("user_id", user_id)
+            .eq("status", "pending")
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+            .data
+        )
+        return rows[0] if rows else None
+
+    def all_orders(self):
+        """Todas las ordenes con direccion e items (vista de admin)."""
+        return (
+            self._client
+            .table("orders")
+            .select(
+                f"id, user_id, status, total_price, created_at, shipping_address, {ORDER_ITEMS_EMBED}"
+            )
+            .order("created_at", desc=True)
+            .execute()
+            .data
+        )
+
+    def user_orders(self, user_id):
+        return (
+            self._client
+            .table("orders")
+            .select("*")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .execute()
+            .data
+        )
+
+    def update_order(self, order_id, fields, user_id=None):
+        """Filas actualizadas (vacio si la orden no existe o, con user_id, no es suya)."""
+        query = self._client.table("orders").update(fields).eq("id", order_id)
+        if user_id is not None:
+            query = query.eq("user_id", user_id)
+        return query.execute().data
+
+
+# Mismo JSON que el embed de PostgREST: lista de items, vacia si no hay
+ORDER_ITEMS_JSON = """
+    coalesce((
+        select json_agg(json_build_object(
+            'id', i.id,
+            'product_id', i.product_id,
+            'product_name', i.product_name,
+            'quantity', i.quantity,
+            'price', i.price
+        ) order by i.id)
+        from order_items i
+        where i.order_id = o.id
+    ), '[]') as order_items
+"""
+
+ORDER_UPDATE_COLUMNS = {"status", "shipping_address"}
+
+
+class PostgresRepository:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def create_order(self, user_id, total_price, items):
+        # Orden e items en una transaccion: no quedan ordenes sin items
+        with self._pool.transaction("orders", "insert") as conn:
+            order_id = conn.execute(
+                "insert into orders (user_id, total_price, status) "
+                "values (%s, %s, 'pending') returning id",
+                [user_id, total_price],
+            ).fetchone()["id"]
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    "insert into order_items (order_id, product_id, product_name, quantity, price) "
+                    "values (%s, %s, %s, %s, %s)",
+                    [
+                        (order_id, item["product_id"], item["product_name"], item["quantity"], item["price"])
+                        for item in items
+                    ],
+                )
+        return order_id
+
+    def pending_order(self, user_id):
+        return self._pool.fetch_one(
+            "orders", "select",
+            f"select o.id, o.user_id, o.status, o.total_price, o.created_at, {ORDER_ITEMS_JSON} "
+            "from orders o where o.user_id = %s and o.status = 'pending' "
+            "order by o.created_at desc limit 1",
+            [user_id],
+        )
+
+    def all_orders(self):
+        return self._pool.fetch(
+            "orders", "select",
+            "select o.id, o.user_id, o.status, o.total_price, o.created_at, o.shipping_address, "
+            f"{ORDER_ITEMS_JSON} from orders o order by o.created_at desc",
+        )
+
+    def user_orders(self, user_id):
+        return self._pool.fetch(
+            "orders", "select",
+            "select * from orders where user_id = %s order by created_at desc",
+            [user_id],
+        )
+
+    def update_order(self, order_id, fields, user_id=None):
+        # Columnas fijas: los nombres nunca llegan del cliente
+        columns = sorted(fields)
+        if not set(columns) <= ORDER_UPDATE_COLUMNS:
+            raise ValueError(f"Columnas no actualizables: {set(columns) - ORDER_UPDATE_COLUMNS}")
+        assignments = ", ".join(f"{column} = %s" for column in columns)
+        owner = "" if user_id is None else " and user_id = %s"
+        return self._pool.fetch(
+            "orders", "update",
+            f"update orders set {assignments} where id = %s{owner} returning *",
+            [*(fields[column] for column in columns), order_id,
+             *([] if user_id is None else [user_id])],
+        )
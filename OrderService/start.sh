@@ -0,0 +1,18 @@
+#!/bin/sh
+# APP_ENV=production: gunicorn con workers pre-fork (ver gunicorn.conf.py).
+# Cualquier otro valor: servidor de desarrollo de Flask con recarga.
+set -e
+export PORT="${PORT:-5002}"
+
+if [ "$APP_ENV" = "production" ]; then
+    # Cada worker escribe sus metricas aqui y /metrics las agrega
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    # exec: gunicorn recibe SIGTERM directamente y hace el apagado ordenado
+    exec gunicorn --config gunicorn.conf.py app:app
+fi
+
+export FLASK_APP=app.py
+export FLASK_DEBUG=1
+exec flask run --host=0.0.0.0 --port="$PORT"
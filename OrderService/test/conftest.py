@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# app.py se importa sin .env real: el repositorio se sustituye por uno en memoria
+os.environ.setdefault("VITE_SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-anon-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRepository:
+    """Ordenes en un dict por id."""
+
+    def __init__(self):
+        self.orders = {}
+
+    def pending_order(self, user_id):
+        pending = [
+            order for order in self.orders.values()
+            if order["user_id"] == user_id and order["status"] == "pending"
+        ]
+        return pending[-1] if pending else None
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Cliente de la app real (app.py) con el repositorio en memoria."""
+    repository = FakeRepository()
+    import config
+    # Antes del primer import de app.py, que toma config.repository
+    monkeypatch.setattr(config, "repository", repository)
+    import app
+    monkeypatch.setattr(app, "repository", repository)
+    return app.app.test_client(), repository
@@ -0,0 +1,73 @@
+"""
+Metricas, trazas y logs de la app real de OrderService (app.py).
+"""
+from prometheus_client.parser import text_string_to_metric_families
+
+import log
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def scraped(client, name, **labels):
+    """Valor de una serie tal como la expone /metrics (0 si no existe)."""
+    body = client.get("/metrics").get_data(as_text=True)
+    for family in text_string_to_metric_families(body):
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return 0
+
+
+def test_metrics_endpoint_counts_order_requests(service):
+    client, repository = service
+    repository.orders[7] = {"id": 7, "user_id": "user-1", "status": "pending", "order_items": []}
+    labels = {"method": "GET", "route": "/check-pending", "status": "200"}
+    before = scraped(client, "http_requests_total", **labels)
+
+    response = client.get("/check-pending", query_string={"user_id": "user-1"})
+
+    assert response.status_code == 200
+    assert response.get_json()["order"]["id"] == 7
+    assert scraped(client, "http_requests_total", **labels) == before + 1
+    assert scraped(client, "http_request_duration_seconds_count", method="GET", route="/check-pending") >= 1
+
+
+def test_order_requests_continue_the_gateway_trace(service, monkeypatch):
+    client, _ = service
+    spans = []
+    monkeypatch.setattr(tracing.exporter, "export", spans.append)
+
+    response = client.get(
+        "/check-pending",
+        query_string={"user_id": "user-1"},
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+
+    trace_id, span_id, sampled = tracing.parse_traceparent(response.headers["traceparent"])
+    assert (trace_id, sampled) == (TRACE_ID, True)
+    assert span_id != PARENT_ID
+    # El span SERVER de la peticion es hijo del span del gateway
+    (span,) = [span for span in spans if span.kind == "SERVER"]
+    assert span.service == "order-service"
+    assert span.name == "GET /check-pending"
+    assert (span.trace_id, span.parent_id, span.span_id) == (TRACE_ID, PARENT_ID, span_id)
+
+
+def test_order_access_log_carries_the_trace_id(service, monkeypatch):
+    client, _ = service
+    # Registros ya preparados por el handler de la app, antes del hilo que escribe
+    records = []
+    monkeypatch.setattr(log._handler, "enqueue", records.append)
+
+    client.get(
+        "/check-pending",
+        query_string={"user_id": "user-1"},
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+
+    (access,) = [record for record in records if record.name == "access"]
+    assert access.route == "/check-pending"
+    assert access.status == 200
+    assert access.trace_id == TRACE_ID
@@ -1,36 +1,158 @@
+import base64
+import hashlib
+import itertools
+import json
+import logging
 import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 
-from config import supabase
+from bulk import FORMATS, MODES, ImportJob, spool_upload
+from catalog import CatalogCache
+from config import (
+    ALLPRODUCTS_BATCH_SIZE,
+    CATALOG_CACHE_ENABLED,
+    CATALOG_CACHE_MAX_PRODUCTS,
+    CATALOG_CACHE_REFRESH_INTERVAL,
+    CATALOG_SYNC_DIR,
+    CATALOG_SYNC_INTERVAL,
+    FACET_PRICE_BUCKETS,
+    IMPORT_BATCH_SIZE,
+    IMPORT_MAX_BATCH_SIZE,
+    IMPORT_MAX_BYTES,
+    IMPORT_MAX_ERRORS,
+    IMPORT_STALE_SECONDS,
+    IMPORT_WORKERS,
+    RESERVATION_SWEEP_INTERVAL,
+    RESERVATION_TTL_SECONDS,
+    repository,
+)
+from invalidation import InvalidationLog
+from log import setup_logging
+from metrics import setup_metrics
+from sweeper import ReservationSweeper
+from tracing import setup_tracing
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Limite de ids por llamada a /products/batch
+MAX_BATCH_IDS = 200
+FIELD_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+# Modos de conteo de /products/search (ver repository.search)
+COUNT_MODES = ("exact", "planned", "estimated", "none")
+# Agregados que /products/search puede agregar a la respuesta (?facets=)
+FACETS = ("category", "price")
+
 app = Flask(__name__)
 
 CORS(app)  # Enable CORS for all routes
+setup_metrics(app)
+setup_tracing(app, "product-service")
+setup_logging(app, "product-service")
+
+logger = logging.getLogger(__name__)
+
+sweeper = ReservationSweeper(repository, RESERVATION_SWEEP_INTERVAL)
+sweeper.start()
+
+# Las rutas leen y escriben a traves del cache; misma interfaz que el repositorio
+if CATALOG_CACHE_ENABLED:
+    catalog = CatalogCache(
+        repository,
+        CATALOG_CACHE_MAX_PRODUCTS,
+        CATALOG_CACHE_REFRESH_INTERVAL,
+        FACET_PRICE_BUCKETS,
+        batch_size=ALLPRODUCTS_BATCH_SIZE,
+        sync=(
+            InvalidationLog(os.path.join(CATALOG_SYNC_DIR, "catalog.log"), CATALOG_SYNC_INTERVAL)
+            if CATALOG_SYNC_DIR else None
+        ),
+    )
+    catalog.start()
+else:
+    catalog = repository
+
+# Importaciones masivas en segundo plano (bulk.py)
+import_executor = ThreadPoolExecutor(IMPORT_WORKERS, thread_name_prefix="product-import")
+# Trabajos que quedaron en curso en un worker que ya no existe (reciclado
+# por max_requests o caido): sin esto seguirian "running" para siempre
+try:
+    stale_imports = repository.fail_stale_import_jobs(
+        IMPORT_STALE_SECONDS, "Importación interrumpida: el worker terminó antes de completarla"
+    )
+    if stale_imports:
+        logger.warning("importaciones huerfanas marcadas como fallidas", extra={"jobs": stale_imports})
+except Exception:
+    logger.exception("no se pudieron revisar las importaciones huerfanas")
 
 
 @app.route("/health")
 def health_check():
     return jsonify({"status": "ok"})
+
+
+def _stream_catalog(batches, first, ndjson):
+    """
+    Cuerpo de /allproducts trozo a trozo: una pagina de productos por
+    trozo, sin armar la lista completa ni su JSON.
+    """
+    dumps = app.json.dumps
+    if not ndjson:
+        yield '{"products": ['
+    separator = ""
+    try:
+        for batch in itertools.chain([first], batches):
+            if ndjson:
+                yield "".join(dumps(product) + "\n" for product in batch)
+            else:
+                yield separator + ",".join(dumps(product) for product in batch)
+                separator = ","
+    except Exception:
+        # El estado 200 ya salio: se corta el cuerpo y el JSON queda
+        # incompleto, el cliente no lo confunde con un catalogo entero
+        logger.exception("error al transmitir el catalogo")
+        return
+    if not ndjson:
+        yield "]}"
+
+
 # devolver todos los productos
 @app.route("/allproducts", methods=["GET"])
 def get_all_products():
+    """
+    Catalogo completo en streaming (chunked), leido por paginas de
+    ALLPRODUCTS_BATCH_SIZE filas.
+
+    - Por defecto: {"products": [...]}, como siempre.
+    - ?format=ndjson: un producto JSON por linea (application/x-ndjson).
+    """
+    response_format = request.args.get("format", "json")
+    if response_format not in ("json", "ndjson"):
+        return jsonify({"error": "format debe ser json o ndjson"}), 400
+
     try:
-        response = supabase.table("products").select("*").execute()
-        return jsonify({"products": response.data}), 200
+        batches = catalog.iter_products(ALLPRODUCTS_BATCH_SIZE)
+        # La primera pagina se lee antes de responder: si la base falla
+        # todavia se puede devolver un 500
+        first = next(batches, [])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    ndjson = response_format == "ndjson"
+    return Response(
+        stream_with_context(_stream_catalog(batches, first, ndjson)),
+        mimetype="application/x-ndjson" if ndjson else "application/json",
+    )
+
 #crear un producto
 @app.route("/add", methods=["POST"])
 def add_product():
-    print("datos recibidos:", request.get_json())
-
     try:
         datos = request.get_json()
         # Validar datos requeridos
@@ -40,14 +162,14 @@ def add_product():
             ), 400
 
         datos.pop("id", None)
-        print("datos a insertar:", datos)
-        response = supabase.table("products").insert(datos).execute()
+        logger.debug("producto a insertar", extra={"payload": datos})
+        creado = catalog.create_product(datos)
 
         return jsonify(
             {
                 "exito": True,
                 "mensaje": "Producto creado exitosamente",
-                "datos": response.data,
+                "datos": creado,
             }
         ), 200
     except Exception as e:
@@ -55,10 +177,71 @@ def add_product():
 
 
 
+def _filters_fingerprint(filters):
+    canonical = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def _encode_cursor(last_id, filters):
+    payload = json.dumps({"id": last_id, "f": _filters_fingerprint(filters)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, filters):
+    """
+    Id del ultimo producto de la pagina anterior (0 si el cursor esta
+    vacio). ValueError si es invalido o se creo con otros filtros.
+    """
+    if not cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id = data["id"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("cursor inválido")
+    if not isinstance(last_id, int) or data.get("f") != _filters_fingerprint(filters):
+        raise ValueError("cursor inválido para estos filtros")
+    return last_id
+
+
+def _search_facets(facets, filters):
+    """
+    {"category": [{"value", "count"}], "price": [{"min", "max", "count"}]},
+    solo las facetas pedidas. Categorias de mas a menos productos; los
+    rangos de precio siempre todos, aunque esten vacios.
+    """
+    counts = catalog.facets(**filters, price_buckets=FACET_PRICE_BUCKETS)
+    result = {}
+    if "category" in facets:
+        result["category"] = [
+            {"value": value, "count": count}
+            for value, count in sorted(counts["category"].items(), key=lambda item: (-item[1], item[0]))
+        ]
+    if "price" in facets:
+        bounds = [*FACET_PRICE_BUCKETS[1:], None]
+        result["price"] = [
+            {"min": low, "max": high, "count": count}
+            for low, high, count in zip(FACET_PRICE_BUCKETS, bounds, counts["price"])
+        ]
+    return result
+
+
 # busqueda de productos por categoria
 @app.route("/products/search", methods=["GET"])
 def search_products():
-    print("search_products")
+    """
+    Dos modos de paginacion:
+    - page / page_size (por defecto): offset, con total_pages.
+    - cursor (presente, vacio para la primera pagina): keyset por id;
+      la respuesta trae next_cursor (null en la ultima pagina).
+
+    count: exact (por defecto con page), planned, estimated o none (por
+    defecto con cursor). Con none total_products es null.
+
+    facets: category y/o price separados por coma. La respuesta agrega
+    "facets" con los conteos por categoria y por rango de precio de la
+    busqueda (cada faceta sin su propio filtro).
+    """
     try:
         # Obtener parámetros de consulta
         category = request.args.get("category")
@@ -70,49 +253,81 @@ def search_products():
         page_size = int(request.args.get("page_size", 8))
         min_price = request.args.get("min_price")
         max_price = request.args.get("max_price")
+        min_price = float(min_price) if min_price else None
+        max_price = float(max_price) if max_price else None
+    except ValueError:
+        return jsonify({"error": "Número de página o tamaño de página inválido"}), 400
+    if page < 1 or page_size < 1:
+        return jsonify({"error": "Número de página o tamaño de página inválido"}), 400
 
-        # Construir consulta base
-        print("consultando a supabase con ", category, keyword, page, page_size, min_price, max_price)
-        query = supabase.table("products").select("*", count="exact")
-
-        # Filtro por categoría
-        if category:
-            query = query.ilike("category", f"%{category}%")
-
-        # Filtro por palabra clave (busca en nombre y descripción)
-        if keyword:
-            # Supabase no tiene OR directo en el query builder, usamos filter
-            query = query.or_(f"name.ilike.%{keyword}%,description.ilike.%{keyword}%")
+    cursor = request.args.get("cursor")
+    count = request.args.get("count", "exact" if cursor is None else "none")
+    if count not in COUNT_MODES:
+        return jsonify({"error": f"count debe ser uno de: {', '.join(COUNT_MODES)}"}), 400
+    facets = [facet for facet in request.args.get("facets", "").split(",") if facet]
+    if any(facet not in FACETS for facet in facets):
+        return jsonify({"error": f"facets debe ser una lista de: {', '.join(FACETS)}"}), 400
+
+    filters = {
+        "category": category,
+        "keyword": keyword,
+        "min_price": min_price,
+        "max_price": max_price,
+    }
+    after_id = None
+    if cursor is not None:
+        try:
+            after_id = _decode_cursor(cursor, filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # Construir consulta base
+    logger.debug(
+        "busqueda de productos",
+        extra={**filters, "page": page, "page_size": page_size, "cursor": cursor, "count": count},
+    )
 
-        # Filtro por rango de precios
-        if min_price:
-            query = query.gte("price", float(min_price))
-        if max_price:
-            query = query.lte("price", float(max_price))
+    try:
+        if after_id is not None:
+            # Una fila de mas indica si hay pagina siguiente
+            products, total_products = catalog.search(
+                category, keyword, min_price, max_price, 0, page_size + 1, count, after_id
+            )
+            next_cursor = None
+            if len(products) > page_size:
+                products = products[:page_size]
+                next_cursor = _encode_cursor(products[-1]["id"], filters)
+            body = {
+                "products": products,
+                "next_cursor": next_cursor,
+                "page_size": page_size,
+                "total_products": total_products,
+            }
+            if facets:
+                body["facets"] = _search_facets(facets, filters)
+            return jsonify(body), 200
 
         # Calcular offset para paginación
         offset = (page - 1) * page_size
 
-        # Ejecutar consulta con paginación
-        response = query.range(offset, offset + page_size - 1).execute()
-
-        # Calcular total de páginas
-        total_products = (
-            response.count if hasattr(response, "count") else len(response.data)
+        # Filtros por categoría, palabra clave (nombre y descripción) y rango de precios
+        products, total_products = catalog.search(
+            category, keyword, min_price, max_price, offset, page_size, count
         )
-        total_pages = math.ceil(total_products / page_size)
 
-        return jsonify(
-            {
-                "products": response.data,
-                "total_pages": total_pages,
-                "current_page": page,
-                "total_products": total_products,
-            }
-        ), 200
+        # Calcular total de páginas
+        total_pages = math.ceil(total_products / page_size) if total_products is not None else None
+
+        body = {
+            "products": products,
+            "total_pages": total_pages,
+            "current_page": page,
+            "total_products": total_products,
+        }
+        if facets:
+            body["facets"] = _search_facets(facets, filters)
+        return jsonify(body), 200
 
-    except ValueError:
-        return jsonify({"error": "Número de página o tamaño de página inválido"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -121,12 +336,62 @@ def search_products():
 @app.route("/products/<int:id>", methods=["GET"])
 def obtener_producto(id):
     try:
-        response = supabase.table("products").select("*").eq("id", id).execute()
+        producto = catalog.get_product(id)
 
-        if len(response.data) == 0:
+        if producto is None:
             return jsonify({"exito": False, "error": "Producto no encontrado"}), 404
 
-        return jsonify({"exito": True, "datos": response.data[0]}), 200
+        return jsonify({"exito": True, "datos": producto}), 200
+    except Exception as e:
+        return jsonify({"exito": False, "error": str(e)}), 500
+
+
+@app.route("/products/batch", methods=["POST"])
+def obtener_productos_lote():
+    """
+    Payload:
+    {
+      "ids": [int],
+      "fields": ["id", "name", "price"]   (opcional, por defecto todos)
+    }
+
+    Una sola consulta `in` para todos los ids. Devuelve los productos en el
+    orden pedido y los ids que no existen.
+    """
+    datos = request.get_json(silent=True) or {}
+    ids = datos.get("ids")
+    fields = datos.get("fields")
+
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"exito": False, "error": "Se requiere una lista de ids"}), 400
+    if not all(isinstance(id, int) and not isinstance(id, bool) and id > 0 for id in ids):
+        return jsonify({"exito": False, "error": "Los ids deben ser enteros positivos"}), 400
+
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify(
+            {"exito": False, "error": f"Máximo {MAX_BATCH_IDS} ids por consulta"}
+        ), 400
+
+    if fields is None:
+        columns = None
+    elif isinstance(fields, list) and fields and all(
+        isinstance(field, str) and FIELD_NAME.match(field) for field in fields
+    ):
+        # El id siempre se incluye para poder ordenar el resultado
+        columns = list(dict.fromkeys(["id", *fields]))
+    else:
+        return jsonify({"exito": False, "error": "fields debe ser una lista de columnas"}), 400
+
+    try:
+        by_id = {product["id"]: product for product in catalog.get_products(ids, columns)}
+        return jsonify(
+            {
+                "exito": True,
+                "datos": [by_id[id] for id in ids if id in by_id],
+                "no_encontrados": [id for id in ids if id not in by_id],
+            }
+        ), 200
     except Exception as e:
         return jsonify({"exito": False, "error": str(e)}), 500
 
@@ -142,13 +407,13 @@ def crear_producto():
                 {"exito": False, "error": "Faltan campos requeridos: nombre y precio"}
             ), 400
 
-        response = supabase.table("products").insert(datos).execute()
+        creado = catalog.create_product(datos)
 
         return jsonify(
             {
                 "exito": True,
                 "mensaje": "Producto creado exitosamente",
-                "datos": response.data,
+                "datos": creado,
             }
         ), 201
     except Exception as e:
@@ -165,16 +430,16 @@ def actualizar_producto(id):
                 {"exito": False, "error": "No se enviaron datos para actualizar"}
             ), 400
 
-        response = supabase.table("products").update(datos).eq("id", id).execute()
+        actualizado = catalog.update_product(id, datos)
 
-        if len(response.data) == 0:
+        if len(actualizado) == 0:
             return jsonify({"exito": False, "error": "Producto no encontrado"}), 404
 
         return jsonify(
             {
                 "exito": True,
                 "mensaje": "Producto actualizado exitosamente",
-                "datos": response.data,
+                "datos": actualizado,
             }
         ), 200
     except Exception as e:
@@ -183,9 +448,9 @@ def actualizar_producto(id):
 
 @app.route("/delete/<int:id>", methods=["DELETE"])
 def eliminar_producto(id):
-    print("eliminar_producto:", id)
+    logger.info("eliminar producto", extra={"product_id": id})
     try:
-        response = supabase.table("products").delete().eq("id", id).execute()
+        catalog.delete_product(id)
 
         return jsonify(
             {"exito": True, "mensaje": "Producto eliminado exitosamente"}
@@ -194,6 +459,98 @@ def eliminar_producto(id):
         return jsonify({"exito": False, "error": str(e)}), 500
 
 
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+@app.route("/products/import", methods=["POST"])
+def importar_productos():
+    """
+    Cuerpo: CSV con cabecera o NDJSON (un producto por linea).
+
+    Params:
+    - format: csv | ndjson (por defecto segun Content-Type)
+    - mode: upsert (por defecto; sin id crea, con id crea o actualiza) |
+      update (solo productos existentes)
+    - batch_size: filas por escritura (IMPORT_BATCH_SIZE por defecto)
+
+    Guarda el cuerpo y responde 202 con el id del trabajo; el progreso y
+    los errores por fila se consultan en GET /products/import/<id>.
+    """
+    fmt = request.args.get("format") or IMPORT_CONTENT_TYPES.get(request.mimetype)
+    mode = request.args.get("mode", "upsert")
+    if fmt not in FORMATS:
+        return jsonify({"exito": False, "error": "format debe ser csv o ndjson"}), 400
+    if mode not in MODES:
+        return jsonify({"exito": False, "error": "mode debe ser upsert o update"}), 400
+    try:
+        batch_size = int(request.args.get("batch_size", IMPORT_BATCH_SIZE))
+    except ValueError:
+        batch_size = 0
+    if not 1 <= batch_size <= IMPORT_MAX_BATCH_SIZE:
+        return jsonify(
+            {"exito": False, "error": f"batch_size debe estar entre 1 y {IMPORT_MAX_BATCH_SIZE}"}
+        ), 400
+
+    try:
+        path, size = spool_upload(request.stream, IMPORT_MAX_BYTES)
+    except ValueError as e:
+        return jsonify({"exito": False, "error": str(e)}), 413
+    if size == 0:
+        os.remove(path)
+        return jsonify({"exito": False, "error": "El archivo está vacío"}), 400
+
+    try:
+        job = catalog.create_import_job({"format": fmt, "mode": mode, "batch_size": batch_size})
+    except Exception as e:
+        os.remove(path)
+        return jsonify({"exito": False, "error": str(e)}), 500
+
+    logger.info("importacion recibida", extra={"job_id": job["id"], "bytes": size, "mode": mode})
+    import_executor.submit(
+        ImportJob(catalog, job["id"], path, fmt, mode, batch_size, IMPORT_MAX_ERRORS).run
+    )
+    return jsonify({"exito": True, "job_id": job["id"], "status": job["status"]}), 202
+
+
+@app.route("/products/import/<int:job_id>", methods=["GET"])
+def estado_importacion(job_id):
+    """Estado, progreso (processed, written, failed) y errores por fila."""
+    try:
+        job = catalog.get_import_job(job_id)
+    except Exception as e:
+        return jsonify({"exito": False, "error": str(e)}), 500
+    if job is None:
+        return jsonify({"exito": False, "error": "Trabajo no encontrado"}), 404
+    return jsonify({"exito": True, "datos": job}), 200
+
+
+def _positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _stock_items(items):
+    """
+    Items validados para las funciones de stock (solo product_id y
+    quantity), o None si el formato es invalido.
+    """
+    if not isinstance(items, list):
+        return None
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            return None
+        product_id = item.get("product_id")
+        quantity = item.get("quantity")
+        if not _positive_int(product_id) or not _positive_int(quantity):
+            return None
+        parsed.append({"product_id": product_id, "quantity": quantity})
+    return parsed
+
+
 @app.route("/reduce-stock", methods=["POST"])
 def reduce_stock():
     """
@@ -203,102 +560,195 @@ def reduce_stock():
         { "product_id": int, "quantity": int }
       ]
     }
-    """
-    data = request.get_json()
-    items = data.get("items") if data else None
 
-    if not items:
+    Todo o nada en una sola llamada a la base de datos (sql/stock.sql):
+    si un producto no existe (404) o no tiene stock suficiente (409) no se
+    descuenta ninguno.
+    """
+    data = request.get_json(silent=True)
+    if not data or not data.get("items"):
         return jsonify({"error": "Items are required"}), 400
 
+    items = _stock_items(data["items"])
+    if items is None:
+        return jsonify({"error": "Invalid item format"}), 400
+
     try:
-        for item in items:
-            product_id = item.get("product_id")
-            quantity = item.get("quantity")
-
-            if not product_id or not quantity or quantity <= 0:
-                return jsonify({"error": "Invalid item format"}), 400
-
-            # Obtener producto
-            response = (
-                supabase
-                .table("products")
-                .select("id, stock")
-                .eq("id", product_id)
-                .execute()
-            )
+        result = catalog.reduce_stock(items)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            if not response.data:
-                return jsonify({"error": f"Product {product_id} not found"}), 404
+    if result["missing"]:
+        return jsonify({
+            "error": f"Product {result['missing'][0]} not found",
+            "missing": result["missing"]
+        }), 404
 
-            current_stock = response.data[0]["stock"]
+    if result["insufficient"]:
+        return jsonify({
+            "error": f"Insufficient stock for product {result['insufficient'][0]}",
+            "insufficient": result["insufficient"]
+        }), 409
 
-            if current_stock < quantity:
-                return jsonify({
-                    "error": f"Insufficient stock for product {product_id}"
-                }), 409
+    return jsonify({
+        "message": "Stock reduced successfully"
+    }), 200
 
-            # Reducir stock
-            supabase.table("products").update({
-                "stock": current_stock - quantity
-            }).eq("id", product_id).execute()
 
-        return jsonify({
-            "message": "Stock reduced successfully"
-        }), 200
+@app.route("/restore-stock", methods=["POST"])
+def restore_stock():
+    """
+    Payload:
+    {
+      "items": [
+        { "product_id": int, "quantity": int }
+      ]
+    }
+
+    Compensacion de /reduce-stock en una sola llamada. Los productos que ya
+    no existen se ignoran para no romper la saga.
+    """
+    data = request.get_json(silent=True)
+    if not data or not data.get("items"):
+        return jsonify({"error": "Items are required"}), 400
+
+    items = _stock_items(data["items"])
+    if items is None:
+        return jsonify({"error": "Invalid item format"}), 400
 
+    try:
+        result = catalog.restore_stock(items)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    if result["missing"]:
+        logger.warning("restaurar stock de productos inexistentes", extra={"missing": result["missing"]})
 
-@app.route("/restore-stock", methods=["POST"])
-def restore_stock():
+    return jsonify({
+        "message": "Stock restored successfully"
+    }), 200
+
+@app.route("/reservations", methods=["POST"])
+def reservar_stock():
     """
     Payload:
     {
+      "order_id": int,
       "items": [
         { "product_id": int, "quantity": int }
-      ]
+      ],
+      "ttl_seconds": int   (opcional, RESERVATION_TTL_SECONDS por defecto)
     }
+
+    Aparta el stock de la orden hasta que se confirme (pago), se libere
+    (cancelacion) o venza. Todo o nada: 404 si falta un producto, 409 si
+    no hay disponibilidad. Repetir la llamada renueva la reserva.
     """
-    data = request.get_json()
-    items = data.get("items") if data else None
+    data = request.get_json(silent=True) or {}
+    order_id = data.get("order_id")
+    ttl_seconds = data.get("ttl_seconds", RESERVATION_TTL_SECONDS)
 
-    if not items:
-        return jsonify({"error": "Items are required"}), 400
+    if not _positive_int(order_id) or not _positive_int(ttl_seconds):
+        return jsonify({"exito": False, "error": "order_id y ttl_seconds deben ser enteros positivos"}), 400
+    if not data.get("items"):
+        return jsonify({"exito": False, "error": "Items are required"}), 400
+
+    items = _stock_items(data["items"])
+    if items is None:
+        return jsonify({"exito": False, "error": "Invalid item format"}), 400
 
     try:
-        for item in items:
-            product_id = item.get("product_id")
-            quantity = item.get("quantity")
-
-            if not product_id or not quantity or quantity <= 0:
-                return jsonify({"error": "Invalid item format"}), 400
-
-            # Obtener stock actual
-            response = (
-                supabase
-                .table("products")
-                .select("stock")
-                .eq("id", product_id)
-                .execute()
-            )
+        result = catalog.reserve_stock(order_id, items, ttl_seconds)
+    except Exception as e:
+        return jsonify({"exito": False, "error": str(e)}), 500
 
-            if not response.data:
-                continue  # No rompemos compensación por un producto inexistente
+    if result.get("confirmed"):
+        return jsonify({"exito": False, "error": f"La orden {order_id} ya fue confirmada"}), 409
+    if result["missing"]:
+        return jsonify({
+            "exito": False,
+            "error": f"Product {result['missing'][0]} not found",
+            "missing": result["missing"]
+        }), 404
+    if result["insufficient"]:
+        return jsonify({
+            "exito": False,
+            "error": f"Insufficient stock for product {result['insufficient'][0]}",
+            "insufficient": result["insufficient"]
+        }), 409
 
-            current_stock = response.data[0]["stock"]
+    return jsonify({
+        "exito": True,
+        "order_id": order_id,
+        "expires_at": result["expires_at"]
+    }), 201
 
-            # Restaurar stock
-            supabase.table("products").update({
-                "stock": current_stock + quantity
-            }).eq("id", product_id).execute()
 
+@app.route("/reservations/<int:order_id>/confirm", methods=["POST"])
+def confirmar_reserva(order_id):
+    """
+    Descuenta el stock reservado (pago). Si la reserva vencio se vuelve a
+    comprobar la disponibilidad: 409 si ya no alcanza, o si la reserva se
+    libero (orden cancelada). Idempotente.
+    """
+    try:
+        result = catalog.confirm_reservation(order_id)
+    except Exception as e:
+        return jsonify({"exito": False, "error": str(e)}), 500
+
+    if result["insufficient"] or result["missing"]:
+        product_id = (result["insufficient"] or result["missing"])[0]
         return jsonify({
-            "message": "Stock restored successfully"
-        }), 200
+            "exito": False,
+            "error": f"Insufficient stock for product {product_id}",
+            "insufficient": result["insufficient"],
+            "missing": result["missing"]
+        }), 409
+    if result.get("released"):
+        return jsonify({"exito": False, "error": f"La reserva de la orden {order_id} fue liberada"}), 409
+    if not result["ok"]:
+        return jsonify({"exito": False, "error": f"La orden {order_id} no tiene reserva"}), 404
+
+    return jsonify({"exito": True, "order_id": order_id}), 200
 
+
+@app.route("/reservations/<int:order_id>/release", methods=["POST"])
+def liberar_reserva(order_id):
+    """
+    Cancelacion: libera la reserva; si ya estaba confirmada devuelve el
+    stock. Idempotente.
+    """
+    try:
+        result = catalog.release_reservation(order_id)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"exito": False, "error": str(e)}), 500
+
+    return jsonify({"exito": True, "order_id": order_id, **result}), 200
+
+
+@app.route("/availability", methods=["GET"])
+def disponibilidad():
+    """
+    Params:
+    - ids: lista separada por comas (máximo MAX_BATCH_IDS)
+
+    Stock menos las reservas activas, por producto.
+    """
+    try:
+        ids = list(dict.fromkeys(int(id) for id in request.args.get("ids", "").split(",") if id))
+    except ValueError:
+        return jsonify({"exito": False, "error": "ids debe ser una lista de enteros"}), 400
+    if not ids or len(ids) > MAX_BATCH_IDS:
+        return jsonify(
+            {"exito": False, "error": f"Se requieren entre 1 y {MAX_BATCH_IDS} ids"}
+        ), 400
+
+    try:
+        rows = catalog.availability(ids)
+    except Exception as e:
+        return jsonify({"exito": False, "error": str(e)}), 500
+
+    return jsonify({"exito": True, "datos": rows}), 200
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG") == "1")
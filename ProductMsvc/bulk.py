@@ -0,0 +1,258 @@
+"""
+Importacion masiva de productos (POST /products/import).
+
+La peticion solo guarda el cuerpo (CSV o NDJSON) en un archivo temporal
+y crea el trabajo; ImportJob lo procesa en segundo plano:
+
+- Lee fila a fila, sin cargar el archivo entero.
+- Valida cada fila (tipos de id, price, stock; columnas requeridas).
+- Agrupa por conjunto de columnas y escribe en lotes de `batch_size`
+  filas: una consulta por lote en vez de una por producto.
+- Si un lote falla se reintenta fila a fila para atribuir el error a
+  cada fila; el resto del lote se escribe igual.
+- Tras cada lote actualiza el progreso del trabajo (product_import_jobs),
+  que se consulta con GET /products/import/<id>, y su `updated_at`. Al
+  arrancar, cada worker marca "failed" los trabajos sin actividad desde
+  hace IMPORT_STALE_SECONDS: los de un worker reciclado o caido.
+
+Modos: "upsert" crea los productos sin id y crea o actualiza los que
+traen id; "update" solo modifica productos existentes (edicion masiva,
+ej. cambio de precios), los ids desconocidos son errores de fila.
+"""
+import codecs
+import csv
+import datetime
+import json
+import logging
+import os
+import re
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+MODES = ("upsert", "update")
+COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+# Campos obligatorios al crear, como en /add
+REQUIRED_ON_CREATE = ("name", "price")
+
+
+def spool_upload(stream, max_bytes, chunk_size=64 * 1024):
+    """
+    Copia el cuerpo de la peticion a un archivo temporal, trozo a trozo.
+    Devuelve (ruta, bytes). ValueError si supera `max_bytes`.
+    """
+    fd, path = tempfile.mkstemp(prefix="product-import-")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"El archivo supera el máximo de {max_bytes} bytes")
+                target.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def read_rows(binary, fmt):
+    """(numero de fila, dict o None, error o None) por cada fila de datos."""
+    text = codecs.getreader("utf-8-sig")(binary)
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(text), 1):
+            if None in row:
+                yield number, None, "La fila tiene más columnas que la cabecera"
+            else:
+                yield number, row, None
+        return
+
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "JSON inválido"
+            continue
+        if isinstance(row, dict):
+            yield number, row, None
+        else:
+            yield number, None, "Cada línea debe ser un objeto JSON"
+
+
+def _integer(column, value, minimum):
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"{column} debe ser un entero")
+    if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+        raise ValueError(f"{column} debe ser un entero mayor o igual a {minimum}")
+    return value
+
+
+def _number(column, value):
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"{column} debe ser un número")
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"{column} debe ser un número no negativo")
+    return value
+
+
+def clean_row(raw, fmt, mode):
+    """Fila validada y con tipos; ValueError con el motivo si no es valida."""
+    row = {}
+    for column, value in raw.items():
+        column = (column or "").strip()
+        if fmt == "csv" and value == "":
+            # En CSV una celda vacia es "no cambiar", no null
+            continue
+        if not COLUMN_NAME.match(column):
+            raise ValueError(f"Columna inválida: {column!r}")
+        row[column] = value
+
+    if "id" in row:
+        row["id"] = _integer("id", row["id"], 1)
+    if "stock" in row and row["stock"] is not None:
+        row["stock"] = _integer("stock", row["stock"], 0)
+    if "price" in row:
+        row["price"] = _number("price", row["price"])
+    if "name" in row and (not isinstance(row["name"], str) or not row["name"].strip()):
+        raise ValueError("name no puede estar vacío")
+
+    if mode == "update":
+        if "id" not in row:
+            raise ValueError("Falta id")
+        if len(row) == 1:
+            raise ValueError("No hay columnas para actualizar")
+    elif "id" not in row:
+        missing = [column for column in REQUIRED_ON_CREATE if column not in row]
+        if missing:
+            raise ValueError(f"Faltan campos requeridos: {', '.join(missing)}")
+    return row
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class ImportJob:
+    def __init__(self, repository, job_id, path, fmt, mode, batch_size, max_errors):
+        self.repository = repository
+        self.job_id = job_id
+        self.path = path
+        self.fmt = fmt
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.processed = 0
+        self.written = 0
+        self.failed = 0
+        self.errors = []
+        # Errores ya guardados: la lista solo crece, se reescribe si cambio
+        self._saved_errors = 0
+        self._explicit_ids = False
+
+    def run(self):
+        now = _now()
+        claimed = self.repository.claim_import_job(
+            self.job_id, {"status": "running", "started_at": now, "updated_at": now}
+        )
+        if not claimed:
+            # Ya no esta en cola: se dio por huerfano mientras esperaba
+            logger.warning("importacion descartada", extra={"job_id": self.job_id})
+            os.remove(self.path)
+            return
+        try:
+            pending = {}
+            with open(self.path, "rb") as binary:
+                for number, raw, error in read_rows(binary, self.fmt):
+                    self.processed += 1
+                    if error is None:
+                        try:
+                            row = clean_row(raw, self.fmt, self.mode)
+                        except ValueError as e:
+                            error = str(e)
+                    if error is not None:
+                        self._fail(number, raw, error)
+                        continue
+
+                    # Un lote por conjunto de columnas: una sola sentencia por lote
+                    batch = pending.setdefault(frozenset(row), [])
+                    batch.append((number, row))
+                    if len(batch) >= self.batch_size:
+                        self._flush(pending.pop(frozenset(row)))
+
+            for batch in pending.values():
+                self._flush(batch)
+            if self._explicit_ids:
+                # Los inserts con id no avanzan la secuencia de products
+                self.repository.sync_products_id_sequence()
+            self._save(status="done", finished_at=_now())
+        except Exception as e:
+            logger.exception("importacion fallida", extra={"job_id": self.job_id})
+            self._save(status="failed", error=str(e), finished_at=_now())
+        finally:
+            os.remove(self.path)
+        logger.info(
+            "importacion terminada",
+            extra={"job_id": self.job_id, "written": self.written, "failed": self.failed},
+        )
+
+    def _write(self, rows):
+        if self.mode == "update":
+            return self.repository.update_products(rows)
+        return self.repository.upsert_products(rows)
+
+    def _flush(self, batch):
+        rows = [row for _, row in batch]
+        try:
+            results = [(batch, self._write(rows))]
+        except Exception:
+            # Se aisla la fila con error; las demas se escriben igual
+            results = []
+            for number, row in batch:
+                try:
+                    results.append(([(number, row)], self._write([row])))
+                except Exception as e:
+                    self._fail(number, row, str(e))
+
+        for written_batch, written in results:
+            self.written += len(written)
+            if self.mode == "update":
+                found = {row["id"] for row in written}
+                for number, row in written_batch:
+                    if row["id"] not in found:
+                        self._fail(number, row, "Producto no encontrado")
+            elif "id" in written_batch[0][1]:
+                self._explicit_ids = True
+        self._save()
+
+    def _fail(self, number, row, error):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            entry = {"row": number, "error": error}
+            if isinstance(row, dict) and row.get("id") not in (None, ""):
+                entry["id"] = row["id"]
+            self.errors.append(entry)
+
+    def _save(self, **fields):
+        datos = {
+            "processed": self.processed,
+            "written": self.written,
+            "failed": self.failed,
+            "updated_at": _now(),
+            **fields,
+        }
+        if len(self.errors) != self._saved_errors:
+            datos["errors"] = self.errors
+            self._saved_errors = len(self.errors)
+        self.repository.update_import_job(self.job_id, datos)
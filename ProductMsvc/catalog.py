@@ -0,0 +1,426 @@
+"""
+Cache en memoria del catalogo de productos, por proceso.
+
+CatalogCache envuelve al repositorio con la misma interfaz: las lecturas
+(/allproducts, /products/search, /products/<id>, /products/batch) salen
+de memoria y cada escritura hecha por este servicio actualiza o expulsa
+las entradas afectadas (write-through).
+
+- Si el catalogo completo cabe en `max_products` se guarda entero y las
+  busquedas se resuelven en memoria con el indice de search_index.py,
+  actualizado en cada escritura (tambien los conteos de las facetas
+  de /products/search). Si no cabe, solo se cachean por id
+  los productos pedidos (LRU) y listados y busquedas van a la base.
+- Con `sync` (invalidation.py) cada escritura se anuncia a los demas
+  workers de gunicorn de la maquina, que releen esos productos en uno o
+  dos segundos.
+- Cada `refresh_interval` segundos un hilo recarga el catalogo: corrige
+  lo que cambio por fuera del servicio (el SQL editor de Supabase, otra
+  maquina) o una invalidacion perdida.
+- Aciertos y fallos se exportan en /metrics (catalog_cache_*).
+"""
+import bisect
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from prometheus_client import Counter as PrometheusCounter
+from prometheus_client import Gauge
+
+from search_index import SearchIndex, in_price_range
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = PrometheusCounter(
+    "catalog_cache_requests_total",
+    "Lecturas del catalogo por operacion y resultado (hit, miss)",
+    ["operation", "result"],
+)
+CACHE_REFRESHES = PrometheusCounter(
+    "catalog_cache_refreshes_total",
+    "Recargas completas del catalogo por resultado",
+    ["result"],
+)
+CACHE_PRODUCTS = Gauge(
+    "catalog_cache_products",
+    "Productos en el cache del catalogo",
+    multiprocess_mode="liveall",
+)
+
+
+class CatalogCache:
+    def __init__(self, repository, max_products, refresh_interval, price_buckets=(), batch_size=500,
+                 sync=None):
+        self.repository = repository
+        self.max_products = max_products
+        self.refresh_interval = refresh_interval
+        # Filas por pagina al recargar
+        self.batch_size = batch_size
+        # Rangos de la faceta de precios del indice
+        self.price_buckets = tuple(price_buckets)
+        # Invalidaciones entre workers (InvalidationLog); None si no hay
+        self.sync = sync
+        self.stats = Counter()
+        self._products = OrderedDict()
+        # True si _products tiene el catalogo entero (un id ausente no existe)
+        self._complete = False
+        # Indice de texto de _products, solo con el catalogo completo
+        self._index = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        # Una sola recarga a la vez (la inicial y la periodica)
+        self._refresh_lock = threading.RLock()
+        # Ids escritos durante una recarga: su valor en cache es mas nuevo
+        # que el de la recarga
+        self._dirty = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __getattr__(self, name):
+        # Operaciones que no tocan products (reservas, disponibilidad...)
+        return getattr(self.repository, name)
+
+    def __len__(self):
+        return len(self._products)
+
+    @property
+    def complete(self):
+        return self._complete
+
+    def start(self):
+        if self.sync is not None:
+            # Lo que escriben otros workers se relee de la base
+            self.sync.start(self._reload)
+        if self.refresh_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="catalog-refresh")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Se sigue sirviendo la copia anterior y se reintenta en la siguiente vuelta
+                CACHE_REFRESHES.labels("error").inc()
+                logger.exception("error al recargar el catalogo")
+
+    def refresh(self):
+        """Recarga el catalogo completo desde el repositorio."""
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        with self._lock:
+            self._dirty = set()
+        try:
+            rows, truncated = self._load_rows()
+        except Exception:
+            with self._lock:
+                self._dirty = None
+            raise
+
+        # Sin indice previo se construye fuera del lock (las lecturas siguen);
+        # si ya existe solo se reindexan las filas que cambiaron
+        index = None
+        if self._index is None and not truncated:
+            index = SearchIndex.build(rows, self.price_buckets)
+
+        with self._lock:
+            current, dirty = self._products, self._dirty
+            self._dirty = None
+            fresh = OrderedDict((row["id"], row) for row in sorted(rows, key=lambda row: row["id"]))
+            # Lo escrito durante la recarga gana a la recarga
+            for id in dirty:
+                if id in current:
+                    fresh[id] = current[id]
+                else:
+                    fresh.pop(id, None)
+
+            # Solo se da por completo si se leyeron todas las paginas
+            if not truncated and len(fresh) <= self.max_products:
+                if index is not None:
+                    for id in dirty:
+                        if id in fresh:
+                            index.add(fresh[id])
+                        else:
+                            index.remove(id)
+                elif self._index is not None:
+                    index = self._index
+                    for id, row in fresh.items():
+                        if current.get(id) != row:
+                            index.add(row)
+                    for id in current.keys() - fresh.keys():
+                        index.remove(id)
+                else:
+                    index = SearchIndex.build(fresh.values(), self.price_buckets)
+                self._products = fresh
+                self._index = index
+                self._complete = True
+            else:
+                # Demasiado grande: se actualizan los ya cacheados y se descartan los borrados
+                self._products = OrderedDict(
+                    (id, fresh[id]) for id in current if id in fresh
+                )
+                self._index = None
+                self._complete = False
+            self._loaded = True
+            CACHE_PRODUCTS.set(len(self._products))
+        CACHE_REFRESHES.labels("ok").inc()
+        self.stats["refreshes"] += 1
+        logger.info(
+            "catalogo recargado",
+            extra={"products": len(rows), "cached": len(self._products), "complete": self._complete},
+        )
+
+    def _load_rows(self):
+        """
+        (filas, truncado). Catalogo por paginas keyset: un solo select("*")
+        de PostgREST se corta en el max-rows de Supabase (1000 por defecto)
+        y el catalogo truncado pareceria completo. Pasado max_products deja
+        de leer: no entra entero y solo se refrescan los ya cacheados que
+        aparecieron.
+        """
+        rows = []
+        for batch in self.repository.iter_products(self.batch_size):
+            rows += batch
+            if len(rows) > self.max_products:
+                return rows, True
+        return rows, False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._refresh_lock:
+            # Otro hilo pudo cargarlo mientras se esperaba el lock
+            if not self._loaded:
+                self._refresh()
+
+    def _count(self, operation, hit):
+        result = "hit" if hit else "miss"
+        self.stats[f"{operation}_{result}"] += 1
+        CACHE_REQUESTS.labels(operation, result).inc()
+
+    # --- escrituras en cache ---
+
+    def _put(self, rows):
+        with self._lock:
+            for row in rows:
+                self._products[row["id"]] = row
+                if not self._complete:
+                    # LRU; con el catalogo completo se conserva el orden por id
+                    self._products.move_to_end(row["id"])
+                if self._index is not None:
+                    self._index.add(row)
+                if self._dirty is not None:
+                    self._dirty.add(row["id"])
+            while len(self._products) > self.max_products:
+                self._products.popitem(last=False)
+                # Ya no esta todo: un id ausente puede existir
+                self._complete = False
+                self._index = None
+                self.stats["evictions"] += 1
+            CACHE_PRODUCTS.set(len(self._products))
+
+    def _evict(self, ids):
+        with self._lock:
+            for id in ids:
+                self._products.pop(id, None)
+                if self._index is not None:
+                    self._index.remove(id)
+                if self._dirty is not None:
+                    self._dirty.add(id)
+            CACHE_PRODUCTS.set(len(self._products))
+
+    def _publish(self, ids):
+        if self.sync is None:
+            return
+        try:
+            self.sync.publish(ids)
+        except Exception:
+            # La escritura ya se hizo: los demas workers esperan a la recarga periodica
+            logger.exception("no se pudo anunciar la escritura a los demas workers")
+
+    def _reload(self, ids):
+        """Relee de la base las filas de `ids` (stock modificado por SQL)."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return
+        try:
+            rows = self.repository.get_products(ids)
+        except Exception:
+            # La escritura ya se hizo: no se falla la peticion. Hasta la
+            # proxima recarga los ausentes se buscan en la base
+            logger.exception("no se pudo releer productos modificados", extra={"ids": ids})
+            with self._lock:
+                self._complete = False
+                self._index = None
+            self._evict(ids)
+            return
+        found = {row["id"] for row in rows}
+        self._put(rows)
+        self._evict([id for id in ids if id not in found])
+
+    # --- lecturas ---
+
+    def all_products(self):
+        self._ensure_loaded()
+        if self._complete:
+            self._count("all", True)
+            return list(self._products.values())
+        self._count("all", False)
+        return [row for batch in self.repository.iter_products(self.batch_size) for row in batch]
+
+    def iter_products(self, batch_size):
+        self._ensure_loaded()
+        with self._lock:
+            # Solo referencias: el stream no copia los productos
+            products = list(self._products.values()) if self._complete else None
+        if products is None:
+            self._count("all", False)
+            yield from self.repository.iter_products(batch_size)
+            return
+        self._count("all", True)
+        for start in range(0, len(products), batch_size):
+            yield products[start:start + batch_size]
+
+    def search(self, category, keyword, min_price, max_price, offset, limit,
+               count="exact", after_id=None):
+        self._ensure_loaded()
+        with self._lock:
+            # El indice solo existe con el catalogo completo
+            index = self._index
+            if index is not None:
+                ranked = index.search(category, keyword)
+                if ranked is None or after_id is not None:
+                    # Sin filtro de texto o con cursor: por id, como la consulta a la base
+                    ids = sorted(self._products) if ranked is None else sorted(ranked)
+                else:
+                    ids = ranked
+                products = [self._products[id] for id in ids]
+        if index is None:
+            self._count("search", False)
+            return self.repository.search(
+                category, keyword, min_price, max_price, offset, limit, count, after_id
+            )
+
+        self._count("search", True)
+        matches = [
+            product for product in products
+            if in_price_range(product.get("price"), min_price, max_price)
+        ]
+        # En memoria contar es gratis: cualquier modo salvo "none" es exacto
+        total = None if count == "none" else len(matches)
+        if after_id is not None:
+            start = bisect.bisect_right(matches, after_id, key=lambda product: product["id"])
+            return matches[start:start + limit], total
+        return matches[offset:offset + limit], total
+
+    def facets(self, category, keyword, min_price, max_price, price_buckets):
+        self._ensure_loaded()
+        with self._lock:
+            index = self._index
+            if index is not None and index.price_buckets == tuple(price_buckets):
+                facets = index.facets(category, keyword, min_price, max_price)
+            else:
+                facets = None
+        self._count("facets", facets is not None)
+        if facets is None:
+            return self.repository.facets(category, keyword, min_price, max_price, price_buckets)
+        return facets
+
+    def get_product(self, id):
+        self._ensure_loaded()
+        with self._lock:
+            product = self._products.get(id)
+            if product is not None and not self._complete:
+                self._products.move_to_end(id)
+        if product is not None or self._complete:
+            self._count("detail", True)
+            return product
+
+        self._count("detail", False)
+        product = self.repository.get_product(id)
+        if product is not None:
+            self._put([product])
+        return product
+
+    def get_products(self, ids, fields=None):
+        self._ensure_loaded()
+        cached = {id: self._products[id] for id in ids if id in self._products}
+        missing = [id for id in ids if id not in cached]
+        if missing and not self._complete:
+            self._count("batch", False)
+            rows = self.repository.get_products(missing)
+            self._put(rows)
+            cached.update((row["id"], row) for row in rows)
+        else:
+            self._count("batch", True)
+
+        products = [cached[id] for id in ids if id in cached]
+        if not fields:
+            return products
+        if products and not set(fields) <= products[0].keys():
+            # Columna inexistente: que responda la base con su error
+            return self.repository.get_products(ids, fields)
+        return [{field: product[field] for field in fields} for product in products]
+
+    # --- escrituras (write-through) ---
+
+    def create_product(self, datos):
+        rows = self.repository.create_product(datos)
+        self._put(rows)
+        self._publish(row["id"] for row in rows)
+        return rows
+
+    def update_product(self, id, datos):
+        rows = self.repository.update_product(id, datos)
+        self._put(rows)
+        self._publish(row["id"] for row in rows)
+        return rows
+
+    def delete_product(self, id):
+        self.repository.delete_product(id)
+        self._evict([id])
+        self._publish([id])
+
+    def upsert_products(self, rows):
+        written = self.repository.upsert_products(rows)
+        self._put(written)
+        self._publish(row["id"] for row in written)
+        return written
+
+    def update_products(self, rows):
+        written = self.repository.update_products(rows)
+        self._put(written)
+        self._publish(row["id"] for row in written)
+        return written
+
+    def reduce_stock(self, items):
+        result = self.repository.reduce_stock(items)
+        if result["ok"]:
+            ids = [item["product_id"] for item in items]
+            self._reload(ids)
+            self._publish(ids)
+        return result
+
+    def restore_stock(self, items):
+        result = self.repository.restore_stock(items)
+        self._reload(result["restored"])
+        self._publish(result["restored"])
+        return result
+
+    def confirm_reservation(self, order_id):
+        result = self.repository.confirm_reservation(order_id)
+        self._reload(result.get("products", []))
+        self._publish(result.get("products", []))
+        return result
+
+    def release_reservation(self, order_id):
+        result = self.repository.release_reservation(order_id)
+        self._reload(result.get("products", []))
+        self._publish(result.get("products", []))
+        return result
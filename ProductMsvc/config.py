@@ -1,11 +1,65 @@
 import os
 
 from dotenv import load_dotenv
-from supabase import Client, create_client
+from supabase import create_client
+
+from db import PostgresPool
+from metrics import InstrumentedSupabase
+from repository import PostgresRepository, SupabaseRepository
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+# "supabase" (PostgREST por HTTPS) o "postgres" (conexion directa, ver db.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+
+# Reservas de stock del checkout (sql/reservations.sql)
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+# Cada cuantos segundos se marcan como vencidas las reservas pasadas de plazo
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+
+# Cache en memoria del catalogo (catalog.py)
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+# Por encima de este numero de productos solo se cachean por id (LRU)
+CATALOG_CACHE_MAX_PRODUCTS = int(os.getenv("CATALOG_CACHE_MAX_PRODUCTS", "10000"))
+# Cada cuantos segundos se recarga el catalogo completo (0 desactiva)
+CATALOG_CACHE_REFRESH_INTERVAL = float(os.getenv("CATALOG_CACHE_REFRESH_INTERVAL", "300"))
+# Directorio donde los workers de gunicorn se anuncian las escrituras
+# (invalidation.py); vacio: cada worker solo ve las suyas hasta la recarga
+CATALOG_SYNC_DIR = os.getenv("CATALOG_SYNC_DIR", "")
+# Cada cuantos segundos lee cada worker las escrituras de los demas
+CATALOG_SYNC_INTERVAL = float(os.getenv("CATALOG_SYNC_INTERVAL", "1"))
+
+# Limites inferiores de los rangos de la faceta de precios de
+# /products/search; el ultimo rango no tiene tope
+FACET_PRICE_BUCKETS = tuple(
+    sorted(float(edge) for edge in os.getenv("FACET_PRICE_BUCKETS", "0,25,50,100,250,500,1000").split(","))
+)
+
+# Filas por consulta al transmitir /allproducts
+ALLPRODUCTS_BATCH_SIZE = int(os.getenv("ALLPRODUCTS_BATCH_SIZE", "500"))
+
+# Importacion masiva (bulk.py, sql/import_jobs.sql)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_BATCH_SIZE = int(os.getenv("IMPORT_MAX_BATCH_SIZE", "5000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+# Errores de fila guardados por trabajo (el contador `failed` los cuenta todos)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+# Importaciones simultaneas por worker; las demas esperan en cola
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+# Sin actividad durante estos segundos un trabajo se da por huerfano
+IMPORT_STALE_SECONDS = int(os.getenv("IMPORT_STALE_SECONDS", "600"))
+
+
+def create_repository(service_name):
+    if DB_BACKEND == "postgres":
+        return PostgresRepository(PostgresPool.from_env(service_name))
+    if DB_BACKEND != "supabase":
+        raise RuntimeError(f"DB_BACKEND desconocido: {DB_BACKEND}")
+    # Todas las consultas pasan por el wrapper que las mide (ver metrics.py)
+    return SupabaseRepository(InstrumentedSupabase(create_client(SUPABASE_URL, SUPABASE_ANON_KEY)))
+
+
+repository = create_repository("product-service")
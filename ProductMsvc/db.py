@@ -0,0 +1,108 @@
+"""
+Conexion directa a Postgres para DB_BACKEND=postgres (ver repository.py).
+
+- Pool de conexiones por proceso (psycopg_pool): sin handshake TLS ni
+  autenticacion por consulta.
+- Sentencias preparadas desde la primera ejecucion: Postgres planifica
+  cada consulta una vez por conexion.
+- Las filas salen con los mismos tipos JSON que devuelve PostgREST
+  (numeric -> float, timestamp -> ISO 8601, uuid -> str).
+
+DB_PREPARE=off desactiva las sentencias preparadas, necesario detras de un
+pooler en modo transaccion (pgbouncer, Supavisor en el puerto 6543).
+"""
+import atexit
+import datetime
+import decimal
+import os
+import uuid
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from metrics import timed_query
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Segundos esperando una conexion libre antes de fallar la peticion
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_PREPARE = os.getenv("DB_PREPARE", "on").lower() != "off"
+
+
+def _jsonable(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def json_row(row):
+    return {column: _jsonable(value) for column, value in row.items()}
+
+
+class PostgresPool:
+    """Pool de conexiones con consultas medidas (metrics.timed_query)."""
+
+    def __init__(self, url, min_size=1, max_size=10, timeout=5.0, prepare=True, name=None):
+        if not url:
+            raise RuntimeError("DB_BACKEND=postgres requiere DATABASE_URL")
+        self.prepare = prepare
+        self._pool = ConnectionPool(
+            url,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            name=name,
+            kwargs={
+                "autocommit": True,
+                "row_factory": dict_row,
+                # 0: preparar en la primera ejecucion; None: nunca
+                "prepare_threshold": 0 if prepare else None,
+            },
+            open=True,
+        )
+        atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, name=None):
+        return cls(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_PREPARE, name)
+
+    def fetch(self, table, operation, query, params=()):
+        """Filas de una consulta (o de un INSERT/UPDATE ... RETURNING)."""
+        with timed_query(table, operation, "postgres"):
+            with self._pool.connection() as conn:
+                cursor = conn.execute(query, params)
+                rows = cursor.fetchall() if cursor.description else []
+        return [json_row(row) for row in rows]
+
+    def fetch_one(self, table, operation, query, params=()):
+        rows = self.fetch(table, operation, query, params)
+        return rows[0] if rows else None
+
+    def execute(self, table, operation, query, params=()):
+        """Sentencia sin resultado; devuelve las filas afectadas."""
+        with timed_query(table, operation, "postgres"):
+            with self._pool.connection() as conn:
+                return conn.execute(query, params).rowcount
+
+    @contextmanager
+    def transaction(self, table, operation):
+        """Varias sentencias en una transaccion, medidas como una sola consulta."""
+        with timed_query(table, operation, "postgres"):
+            with self._pool.connection() as conn, conn.transaction():
+                yield conn
+
+    @property
+    def stats(self):
+        return self._pool.get_stats()
+
+    def close(self):
+        self._pool.close()
@@ -0,0 +1,127 @@
+"""
+Invalidaciones compartidas entre los workers de gunicorn de una maquina.
+
+Cada worker tiene su propio CatalogCache: una escritura solo actualiza el
+cache del worker que la atendio. InvalidationLog es un fichero de solo
+anadir en CATALOG_SYNC_DIR donde cada worker publica los ids que escribio;
+los demas lo leen cada CATALOG_SYNC_INTERVAL segundos y releen esos ids.
+
+- Cada linea es "<pid> <id>,<id>,..."; un worker ignora sus propias lineas.
+- Las lineas se escriben con O_APPEND y una sola write() de a lo sumo
+  MAX_LINE_BYTES: no se mezclan entre procesos.
+- Pasado `max_bytes` el que publica borra el fichero y el siguiente crea
+  uno nuevo. Los lectores conservan abierto el anterior, lo terminan de
+  leer y pasan al nuevo.
+- Es best-effort (en una carrera de rotacion se puede perder una linea):
+  la recarga periodica del catalogo sigue siendo la red de seguridad.
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_BYTES = 4096
+
+
+class InvalidationLog:
+    def __init__(self, path, interval, max_bytes=1024 * 1024):
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.published = 0
+        self.received = 0
+        self.pid = os.getpid()
+        self._file = None
+        self._pending = b""
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self, at_end):
+        if self._file is not None:
+            self._file.close()
+        fd = os.open(self.path, os.O_RDONLY | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, "rb")
+        if at_end:
+            # Lo anterior al arranque ya esta en la carga inicial del catalogo
+            self._file.seek(0, os.SEEK_END)
+        self._pending = b""
+
+    def publish(self, ids):
+        """Anuncia a los demas workers que cambiaron los productos `ids`."""
+        ids = [str(id) for id in dict.fromkeys(ids)]
+        if not ids:
+            return
+        prefix = f"{self.pid} "
+        lines, line = [], prefix
+        for id in ids:
+            if len(line) + len(id) + 2 > MAX_LINE_BYTES:
+                lines.append(line.rstrip(",") + "\n")
+                line = prefix
+            line += id + ","
+        lines.append(line.rstrip(",") + "\n")
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            for line in lines:
+                os.write(fd, line.encode())
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        self.published += len(ids)
+        if size > self.max_bytes:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                # Otro worker ya lo roto
+                pass
+
+    def poll(self):
+        """Ids publicados por otros workers desde la ultima llamada."""
+        if self._file is None:
+            self._open(at_end=True)
+        ids = self._read()
+        # Rotado: se termino de leer el anterior, el nuevo se lee desde el principio
+        try:
+            rotated = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self._open(at_end=False)
+            ids += self._read()
+        self.received += len(ids)
+        return ids
+
+    def _read(self):
+        data = self._pending + self._file.read()
+        # Una linea a medio escribir se completa en la siguiente lectura
+        complete, _, self._pending = data.rpartition(b"\n")
+        ids = []
+        for line in complete.decode().splitlines():
+            pid, _, values = line.partition(" ")
+            if pid != str(self.pid) and values:
+                ids += [int(value) for value in values.split(",")]
+        return ids
+
+    def start(self, on_change):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self.pid = os.getpid()
+        self._open(at_end=True)
+        self._thread = threading.Thread(
+            target=self._run, args=(on_change,), daemon=True, name="catalog-sync"
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, on_change):
+        while not self._stop.wait(self.interval):
+            try:
+                ids = self.poll()
+                if ids:
+                    on_change(ids)
+            except Exception:
+                # Se reintenta en la siguiente vuelta; la recarga periodica cubre lo perdido
+                logger.exception("error al leer las invalidaciones de otros workers")
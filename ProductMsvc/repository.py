@@ -0,0 +1,492 @@
+"""
+Acceso a la tabla `products`. Dos implementaciones con la misma interfaz;
+DB_BACKEND (config.py) elige cual usa la app:
+
+- SupabaseRepository ("supabase", por defecto): PostgREST por HTTPS.
+- PostgresRepository ("postgres"): conexion directa con pool y sentencias
+  preparadas (db.py).
+
+Los metodos devuelven filas como dicts con tipos JSON, iguales en ambos.
+"""
+import datetime
+
+from psycopg import sql
+from psycopg.types.json import Jsonb
+
+# count="estimated": por debajo de esta estimacion se cuenta exacto
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+class SupabaseRepository:
+    def __init__(self, client):
+        self._client = client
+
+    def all_products(self):
+        return self._client.table("products").select("*").execute().data
+
+    def iter_products(self, batch_size):
+        """Todo el catalogo en paginas keyset de `batch_size` filas, por id."""
+        after_id = 0
+        while True:
+            rows = (
+                self._client.table("products").select("*")
+                .gt("id", after_id).order("id").limit(batch_size).execute().data
+            )
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def create_product(self, datos):
+        return self._client.table("products").insert(datos).execute().data
+
+    def search(self, category, keyword, min_price, max_price, offset, limit,
+               count="exact", after_id=None):
+        """
+        (productos de la pagina, total de coincidencias o None con count="none").
+
+        after_id: paginacion por cursor, productos con id mayor (offset se ignora).
+        count: "exact", "planned" (estimacion del planificador), "estimated"
+        (exacto si la estimacion es chica) o "none".
+        """
+        query = self._client.table("products").select(
+            "*", count=None if count == "none" else count
+        )
+
+        if category:
+            query = query.ilike("category", f"%{category}%")
+        if keyword:
+            # Supabase no tiene OR directo en el query builder, usamos filter
+            query = query.or_(f"name.ilike.%{keyword}%,description.ilike.%{keyword}%")
+        if min_price is not None:
+            query = query.gte("price", min_price)
+        if max_price is not None:
+            query = query.lte("price", max_price)
+
+        if after_id is not None:
+            response = query.gt("id", after_id).order("id").limit(limit).execute()
+        else:
+            response = query.order("id").range(offset, offset + limit - 1).execute()
+        if count == "none":
+            return response.data, None
+        total = response.count if response.count is not None else len(response.data)
+        return response.data, total
+
+    def facets(self, category, keyword, min_price, max_price, price_buckets):
+        """
+        Conteos por categoria y por rango de precio (sql/facets.sql):
+        {"category": {categoria: n}, "price": [n por rango]}.
+        """
+        result = self._client.rpc(
+            "product_facets",
+            {
+                "p_category": category or None,
+                "p_keyword": keyword or None,
+                "p_min_price": min_price,
+                "p_max_price": max_price,
+                "p_price_buckets": list(price_buckets),
+            },
+        ).execute().data
+        return _facet_counts(result, price_buckets)
+
+    def get_product(self, id):
+        rows = self._client.table("products").select("*").eq("id", id).execute().data
+        return rows[0] if rows else None
+
+    def get_products(self, ids, fields=None):
+        columns = ",".join(fields) if fields else "*"
+        return self._client.table("products").select(columns).in_("id", ids).execute().data
+
+    def update_product(self, id, datos):
+        return self._client.table("products").update(datos).eq("id", id).execute().data
+
+    def delete_product(self, id):
+        self._client.table("products").delete().eq("id", id).execute()
+
+    def upsert_products(self, rows):
+        """
+        Importacion masiva (bulk.py): filas con las mismas columnas. Sin id
+        se crean; con id se actualizan solo las columnas enviadas o, si el
+        id no existe, se crean.
+        """
+        if "id" not in rows[0]:
+            return self._client.table("products").insert(rows).execute().data
+        existing = self._merge_existing(rows)
+        new = [row for row in rows if row["id"] not in existing]
+        written = []
+        if existing:
+            written += self._client.table("products").upsert(
+                list(existing.values()), on_conflict="id"
+            ).execute().data
+        if new:
+            written += self._client.table("products").insert(new).execute().data
+        return written
+
+    def update_products(self, rows):
+        """Edicion masiva: solo productos existentes. Devuelve las filas actualizadas."""
+        existing = self._merge_existing(rows)
+        if not existing:
+            return []
+        return self._client.table("products").upsert(
+            list(existing.values()), on_conflict="id"
+        ).execute().data
+
+    def _merge_existing(self, rows):
+        """
+        id -> fila completa actual con los cambios encima. El upsert de
+        PostgREST es un INSERT ... ON CONFLICT: con solo algunas columnas
+        fallarian las NOT NULL que no vienen en la fila.
+        """
+        ids = [row["id"] for row in rows]
+        current = {
+            row["id"]: row
+            for row in self._client.table("products").select("*").in_("id", ids).execute().data
+        }
+        merged = {}
+        for row in rows:
+            if row["id"] in current:
+                merged[row["id"]] = {**merged.get(row["id"], current[row["id"]]), **row}
+        return merged
+
+    def sync_products_id_sequence(self):
+        """Tras insertar ids explicitos (sql/import_jobs.sql)."""
+        return self._client.rpc("sync_products_id_sequence", {}).execute().data
+
+    def create_import_job(self, datos):
+        return self._client.table("product_import_jobs").insert(datos).execute().data[0]
+
+    def update_import_job(self, id, datos):
+        self._client.table("product_import_jobs").update(datos).eq("id", id).execute()
+
+    def claim_import_job(self, id, datos):
+        """Pasa un trabajo "queued" a `datos`; False si ya no estaba en cola."""
+        return bool(
+            self._client.table("product_import_jobs").update(datos)
+            .eq("id", id).eq("status", "queued").execute().data
+        )
+
+    def fail_stale_import_jobs(self, stale_seconds, error):
+        """Marca "failed" los trabajos sin actividad hace `stale_seconds`. Devuelve cuantos."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cutoff = now - datetime.timedelta(seconds=stale_seconds)
+        return len(
+            self._client.table("product_import_jobs")
+            .update({"status": "failed", "error": error, "finished_at": now.isoformat()})
+            .in_("status", ["queued", "running"]).lt("updated_at", cutoff.isoformat())
+            .execute().data
+        )
+
+    def get_import_job(self, id):
+        rows = self._client.table("product_import_jobs").select("*").eq("id", id).execute().data
+        return rows[0] if rows else None
+
+    def reduce_stock(self, items):
+        """
+        Descuenta todo o nada en una sola llamada (sql/stock.sql).
+        {"ok": bool, "missing": [ids], "insufficient": [ids]}
+        """
+        return self._client.rpc("reduce_stock", {"items": items}).execute().data
+
+    def restore_stock(self, items):
+        """{"restored": [ids], "missing": [ids]}"""
+        return self._client.rpc("restore_stock", {"items": items}).execute().data
+
+    def reserve_stock(self, order_id, items, ttl_seconds):
+        """
+        Reserva todo o nada (sql/reservations.sql).
+        {"ok": bool, "expires_at": str, "missing": [ids], "insufficient": [ids]}
+        """
+        return self._client.rpc(
+            "reserve_stock", {"p_order_id": order_id, "items": items, "ttl_seconds": ttl_seconds}
+        ).execute().data
+
+    def confirm_reservation(self, order_id):
+        """
+        {"ok": bool, "missing": [ids], "insufficient": [ids]}; si descontó
+        stock, tambien "products": [ids]; "released" si la reserva se liberó
+        """
+        return self._client.rpc("confirm_reservation", {"p_order_id": order_id}).execute().data
+
+    def release_reservation(self, order_id):
+        """{"released": int, "restocked": int, "products": [ids con stock devuelto]}"""
+        return self._client.rpc("release_reservation", {"p_order_id": order_id}).execute().data
+
+    def expire_reservations(self):
+        return self._client.rpc("expire_reservations", {}).execute().data
+
+    def availability(self, ids):
+        """[{"product_id", "stock", "held", "available"}]"""
+        return (
+            self._client.table("product_availability").select("*").in_("product_id", ids).execute().data
+        )
+
+
+def _facet_counts(result, price_buckets):
+    # Las claves de un objeto jsonb son texto: {"0": n} -> [n, 0, ...]
+    buckets = [0] * len(price_buckets)
+    for bucket, count in result["price"].items():
+        buckets[int(bucket)] = count
+    return {"category": result["category"], "price": buckets}
+
+
+def _columns(names):
+    return sql.SQL(", ").join(map(sql.Identifier, names))
+
+
+class PostgresRepository:
+    """
+    Mismas consultas en SQL. Los nombres de columna variables (insert,
+    update, fields) van como identificadores citados, nunca interpolados.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def all_products(self):
+        return self._pool.fetch("products", "select", "select * from products")
+
+    def iter_products(self, batch_size):
+        # Paginas keyset en vez de un cursor de servidor: no retiene una
+        # conexion del pool ni una transaccion abierta mientras dura el stream
+        after_id = 0
+        while True:
+            rows = self._pool.fetch(
+                "products", "select",
+                "select * from products where id > %s order by id limit %s",
+                [after_id, batch_size],
+            )
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def create_product(self, datos):
+        query = sql.SQL("insert into products ({}) values ({}) returning *").format(
+            _columns(datos), sql.SQL(", ").join(sql.Placeholder() * len(datos))
+        )
+        return self._pool.fetch("products", "insert", query, list(datos.values()))
+
+    def search(self, category, keyword, min_price, max_price, offset, limit,
+               count="exact", after_id=None):
+        conditions = []
+        params = []
+        if category:
+            conditions.append("category ilike %s")
+            params.append(f"%{category}%")
+        if keyword:
+            conditions.append("(name ilike %s or description ilike %s)")
+            params += [f"%{keyword}%"] * 2
+        if min_price is not None:
+            conditions.append("price >= %s")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= %s")
+            params.append(max_price)
+        where = f"where {' and '.join(conditions)}" if conditions else ""
+
+        if after_id is None and count == "exact":
+            # Pagina y total en una sola consulta
+            rows = self._pool.fetch(
+                "products", "select",
+                f"select *, count(*) over () as total_count from products {where} "
+                "order by id offset %s limit %s",
+                [*params, offset, limit],
+            )
+            if rows:
+                total = rows[0]["total_count"]
+            elif offset:
+                # Pagina fuera de rango: el total se pide aparte
+                total = self._count(where, params, "exact")
+            else:
+                total = 0
+            for row in rows:
+                del row["total_count"]
+            return rows, total
+
+        if after_id is not None:
+            # Keyset: el indice de la clave primaria salta directo al cursor
+            page_where = f"{where} and id > %s" if where else "where id > %s"
+            page_params = [*params, after_id, limit]
+            page_sql = f"select * from products {page_where} order by id limit %s"
+        else:
+            page_params = [*params, offset, limit]
+            page_sql = f"select * from products {where} order by id offset %s limit %s"
+        rows = self._pool.fetch("products", "select", page_sql, page_params)
+        return rows, self._count(where, params, count)
+
+    def _count(self, where, params, mode):
+        if mode == "none":
+            return None
+        if mode in ("planned", "estimated"):
+            plan = self._pool.fetch_one(
+                "products", "explain",
+                f"explain (format json) select 1 from products {where}", params,
+            )["QUERY PLAN"]
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if mode == "planned" or estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return self._pool.fetch_one(
+            "products", "select", f"select count(*) as total_count from products {where}", params
+        )["total_count"]
+
+    def facets(self, category, keyword, min_price, max_price, price_buckets):
+        result = self._pool.fetch_one(
+            "product_facets", "rpc",
+            "select product_facets(%s::text, %s::text, %s::numeric, %s::numeric, %s::numeric[]) as result",
+            [category or None, keyword or None, min_price, max_price,
+             [float(edge) for edge in price_buckets]],
+        )["result"]
+        return _facet_counts(result, price_buckets)
+
+    def get_product(self, id):
+        return self._pool.fetch_one("products", "select", "select * from products where id = %s", [id])
+
+    def get_products(self, ids, fields=None):
+        columns = _columns(fields) if fields else sql.SQL("*")
+        query = sql.SQL("select {} from products where id = any(%s)").format(columns)
+        return self._pool.fetch("products", "select", query, [ids])
+
+    def update_product(self, id, datos):
+        query = sql.SQL("update products set {} where id = %s returning *").format(
+            sql.SQL(", ").join(
+                sql.SQL("{} = {}").format(sql.Identifier(column), sql.Placeholder())
+                for column in datos
+            )
+        )
+        return self._pool.fetch("products", "update", query, [*datos.values(), id])
+
+    def delete_product(self, id):
+        self._pool.execute("products", "delete", "delete from products where id = %s", [id])
+
+    def upsert_products(self, rows):
+        # Todo el lote como un solo parametro jsonb, expandido a filas de products
+        columns = list(rows[0])
+        if "id" not in columns:
+            query = sql.SQL(
+                "insert into products ({columns}) "
+                "select {columns} from jsonb_populate_recordset(null::products, %s) returning *"
+            ).format(columns=_columns(columns))
+            return self._pool.fetch("products", "insert", query, [Jsonb(rows)])
+
+        # Con id: update de los existentes e insert del resto en una sola
+        # sentencia. No es INSERT ... ON CONFLICT porque ese valida las NOT
+        # NULL de la fila propuesta aunque el id ya exista
+        updates = [column for column in columns if column != "id"] or ["id"]
+        query = sql.SQL(
+            "with input as (select * from jsonb_populate_recordset(null::products, %s)), "
+            "updated as ("
+            "update products p set {assignments} from input r where p.id = r.id returning p.*"
+            "), "
+            "inserted as ("
+            "insert into products ({columns}) select {columns} from input "
+            "where id not in (select id from updated) returning *"
+            ") "
+            "select * from updated union all select * from inserted"
+        ).format(
+            assignments=sql.SQL(", ").join(
+                sql.SQL("{0} = r.{0}").format(sql.Identifier(column)) for column in updates
+            ),
+            columns=_columns(columns),
+        )
+        return self._pool.fetch("products", "upsert", query, [Jsonb(rows)])
+
+    def update_products(self, rows):
+        query = sql.SQL(
+            "update products p set {} "
+            "from jsonb_populate_recordset(null::products, %s) r "
+            "where p.id = r.id returning p.*"
+        ).format(
+            sql.SQL(", ").join(
+                sql.SQL("{0} = r.{0}").format(sql.Identifier(column))
+                for column in rows[0] if column != "id"
+            )
+        )
+        return self._pool.fetch("products", "update", query, [Jsonb(rows)])
+
+    def sync_products_id_sequence(self):
+        return self._pool.fetch_one(
+            "sync_products_id_sequence", "rpc",
+            "select sync_products_id_sequence() as result",
+        )["result"]
+
+    def create_import_job(self, datos):
+        query = sql.SQL("insert into product_import_jobs ({}) values ({}) returning *").format(
+            _columns(datos), sql.SQL(", ").join(sql.Placeholder() * len(datos))
+        )
+        return self._pool.fetch_one("product_import_jobs", "insert", query, list(datos.values()))
+
+    def update_import_job(self, id, datos):
+        query = sql.SQL("update product_import_jobs set {} where id = %s").format(
+            sql.SQL(", ").join(
+                sql.SQL("{} = {}").format(sql.Identifier(column), sql.Placeholder())
+                for column in datos
+            )
+        )
+        values = [Jsonb(value) if isinstance(value, (list, dict)) else value for value in datos.values()]
+        self._pool.execute("product_import_jobs", "update", query, [*values, id])
+
+    def claim_import_job(self, id, datos):
+        query = sql.SQL(
+            "update product_import_jobs set {} where id = %s and status = 'queued' returning id"
+        ).format(
+            sql.SQL(", ").join(
+                sql.SQL("{} = {}").format(sql.Identifier(column), sql.Placeholder())
+                for column in datos
+            )
+        )
+        return bool(self._pool.fetch("product_import_jobs", "update", query, [*datos.values(), id]))
+
+    def fail_stale_import_jobs(self, stale_seconds, error):
+        return len(self._pool.fetch(
+            "product_import_jobs", "update",
+            "update product_import_jobs set status = 'failed', error = %s, finished_at = now() "
+            "where status in ('queued', 'running') "
+            "and updated_at < now() - make_interval(secs => %s) returning id",
+            [error, stale_seconds],
+        ))
+
+    def get_import_job(self, id):
+        return self._pool.fetch_one(
+            "product_import_jobs", "select", "select * from product_import_jobs where id = %s", [id]
+        )
+
+    def reduce_stock(self, items):
+        return self._pool.fetch_one(
+            "reduce_stock", "rpc", "select reduce_stock(%s) as result", [Jsonb(items)]
+        )["result"]
+
+    def restore_stock(self, items):
+        return self._pool.fetch_one(
+            "restore_stock", "rpc", "select restore_stock(%s) as result", [Jsonb(items)]
+        )["result"]
+
+    def reserve_stock(self, order_id, items, ttl_seconds):
+        return self._pool.fetch_one(
+            "reserve_stock", "rpc",
+            "select reserve_stock(%s, %s, %s) as result",
+            [order_id, Jsonb(items), ttl_seconds],
+        )["result"]
+
+    def confirm_reservation(self, order_id):
+        return self._pool.fetch_one(
+            "confirm_reservation", "rpc", "select confirm_reservation(%s) as result", [order_id]
+        )["result"]
+
+    def release_reservation(self, order_id):
+        return self._pool.fetch_one(
+            "release_reservation", "rpc", "select release_reservation(%s) as result", [order_id]
+        )["result"]
+
+    def expire_reservations(self):
+        return self._pool.fetch_one(
+            "expire_reservations", "rpc", "select expire_reservations() as result"
+        )["result"]
+
+    def availability(self, ids):
+        return self._pool.fetch(
+            "product_availability", "select",
+            "select * from product_availability where product_id = any(%s)",
+            [ids],
+        )
@@ -0,0 +1,240 @@
+"""
+Indice de busqueda en memoria del catalogo (trigramas).
+
+Sustituye a los `ilike '%texto%'` de /products/search cuando el catalogo
+completo esta en el cache (catalog.py): en vez de recorrer todos los
+productos, cada termino se resuelve con la interseccion de las listas de
+sus trigramas y luego se verifica como substring.
+
+- Texto normalizado: sin acentos y sin distinguir mayusculas
+  ("Inalámbrico" == "inalambrico").
+- keyword: cada palabra debe aparecer en el nombre o la descripcion
+  (como con ilike, vale una parte de palabra). category: substring de la
+  categoria.
+- Ranking: nombre > categoria > descripcion, palabra completa > inicio de
+  palabra > parte de palabra, y un extra si la frase entera esta en el
+  nombre. Empates por id.
+- add()/remove() actualizan solo las listas del producto.
+
+Facetas (facets()): conteos por categoria y por rango de precio de los
+resultados. Los conteos del catalogo entero se mantienen al indexar; con
+filtros se cuentan en una pasada sobre los ids que coinciden, con la
+categoria y el rango de cada producto ya calculados. Cada faceta ignora
+su propio filtro (la de categorias no filtra por categoria, la de precios
+no filtra por precio) para mostrar las alternativas.
+"""
+import bisect
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Peso de cada campo en el ranking
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0}
+KEYWORD_FIELDS = ("name", "description")
+PHRASE_BONUS = 5.0
+WORD_SEPARATOR = re.compile(r"\W+")
+
+
+def fold(text):
+    """Minusculas y sin acentos."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def in_price_range(price, min_price, max_price):
+    if min_price is None and max_price is None:
+        return True
+    if price is None:
+        return False
+    return (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+
+
+def price_bucket(price, price_buckets):
+    """
+    Posicion del rango [limite i, limite i+1) que contiene `price`; el
+    ultimo no tiene tope. None sin precio o por debajo del primer limite.
+    """
+    if price is None:
+        return None
+    position = bisect.bisect_right(price_buckets, price) - 1
+    return position if position >= 0 else None
+
+
+class SearchIndex:
+    def __init__(self, price_buckets=()):
+        # Limites inferiores de los rangos de precio, ascendentes
+        self.price_buckets = tuple(price_buckets)
+        # id -> {campo: texto normalizado}
+        self._docs = {}
+        # campo -> trigrama -> ids
+        self._postings = {field: defaultdict(set) for field in FIELD_WEIGHTS}
+        # id -> (categoria, precio, rango de precio)
+        self._facet_values = {}
+        # Conteos del catalogo entero
+        self._category_counts = Counter()
+        self._bucket_counts = [0] * len(self.price_buckets)
+
+    @classmethod
+    def build(cls, products, price_buckets=()):
+        index = cls(price_buckets)
+        for product in products:
+            index.add(product)
+        return index
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, id):
+        return id in self._docs
+
+    def add(self, product):
+        """Indexa (o reindexa) un producto."""
+        id = product["id"]
+        self.remove(id)
+        doc = {
+            field: fold(product[field]) if product.get(field) is not None else ""
+            for field in FIELD_WEIGHTS
+        }
+        self._docs[id] = doc
+        for field, text in doc.items():
+            postings = self._postings[field]
+            for gram in trigrams(text):
+                postings[gram].add(id)
+
+        category, price = product.get("category"), product.get("price")
+        bucket = price_bucket(price, self.price_buckets)
+        self._facet_values[id] = (category, price, bucket)
+        if category is not None:
+            self._category_counts[category] += 1
+        if bucket is not None:
+            self._bucket_counts[bucket] += 1
+
+    def remove(self, id):
+        doc = self._docs.pop(id, None)
+        if doc is None:
+            return
+        category, _, bucket = self._facet_values.pop(id)
+        if category is not None:
+            self._category_counts[category] -= 1
+            if not self._category_counts[category]:
+                del self._category_counts[category]
+        if bucket is not None:
+            self._bucket_counts[bucket] -= 1
+        for field, text in doc.items():
+            postings = self._postings[field]
+            for gram in trigrams(text):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del postings[gram]
+
+    def _matching(self, field, term, candidates=None):
+        """Ids cuyo campo contiene `term` (ya normalizado)."""
+        grams = trigrams(term)
+        if grams:
+            postings = self._postings[field]
+            if any(gram not in postings for gram in grams):
+                return set()
+            # Se intersecta desde la lista mas corta
+            lists = sorted((postings[gram] for gram in grams), key=len)
+            found = set(lists[0])
+            for ids in lists[1:]:
+                found &= ids
+                if not found:
+                    break
+        else:
+            # Menos de 3 caracteres: sin trigramas, se recorre
+            found = self._docs.keys()
+        if candidates is not None:
+            found = [id for id in found if id in candidates]
+        return {id for id in found if term in self._docs[id][field]}
+
+    def _keyword_matching(self, terms, candidates=None):
+        """Ids donde cada termino esta en el nombre o la descripcion."""
+        for term in terms:
+            matched = set()
+            for field in KEYWORD_FIELDS:
+                matched |= self._matching(field, term, candidates)
+            candidates = matched
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, category=None, keyword=None):
+        """
+        Ids que cumplen los filtros de texto, del mas relevante al menos.
+        None si no hay filtro de texto (todos, en el orden de quien llama).
+        """
+        category = fold(category).strip() if category else ""
+        terms = fold(keyword).split() if keyword else []
+        if not category and not terms:
+            return None
+
+        candidates = self._matching("category", category) if category else None
+        if terms:
+            candidates = self._keyword_matching(terms, candidates)
+        if not candidates:
+            return []
+
+        phrase = " ".join(terms)
+        scores = {id: self._score(self._docs[id], terms, category, phrase) for id in candidates}
+        return sorted(candidates, key=lambda id: (-scores[id], id))
+
+    @staticmethod
+    def _score(doc, terms, category, phrase):
+        score = FIELD_WEIGHTS["category"] if category else 0.0
+        for field in KEYWORD_FIELDS:
+            text = doc[field]
+            if not text:
+                continue
+            words = set(WORD_SEPARATOR.split(text))
+            for term in terms:
+                if term in words:
+                    score += FIELD_WEIGHTS[field] * 3
+                elif any(word.startswith(term) for word in words):
+                    score += FIELD_WEIGHTS[field] * 2
+                elif term in text:
+                    score += FIELD_WEIGHTS[field]
+            if len(terms) > 1 and field == "name" and phrase in text:
+                score += PHRASE_BONUS
+        return score
+
+    def facets(self, category=None, keyword=None, min_price=None, max_price=None):
+        """
+        {"category": {categoria: productos}, "price": [productos por rango]}
+        de los productos que cumplen los filtros, sin el filtro propio de
+        cada faceta.
+        """
+        category = fold(category).strip() if category else ""
+        terms = fold(keyword).split() if keyword else []
+        price_filtered = min_price is not None or max_price is not None
+
+        # None: todo el catalogo
+        matched = self._keyword_matching(terms) if terms else None
+
+        if matched is None and not price_filtered:
+            categories = dict(self._category_counts)
+        else:
+            categories = Counter()
+            for id in self._docs if matched is None else matched:
+                value, price, _ = self._facet_values[id]
+                if value is not None and in_price_range(price, min_price, max_price):
+                    categories[value] += 1
+            categories = dict(categories)
+
+        if category:
+            matched = self._matching("category", category, matched)
+        if matched is None:
+            buckets = list(self._bucket_counts)
+        else:
+            buckets = [0] * len(self.price_buckets)
+            for id in matched:
+                bucket = self._facet_values[id][2]
+                if bucket is not None:
+                    buckets[bucket] += 1
+        return {"category": categories, "price": buckets}
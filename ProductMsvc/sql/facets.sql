@@ -0,0 +1,57 @@
+-- Facetas de /products/search cuando se consulta la base (cache del
+-- catalogo desactivado o catalogo mayor que CATALOG_CACHE_MAX_PRODUCTS;
+-- con el catalogo en memoria las calcula search_index.py).
+--
+--   psql "$DATABASE_URL" -f sql/facets.sql   (o pegar en el SQL editor de Supabase)
+--
+-- Una sola pasada por los productos que cumplen el keyword: los dos
+-- conteos salen de la misma CTE. Cada faceta ignora su propio filtro
+-- (categorias sin filtrar por categoria, precios sin filtrar por precio).
+--
+-- {"category": {"<categoria>": n}, "price": {"<rango>": n}}, con el rango
+-- contado desde 0: [p_price_buckets[i+1], p_price_buckets[i+2]).
+
+create or replace function public.product_facets(
+    p_category text,
+    p_keyword text,
+    p_min_price numeric,
+    p_max_price numeric,
+    p_price_buckets numeric[]
+)
+returns jsonb
+language sql
+stable
+as $$
+    with matched as materialized (
+        select
+            category,
+            price::numeric as price,
+            (p_category is null or category ilike '%' || p_category || '%') as in_category,
+            (p_min_price is null or price >= p_min_price)
+                and (p_max_price is null or price <= p_max_price) as in_price
+        from public.products
+        where p_keyword is null
+            or name ilike '%' || p_keyword || '%'
+            or description ilike '%' || p_keyword || '%'
+    )
+    select jsonb_build_object(
+        'category', coalesce((
+            select jsonb_object_agg(category, n)
+            from (
+                select category, count(*) as n
+                from matched
+                where in_price and category is not null
+                group by category
+            ) c
+        ), '{}'::jsonb),
+        'price', coalesce((
+            select jsonb_object_agg(bucket, n)
+            from (
+                select width_bucket(price, p_price_buckets) - 1 as bucket, count(*) as n
+                from matched
+                where in_category and price >= p_price_buckets[1]
+                group by 1
+            ) b
+        ), '{}'::jsonb)
+    )
+$$;
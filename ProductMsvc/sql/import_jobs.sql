@@ -0,0 +1,45 @@
+-- Trabajos de importacion masiva de productos (ver /products/import en
+-- app.py y bulk.py).
+--
+--   psql "$DATABASE_URL" -f sql/import_jobs.sql   (o pegar en el SQL editor de Supabase)
+--
+-- El estado vive en la base y no en memoria: con varios workers de
+-- gunicorn la consulta de estado puede llegar a otro worker que el que
+-- ejecuta la importacion.
+
+create table if not exists public.product_import_jobs (
+    id bigserial primary key,
+    status text not null default 'queued'
+        check (status in ('queued', 'running', 'done', 'failed')),
+    format text not null check (format in ('csv', 'ndjson')),
+    mode text not null check (mode in ('upsert', 'update')),
+    batch_size int not null,
+    processed int not null default 0,
+    written int not null default 0,
+    failed int not null default 0,
+    -- [{"row": n, "id": ..., "error": "..."}], acotado a IMPORT_MAX_ERRORS
+    errors jsonb not null default '[]'::jsonb,
+    error text,
+    created_at timestamptz not null default now(),
+    -- Latido: se actualiza con cada lote. Un trabajo "queued" o "running"
+    -- sin latido reciente quedo huerfano (worker reciclado o caido)
+    updated_at timestamptz not null default now(),
+    started_at timestamptz,
+    finished_at timestamptz
+);
+
+-- Instalaciones anteriores al latido
+alter table public.product_import_jobs
+    add column if not exists updated_at timestamptz not null default now();
+
+
+-- Una importacion con ids explicitos no avanza la secuencia de
+-- products.id: sin esto el siguiente /add chocaria con esos ids.
+create or replace function public.sync_products_id_sequence()
+returns bigint
+language sql
+as $$
+    -- Nunca retrocede: no se reusan ids de productos borrados
+    select setval(seq, greatest((select max(id) from public.products), pg_sequence_last_value(seq), 1))
+    from (select pg_get_serial_sequence('public.products', 'id')::regclass as seq) s
+$$;
@@ -0,0 +1,240 @@
+-- Reservas de stock para el checkout (ver /reservations en app.py).
+--
+--   psql "$DATABASE_URL" -f sql/reservations.sql   (o pegar en el SQL editor de Supabase)
+--
+-- Una reserva "held" aparta stock sin descontarlo de products.stock:
+-- disponible = stock - reservas held no vencidas. Al confirmar (pago) se
+-- descuenta el stock y pasa a "confirmed"; al cancelar pasa a "released"
+-- y el barrido marca "expired" las vencidas. Una reserva vencida deja de
+-- contar en cuanto vence, aunque el barrido aun no haya pasado.
+
+create table if not exists public.stock_reservations (
+    id bigserial primary key,
+    order_id bigint not null,
+    product_id bigint not null references public.products (id) on delete cascade,
+    quantity int not null check (quantity > 0),
+    status text not null default 'held'
+        check (status in ('held', 'confirmed', 'released', 'expired')),
+    expires_at timestamptz not null,
+    created_at timestamptz not null default now(),
+    unique (order_id, product_id)
+);
+
+create index if not exists stock_reservations_held_product
+    on public.stock_reservations (product_id) where status = 'held';
+create index if not exists stock_reservations_held_expiry
+    on public.stock_reservations (expires_at) where status = 'held';
+
+create or replace view public.product_availability as
+select
+    p.id as product_id,
+    p.stock,
+    coalesce(h.held, 0)::int as held,
+    p.stock - coalesce(h.held, 0)::int as available
+from public.products p
+left join (
+    select product_id, sum(quantity) as held
+    from public.stock_reservations
+    where status = 'held' and expires_at > now()
+    group by product_id
+) h on h.product_id = p.id;
+
+
+-- Cantidades pedidas (ids repetidos sumados) frente a lo disponible para
+-- esta orden: stock menos las reservas activas de otras ordenes. Con
+-- p_order_id null (reduce_stock, ordenes sin reserva) cuentan todas las
+-- reservas activas. Las filas de products deben estar bloqueadas por
+-- quien llama.
+create or replace function public._reservation_shortage(
+    p_order_id bigint, ids bigint[], quantities int[],
+    out missing bigint[], out insufficient bigint[]
+)
+language sql
+stable
+as $$
+    select
+        coalesce(array_agg(r.id order by r.id) filter (where p.id is null), '{}'),
+        coalesce(array_agg(r.id order by r.id) filter (
+            where p.stock - coalesce((
+                select sum(s.quantity)
+                from public.stock_reservations s
+                where s.product_id = r.id
+                  and s.order_id is distinct from p_order_id
+                  and s.status = 'held'
+                  and s.expires_at > now()
+            ), 0) < r.quantity
+        ), '{}')
+    from unnest(ids, quantities) as r(id, quantity)
+    left join public.products p on p.id = r.id
+$$;
+
+
+-- Aparta el stock de una orden, todo o nada. Repetir la llamada renueva
+-- la reserva (misma orden, nuevas cantidades y vencimiento).
+create or replace function public.reserve_stock(p_order_id bigint, items jsonb, ttl_seconds int)
+returns jsonb
+language plpgsql
+as $$
+declare
+    ids bigint[];
+    quantities int[];
+    shortage record;
+    expires timestamptz := now() + make_interval(secs => ttl_seconds);
+begin
+    select array_agg(product_id order by product_id), array_agg(quantity order by product_id)
+    into ids, quantities
+    from (
+        select product_id, sum(quantity)::int as quantity
+        from jsonb_to_recordset(items) as item(product_id bigint, quantity int)
+        group by product_id
+    ) requested;
+
+    -- Mismo orden de bloqueo que reduce_stock: sin deadlocks entre checkouts
+    perform 1 from public.products where id = any(ids) order by id for update;
+
+    if exists (
+        select 1 from public.stock_reservations
+        where order_id = p_order_id and status = 'confirmed'
+    ) then
+        return jsonb_build_object('ok', false, 'confirmed', true, 'missing', '[]'::jsonb, 'insufficient', '[]'::jsonb);
+    end if;
+
+    select * into shortage from public._reservation_shortage(p_order_id, ids, quantities);
+    if cardinality(shortage.missing) > 0 or cardinality(shortage.insufficient) > 0 then
+        return jsonb_build_object(
+            'ok', false, 'missing', shortage.missing, 'insufficient', shortage.insufficient
+        );
+    end if;
+
+    delete from public.stock_reservations where order_id = p_order_id;
+    insert into public.stock_reservations (order_id, product_id, quantity, expires_at)
+    select p_order_id, r.id, r.quantity, expires
+    from unnest(ids, quantities) as r(id, quantity);
+
+    return jsonb_build_object(
+        'ok', true, 'expires_at', expires, 'missing', '[]'::jsonb, 'insufficient', '[]'::jsonb
+    );
+end;
+$$;
+
+
+-- Pago: descuenta el stock reservado y marca la reserva "confirmed".
+-- Si la reserva vencio se vuelve a comprobar la disponibilidad; si ya no
+-- alcanza no se descuenta nada. Una reserva liberada (orden cancelada) no
+-- se confirma: su stock ya se devolvio.
+create or replace function public.confirm_reservation(p_order_id bigint)
+returns jsonb
+language plpgsql
+as $$
+declare
+    ids bigint[];
+    quantities int[];
+    shortage record;
+begin
+    -- Mismo orden de bloqueo que reserve_stock y release_reservation:
+    -- primero products por id, despues las filas de la reserva. Un pago y
+    -- una cancelacion concurrentes de la misma orden se esperan, no se
+    -- bloquean mutuamente; un segundo confirm ve las filas ya confirmadas
+    perform 1 from public.products
+    where id in (select product_id from public.stock_reservations where order_id = p_order_id)
+    order by id
+    for update;
+
+    select array_agg(product_id order by product_id), array_agg(quantity order by product_id)
+    into ids, quantities
+    from (
+        select product_id, quantity
+        from public.stock_reservations
+        where order_id = p_order_id and status in ('held', 'expired')
+        for update
+    ) pending;
+
+    if ids is null then
+        -- Sin reserva, ya confirmada (llamada repetida) o liberada
+        return jsonb_build_object(
+            'ok', exists (
+                select 1 from public.stock_reservations
+                where order_id = p_order_id and status = 'confirmed'
+            ),
+            'released', exists (
+                select 1 from public.stock_reservations
+                where order_id = p_order_id and status = 'released'
+            ),
+            'missing', '[]'::jsonb, 'insufficient', '[]'::jsonb
+        );
+    end if;
+
+    select * into shortage from public._reservation_shortage(p_order_id, ids, quantities);
+    if cardinality(shortage.missing) > 0 or cardinality(shortage.insufficient) > 0 then
+        return jsonb_build_object(
+            'ok', false, 'missing', shortage.missing, 'insufficient', shortage.insufficient
+        );
+    end if;
+
+    update public.products p
+    set stock = p.stock - r.quantity
+    from unnest(ids, quantities) as r(id, quantity)
+    where p.id = r.id;
+
+    update public.stock_reservations
+    set status = 'confirmed'
+    where order_id = p_order_id and status in ('held', 'expired');
+
+    -- products: ids con stock modificado (cache del catalogo, ver catalog.py)
+    return jsonb_build_object(
+        'ok', true, 'products', ids, 'missing', '[]'::jsonb, 'insufficient', '[]'::jsonb
+    );
+end;
+$$;
+
+
+-- Cancelacion: una reserva activa se libera; una confirmada ademas
+-- devuelve su stock. Devuelve cuantas filas cambiaron y los ids de los
+-- productos con stock devuelto.
+create or replace function public.release_reservation(p_order_id bigint)
+returns jsonb
+language plpgsql
+as $$
+declare
+    released int;
+    restocked bigint[];
+begin
+    perform 1 from public.products
+    where id in (select product_id from public.stock_reservations where order_id = p_order_id)
+    order by id
+    for update;
+
+    with returned as (
+        update public.products p
+        set stock = p.stock + s.quantity
+        from public.stock_reservations s
+        where s.order_id = p_order_id and s.status = 'confirmed' and p.id = s.product_id
+        returning p.id
+    )
+    select coalesce(array_agg(id order by id), '{}') into restocked from returned;
+
+    update public.stock_reservations
+    set status = 'released'
+    where order_id = p_order_id and status in ('held', 'confirmed');
+    get diagnostics released = row_count;
+
+    return jsonb_build_object(
+        'released', released, 'restocked', cardinality(restocked), 'products', restocked
+    );
+end;
+$$;
+
+
+-- Barrido periodico (ReservationSweeper): marca "expired" las vencidas.
+create or replace function public.expire_reservations()
+returns int
+language sql
+as $$
+    with expired as (
+        update public.stock_reservations
+        set status = 'expired'
+        where status = 'held' and expires_at <= now()
+        returning 1
+    )
+    select count(*)::int from expired
+$$;
@@ -0,0 +1,19 @@
+-- Indices de trigramas para /products/search cuando se consulta la base
+-- (cache del catalogo desactivado o catalogo mayor que
+-- CATALOG_CACHE_MAX_PRODUCTS; con el catalogo en memoria busca
+-- search_index.py).
+--
+--   psql "$DATABASE_URL" -f sql/search.sql   (o pegar en el SQL editor de Supabase)
+--
+-- `ilike '%texto%'` no puede usar un indice B-tree; con gin_trgm_ops
+-- Postgres resuelve el patron con los trigramas en vez de recorrer la
+-- tabla. El `or` entre nombre y descripcion combina los dos indices.
+
+create extension if not exists pg_trgm;
+
+create index if not exists products_name_trgm
+    on public.products using gin (name gin_trgm_ops);
+create index if not exists products_description_trgm
+    on public.products using gin (description gin_trgm_ops);
+create index if not exists products_category_trgm
+    on public.products using gin (category gin_trgm_ops);
@@ -0,0 +1,90 @@
+-- Funciones de stock usadas por /reduce-stock y /restore-stock (repository.py).
+-- Se llaman con una sola consulta: rpc() de Supabase o SELECT directo.
+--
+--   psql "$DATABASE_URL" -f sql/stock.sql   (o pegar en el SQL editor de Supabase)
+--
+-- reduce_stock usa _reservation_shortage de sql/reservations.sql: hay que
+-- instalar los dos.
+--
+-- items: [{"product_id": 1, "quantity": 2}, ...]; ids repetidos se suman.
+
+-- Descuenta todo o nada. Las filas se bloquean en orden de id, asi dos
+-- checkouts con productos en comun esperan uno al otro en vez de
+-- bloquearse mutuamente, y el segundo ve el stock ya descontado.
+-- Si falta algun producto o no alcanza lo disponible (stock menos las
+-- reservas activas, ver sql/reservations.sql) no se modifica nada: una
+-- orden sin reserva no se lleva unidades apartadas para otras ordenes.
+create or replace function public.reduce_stock(items jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    ids bigint[];
+    quantities int[];
+    shortage record;
+begin
+    select array_agg(product_id order by product_id), array_agg(quantity order by product_id)
+    into ids, quantities
+    from (
+        select product_id, sum(quantity)::int as quantity
+        from jsonb_to_recordset(items) as item(product_id bigint, quantity int)
+        group by product_id
+    ) requested;
+
+    perform 1 from public.products where id = any(ids) order by id for update;
+
+    select * into shortage from public._reservation_shortage(null, ids, quantities);
+    if cardinality(shortage.missing) > 0 or cardinality(shortage.insufficient) > 0 then
+        return jsonb_build_object(
+            'ok', false, 'missing', shortage.missing, 'insufficient', shortage.insufficient
+        );
+    end if;
+
+    update public.products p
+    set stock = p.stock - r.quantity
+    from unnest(ids, quantities) as r(id, quantity)
+    where p.id = r.id;
+
+    return jsonb_build_object('ok', true, 'missing', '[]'::jsonb, 'insufficient', '[]'::jsonb);
+end;
+$$;
+
+-- Compensacion: devuelve las cantidades; los productos que ya no existen
+-- se ignoran (y se informan) para no romper la saga.
+create or replace function public.restore_stock(items jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    ids bigint[];
+    quantities int[];
+    restored bigint[];
+begin
+    select array_agg(product_id order by product_id), array_agg(quantity order by product_id)
+    into ids, quantities
+    from (
+        select product_id, sum(quantity)::int as quantity
+        from jsonb_to_recordset(items) as item(product_id bigint, quantity int)
+        group by product_id
+    ) requested;
+
+    perform 1 from public.products where id = any(ids) order by id for update;
+
+    with updated as (
+        update public.products p
+        set stock = p.stock + r.quantity
+        from unnest(ids, quantities) as r(id, quantity)
+        where p.id = r.id
+        returning p.id
+    )
+    select coalesce(array_agg(id order by id), '{}') into restored from updated;
+
+    return jsonb_build_object(
+        'restored', restored,
+        'missing', coalesce(
+            (select jsonb_agg(id order by id) from unnest(ids) as id where id <> all(restored)),
+            '[]'::jsonb
+        )
+    );
+end;
+$$;
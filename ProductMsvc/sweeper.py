@@ -0,0 +1,45 @@
+"""
+Barrido en segundo plano de las reservas de stock vencidas.
+
+La disponibilidad ya ignora las reservas vencidas (product_availability),
+asi que el barrido solo deja el estado del ledger al dia: "held" pasa a
+"expired". Con varios workers de gunicorn cada uno barre por su cuenta;
+expire_reservations() es idempotente.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationSweeper:
+    def __init__(self, repository, interval):
+        self.repository = repository
+        self.interval = interval
+        self.expired = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="reservation-sweeper")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def sweep(self):
+        count = self.repository.expire_reservations() or 0
+        self.expired += count
+        if count:
+            logger.info("reservas vencidas", extra={"expired": count})
+        return count
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                # Se reintenta en la siguiente vuelta
+                logger.exception("error al barrer reservas vencidas")
@@ -0,0 +1,171 @@
+"""
+Benchmark: backends de datos de ProductMsvc (repository.py) contra un
+Postgres local.
+
+Mide latencia por consulta (p50/p99, en serie) y rendimiento (consultas/s
+con varios hilos) para las consultas del catalogo: detalle, busqueda y
+lote. Las tablas se crean en el esquema `bench`, sin tocar las reales.
+
+- DATABASE_URL: Postgres local. Sin ella se arranca uno temporal con
+  `pgserver` (pip install pgserver), si esta instalado.
+- --supabase: anade el backend de Supabase (PostgREST) con
+  VITE_SUPABASE_URL/VITE_SUPABASE_ANON_KEY, p. ej. el stack local de
+  `supabase start` (http://localhost:54321) sembrado con los mismos datos.
+
+Desde ProductMsvc, con los modulos del servicio en el path:
+
+    PYTHONPATH=. python test/benchRepository.py --products 5000 --requests 2000 --threads 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+
+from db import PostgresPool, json_row
+from repository import PostgresRepository, SupabaseRepository
+
+CATEGORIES = ["Zapatos", "Camisas", "Pantalones", "Accesorios", "Chaquetas"]
+
+SCHEMA = """
+drop schema if exists bench cascade;
+create schema bench;
+create table bench.products (
+    id bigserial primary key,
+    name text not null,
+    description text,
+    price numeric(10, 2) not null,
+    category text,
+    stock int not null default 0,
+    image_url text,
+    created_at timestamptz not null default now()
+)
+"""
+
+SEED = """
+insert into bench.products (name, description, price, category, stock, image_url)
+select
+    'Producto ' || i,
+    'Descripcion del producto ' || i,
+    round((random() * 200 + 5)::numeric, 2),
+    (%s::text[])[1 + i %% 5],
+    (random() * 100)::int,
+    'https://cdn.example.com/p/' || i || '.jpg'
+from generate_series(1, %s) i
+"""
+
+
+class ConnectionPerQuery:
+    """Misma interfaz que PostgresPool pero abre una conexion por consulta."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def fetch(self, table, operation, query, params=()):
+        with psycopg.connect(self.url, autocommit=True, row_factory=dict_row) as conn:
+            cursor = conn.execute(query, params)
+            return [json_row(row) for row in cursor.fetchall()]
+
+    def fetch_one(self, table, operation, query, params=()):
+        rows = self.fetch(table, operation, query, params)
+        return rows[0] if rows else None
+
+    def close(self):
+        pass
+
+
+def local_database():
+    if os.getenv("DATABASE_URL"):
+        return os.environ["DATABASE_URL"], None
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("Define DATABASE_URL o instala pgserver para un Postgres temporal")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="bench-pg-"), cleanup_mode="stop")
+    return server.get_uri(), server
+
+
+def workload(repository, products):
+    """Consultas del catalogo en proporcion parecida al trafico real."""
+    def detail():
+        repository.get_product(random.randint(1, products))
+
+    def search():
+        repository.search(random.choice(CATEGORIES), None, None, None, random.randint(0, 5) * 8, 8)
+
+    def batch():
+        repository.get_products(random.sample(range(1, products + 1), 50), ["name", "price", "stock"])
+
+    return {"detalle": detail, "busqueda": search, "lote(50)": batch}
+
+
+def latency(query, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        query()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def throughput(query, requests, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for future in [executor.submit(query) for _ in range(requests)]:
+            future.result()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--supabase", action="store_true")
+    args = parser.parse_args()
+
+    url, server = local_database()
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(SCHEMA)
+        conn.execute(SEED, [CATEGORIES, args.products])
+        conn.execute("analyze bench.products")
+    bench_url = make_conninfo(url, options="-c search_path=bench")
+
+    backends = {
+        "postgres pool + preparadas": PostgresPool(bench_url, 1, args.threads, prepare=True),
+        "postgres pool sin preparar": PostgresPool(bench_url, 1, args.threads, prepare=False),
+        "postgres conexion/consulta": ConnectionPerQuery(bench_url),
+    }
+    repositories = {name: PostgresRepository(pool) for name, pool in backends.items()}
+    if args.supabase:
+        from supabase import create_client
+
+        client = create_client(os.environ["VITE_SUPABASE_URL"], os.environ["VITE_SUPABASE_ANON_KEY"])
+        repositories["supabase (PostgREST)"] = SupabaseRepository(client)
+
+    print(f"{args.products} productos, {args.requests} consultas, {args.threads} hilos\n")
+    print(f"{'backend':28} {'consulta':10} {'p50 ms':>8} {'p99 ms':>8} {'consultas/s':>12}")
+    for name, repository in repositories.items():
+        for query_name, query in workload(repository, args.products).items():
+            for _ in range(20):
+                query()  # calentamiento: conexiones del pool y planes preparados
+            p50, p99 = latency(query, args.requests)
+            rate = throughput(query, args.requests, args.threads)
+            print(f"{name:28} {query_name:10} {p50:8.2f} {p99:8.2f} {rate:12.0f}")
+
+    for pool in backends.values():
+        pool.close()
+    if server is not None:
+        server.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# app.py se importa sin .env real: el repositorio se sustituye por uno en
+# memoria, sin cache del catalogo ni barrido de reservas en segundo plano
+os.environ.setdefault("VITE_SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("CATALOG_CACHE_ENABLED", "false")
+os.environ.setdefault("RESERVATION_SWEEP_INTERVAL", "0")
+
+# Los modulos del servicio (catalog, bulk, search_index) se importan sin paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRepository:
+    """Tabla products en un dict por id."""
+
+    def __init__(self):
+        self.products = {}
+
+    def get_product(self, product_id):
+        return self.products.get(product_id)
+
+    def fail_stale_import_jobs(self, stale_seconds, error):
+        return 0
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Cliente de la app real (app.py) con el repositorio en memoria."""
+    repository = FakeRepository()
+    import config
+    # Antes del primer import de app.py, que toma config.repository
+    monkeypatch.setattr(config, "repository", repository)
+    import app
+    monkeypatch.setattr(app, "repository", repository)
+    monkeypatch.setattr(app, "catalog", repository)
+    return app.app.test_client(), repository
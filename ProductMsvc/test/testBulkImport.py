@@ -0,0 +1,202 @@
+"""
+Importacion masiva de ProductMsvc (bulk.py) sobre un repositorio en memoria.
+"""
+import io
+import os
+
+import pytest
+
+import bulk
+
+
+class FakeRepository:
+    """Tabla products y product_import_jobs en memoria; registra cada escritura."""
+
+    def __init__(self, products=()):
+        self.products = {product["id"]: dict(product) for product in products}
+        self.writes = []
+        self.job = {"status": "queued"}
+        self.job_updates = []
+        self.synced = 0
+
+    def upsert_products(self, rows):
+        self.writes.append(("upsert", len(rows)))
+        # Una sola sentencia: si una fila falla no se escribe ninguna
+        for row in rows:
+            if any(value == "boom" for value in row.values()):
+                raise ValueError(f"fila invalida: {row}")
+        written = []
+        for row in rows:
+            id = row.get("id", max(self.products, default=0) + 1)
+            self.products[id] = {**self.products.get(id, {}), **row, "id": id}
+            written.append(dict(self.products[id]))
+        return written
+
+    def update_products(self, rows):
+        self.writes.append(("update", len(rows)))
+        written = []
+        for row in rows:
+            if row["id"] in self.products:
+                self.products[row["id"]].update(row)
+                written.append(dict(self.products[row["id"]]))
+        return written
+
+    def sync_products_id_sequence(self):
+        self.synced += 1
+
+    def claim_import_job(self, id, datos):
+        if self.job["status"] != "queued":
+            return False
+        self.job.update(datos)
+        return True
+
+    def update_import_job(self, id, datos):
+        self.job_updates.append(datos)
+        self.job.update(datos)
+
+
+def run(repository, body, fmt="csv", mode="upsert", batch_size=500, max_errors=100):
+    path, _ = bulk.spool_upload(io.BytesIO(body.encode()), max_bytes=10 ** 6)
+    repository.job.setdefault("status", "queued")
+    bulk.ImportJob(repository, 1, path, fmt, mode, batch_size, max_errors).run()
+    assert not os.path.exists(path)
+    return repository.job
+
+
+def test_clean_row_types_and_validates():
+    assert bulk.clean_row({"name": "Mouse", "price": "25.5", "stock": "3"}, "csv", "upsert") == {
+        "name": "Mouse", "price": 25.5, "stock": 3,
+    }
+    # Celda vacia en CSV: la columna no se toca
+    assert bulk.clean_row({"id": "4", "price": "", "stock": "0"}, "csv", "update") == {"id": 4, "stock": 0}
+
+    for raw, mode, error in [
+        ({"name": "Mouse"}, "upsert", "Faltan campos requeridos: price"),
+        ({"name": "Mouse", "price": "gratis"}, "upsert", "price debe ser un número"),
+        ({"name": "Mouse", "price": -1}, "upsert", "price debe ser un número no negativo"),
+        ({"price": 10}, "update", "Falta id"),
+        ({"id": 3}, "update", "No hay columnas para actualizar"),
+        ({"id": "x", "price": 1}, "upsert", "id debe ser un entero"),
+        ({"id": 1, "price; drop": 1}, "upsert", "Columna inválida: 'price; drop'"),
+    ]:
+        with pytest.raises(ValueError, match=error.replace("(", r"\(")):
+            bulk.clean_row(raw, "csv" if isinstance(raw.get("price"), str) else "ndjson", mode)
+
+
+def test_spool_rejects_bodies_over_the_limit():
+    with pytest.raises(ValueError):
+        bulk.spool_upload(io.BytesIO(b"x" * 100), max_bytes=10, chunk_size=8)
+
+
+def test_csv_rows_are_written_in_batches():
+    repository = FakeRepository()
+    body = "name,price,stock\n" + "".join(f"Producto {i},{i},1\n" for i in range(1, 251))
+
+    job = run(repository, body, batch_size=100)
+
+    assert repository.writes == [("upsert", 100), ("upsert", 100), ("upsert", 50)]
+    assert job["status"] == "done"
+    assert (job["processed"], job["written"], job["failed"]) == (250, 250, 0)
+    # Sin ids explicitos la secuencia ya avanzo sola
+    assert repository.synced == 0
+
+
+def test_rows_with_different_columns_go_to_separate_batches():
+    repository = FakeRepository([{"id": 1, "name": "Teclado", "price": 80, "stock": 5}])
+    body = "\n".join([
+        '{"name": "Mouse", "price": 25}',
+        '{"id": 1, "price": 70}',
+        '{"name": "Monitor", "price": 300}',
+        '{"id": 10, "name": "Webcam", "price": 40}',
+    ])
+
+    job = run(repository, body, fmt="ndjson")
+
+    assert sorted(repository.writes) == [("upsert", 1), ("upsert", 1), ("upsert", 2)]
+    assert repository.products[1] == {"id": 1, "name": "Teclado", "price": 70, "stock": 5}
+    assert job["written"] == 4
+    # Hubo ids explicitos: la secuencia se ajusta una vez al final
+    assert repository.synced == 1
+
+
+def test_failed_batch_is_retried_row_by_row():
+    repository = FakeRepository()
+    body = "name,price,category\nA,1,x\nB,2,boom\nC,3,y\n"
+
+    job = run(repository, body)
+
+    assert repository.writes == [("upsert", 3), ("upsert", 1), ("upsert", 1), ("upsert", 1)]
+    assert [product["name"] for product in repository.products.values()] == ["A", "C"]
+    assert (job["written"], job["failed"]) == (2, 1)
+    assert job["errors"][0]["row"] == 2
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported():
+    repository = FakeRepository()
+    body = '{"name": "A", "price": 1}\n[1, 2]\nno es json\n\n{"name": "B"}\n'
+
+    job = run(repository, body, fmt="ndjson")
+
+    assert job["status"] == "done"
+    assert (job["processed"], job["written"], job["failed"]) == (4, 1, 3)
+    assert [error["row"] for error in job["errors"]] == [2, 3, 5]
+
+
+def test_update_mode_reports_unknown_ids():
+    repository = FakeRepository([{"id": 1, "name": "A", "price": 10}, {"id": 2, "name": "B", "price": 20}])
+
+    job = run(repository, "id,price\n1,11\n99,5\n2,21\n", mode="update")
+
+    assert repository.writes == [("update", 3)]
+    assert (repository.products[1]["price"], repository.products[2]["price"]) == (11, 21)
+    assert (job["written"], job["failed"]) == (2, 1)
+    assert job["errors"] == [{"row": 2, "id": 99, "error": "Producto no encontrado"}]
+    assert 99 not in repository.products
+
+
+def test_error_list_is_capped_but_failures_are_counted():
+    repository = FakeRepository()
+    body = "name,price\n" + "x,gratis\n" * 20
+
+    job = run(repository, body, max_errors=5)
+
+    assert job["failed"] == 20
+    assert len(job["errors"]) == 5
+
+
+def test_unexpected_error_marks_the_job_failed():
+    repository = FakeRepository()
+
+    def broken():
+        raise ConnectionError("db down")
+
+    repository.sync_products_id_sequence = broken
+
+    job = run(repository, "id,name,price\n5,A,1\n")
+
+    assert job["status"] == "failed"
+    assert job["error"] == "db down"
+    assert job["finished_at"]
+
+
+def test_errors_are_only_rewritten_when_they_change():
+    repository = FakeRepository()
+    body = "name,price\nx,gratis\n" + "".join(f"P{i},{i}\n" for i in range(1, 7))
+
+    job = run(repository, body, batch_size=2)
+
+    # Un lote por cada dos filas buenas, mas el cierre: solo el primero lleva errores
+    assert [("errors" in update) for update in repository.job_updates] == [True, False, False, False]
+    assert job["errors"] == [{"row": 1, "error": "price debe ser un número"}]
+    assert all("updated_at" in update for update in repository.job_updates)
+
+
+def test_job_no_longer_queued_is_not_run():
+    repository = FakeRepository()
+    # Marcado como huerfano mientras esperaba en la cola
+    repository.job["status"] = "failed"
+
+    job = run(repository, "name,price\nA,1\n")
+
+    assert job["status"] == "failed"
+    assert repository.writes == [] and repository.job_updates == []
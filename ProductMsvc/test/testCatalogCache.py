@@ -0,0 +1,301 @@
+"""
+Cache del catalogo de ProductMsvc (catalog.py) sobre un repositorio en memoria.
+"""
+import pytest
+
+import catalog
+from invalidation import InvalidationLog
+
+
+class FakeRepository:
+    """Tabla products en un dict; registra las llamadas de lectura."""
+
+    def __init__(self, products):
+        self.products = {product["id"]: dict(product) for product in products}
+        self.calls = []
+
+    def all_products(self):
+        self.calls.append("all_products")
+        return [dict(product) for product in self.products.values()]
+
+    def iter_products(self, batch_size):
+        self.calls.append("iter_products")
+        rows = [dict(product) for product in sorted(self.products.values(), key=lambda product: product["id"])]
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def search(self, category, keyword, min_price, max_price, offset, limit,
+               count="exact", after_id=None):
+        self.calls.append("search")
+        rows = sorted(self.products.values(), key=lambda product: product["id"])
+        return rows[offset:offset + limit], len(rows)
+
+    def facets(self, category, keyword, min_price, max_price, price_buckets):
+        self.calls.append("facets")
+        return {"category": {}, "price": [0] * len(price_buckets)}
+
+    def get_product(self, id):
+        self.calls.append("get_product")
+        product = self.products.get(id)
+        return dict(product) if product else None
+
+    def get_products(self, ids, fields=None):
+        self.calls.append("get_products")
+        rows = [dict(self.products[id]) for id in ids if id in self.products]
+        if fields:
+            if not set(fields) <= rows[0].keys():
+                raise ValueError("column does not exist")
+            rows = [{field: row[field] for field in fields} for row in rows]
+        return rows
+
+    def create_product(self, datos):
+        product = {"id": max(self.products, default=0) + 1, **datos}
+        self.products[product["id"]] = product
+        return [dict(product)]
+
+    def update_product(self, id, datos):
+        if id not in self.products:
+            return []
+        self.products[id].update(datos)
+        return [dict(self.products[id])]
+
+    def delete_product(self, id):
+        self.products.pop(id, None)
+
+    def reduce_stock(self, items):
+        for item in items:
+            self.products[item["product_id"]]["stock"] -= item["quantity"]
+        return {"ok": True, "missing": [], "insufficient": []}
+
+    def release_reservation(self, order_id):
+        self.products[1]["stock"] += 1
+        return {"released": 1, "restocked": 1, "products": [1]}
+
+    def availability(self, ids):
+        return [{"product_id": id, "available": 0} for id in ids]
+
+
+PRODUCTS = [
+    {"id": 1, "name": "Teclado mecánico", "description": "Switches rojos",
+     "category": "Perifericos", "price": 80, "stock": 5},
+    {"id": 2, "name": "Mouse", "description": "Inalámbrico, teclado aparte",
+     "category": "Perifericos", "price": 25, "stock": 10},
+    {"id": 3, "name": "Monitor", "description": "27 pulgadas",
+     "category": "Pantallas", "price": 300, "stock": 2},
+    {"id": 4, "name": "Cable HDMI", "description": None,
+     "category": "Accesorios", "price": None, "stock": 50},
+]
+
+
+@pytest.fixture
+def repository():
+    return FakeRepository(PRODUCTS)
+
+
+@pytest.fixture
+def cache(repository):
+    return catalog.CatalogCache(repository, max_products=100, refresh_interval=0)
+
+
+def test_reads_are_served_from_memory_after_the_first_load(cache, repository):
+    assert cache.get_product(1)["name"] == "Teclado mecánico"
+    assert cache.get_product(99) is None
+    assert len(cache.all_products()) == 4
+    cache.get_products([3, 1])
+
+    assert repository.calls == ["iter_products"]
+    assert cache.stats["detail_hit"] == 2
+    assert cache.stats["all_hit"] == 1
+
+
+def test_search_matches_the_sql_filters(cache):
+    def ids(*args):
+        rows, total = cache.search(*args)
+        return [row["id"] for row in rows], total
+
+    assert ids("perif", None, None, None, 0, 10) == ([1, 2], 2)
+    # Nombre o descripcion, sin distinguir mayusculas
+    assert ids(None, "TECLADO", None, None, 0, 10) == ([1, 2], 2)
+    # Precio nulo no entra en ningun rango
+    assert ids(None, None, 20, 100, 0, 10) == ([1, 2], 2)
+    assert ids(None, None, None, None, 2, 2) == ([3, 4], 4)
+
+
+def test_keyset_pages_by_id_and_count_modes(cache):
+    def ids(**kwargs):
+        rows, total = cache.search("perif", "teclado", None, None, 0, 1, **kwargs)
+        return [row["id"] for row in rows], total
+
+    # Con cursor se ordena por id aunque haya keyword (el ranking es de page)
+    assert ids(after_id=0) == ([1], 2)
+    assert ids(after_id=1) == ([2], 2)
+    assert ids(after_id=2) == ([], 2)
+    assert ids(after_id=0, count="none") == ([1], None)
+    assert ids(count="planned") == ([1], 2)
+
+
+def test_facets_come_from_the_index_and_track_writes(repository):
+    cache = catalog.CatalogCache(repository, max_products=100, refresh_interval=0, price_buckets=(0, 50))
+
+    assert cache.facets("perif", None, None, None, (0, 50)) == {
+        "category": {"Perifericos": 2, "Pantallas": 1, "Accesorios": 1},
+        "price": [1, 1],
+    }
+    cache.update_product(3, {"category": "Perifericos", "price": 10})
+    assert cache.facets(None, "teclado", None, None, (0, 50))["category"] == {"Perifericos": 2}
+    assert cache.facets(None, None, None, None, (0, 50))["price"] == [2, 1]
+    # Otros rangos que los del indice: los cuenta la base
+    cache.facets(None, None, None, None, (0, 10, 100))
+    assert repository.calls == ["iter_products", "facets"]
+
+
+def test_catalog_is_streamed_in_batches(cache, repository):
+    batches = [[product["id"] for product in batch] for batch in cache.iter_products(3)]
+    small = catalog.CatalogCache(repository, max_products=2, refresh_interval=0)
+    from_db = [[product["id"] for product in batch] for batch in small.iter_products(3)]
+
+    assert batches == [[1, 2, 3], [4]]
+    assert from_db == [[1, 2, 3], [4]]
+    assert repository.calls == ["iter_products", "iter_products", "iter_products"]
+
+
+def test_batch_projects_fields_and_defers_unknown_columns(cache, repository):
+    assert cache.get_products([2, 9, 1], ["id", "price"]) == [
+        {"id": 2, "price": 25}, {"id": 1, "price": 80},
+    ]
+    with pytest.raises(ValueError):
+        cache.get_products([1], ["id", "secret"])
+
+
+def test_writes_update_the_cache(cache, repository):
+    cache.all_products()
+
+    cache.update_product(1, {"price": 70})
+    created = cache.create_product({"name": "Webcam", "price": 40})[0]
+    cache.delete_product(3)
+    cache.reduce_stock([{"product_id": 2, "quantity": 4}])
+    cache.release_reservation(7)
+
+    assert cache.get_product(1)["price"] == 70
+    assert cache.get_product(1)["stock"] == 6
+    assert cache.get_product(created["id"])["name"] == "Webcam"
+    assert cache.get_product(3) is None
+    assert cache.get_product(2)["stock"] == 6
+    assert cache.search(None, "webcam", None, None, 0, 10)[1] == 1
+    assert repository.calls == ["iter_products", "get_products", "get_products"]
+
+
+def test_other_operations_pass_through(cache):
+    assert cache.availability([1]) == [{"product_id": 1, "available": 0}]
+
+
+def test_refresh_picks_up_external_changes(cache, repository):
+    cache.all_products()
+    repository.products[1]["name"] = "Teclado gamer"
+    repository.products.pop(4)
+
+    cache.refresh()
+
+    assert cache.get_product(1)["name"] == "Teclado gamer"
+    assert cache.get_product(4) is None
+    # El indice de busqueda se actualiza con la recarga
+    assert cache.search(None, "gamer", None, None, 0, 10)[1] == 1
+    assert cache.search(None, "hdmi", None, None, 0, 10)[1] == 0
+
+
+def test_writes_during_a_refresh_win_over_the_snapshot(cache, repository):
+    cache.all_products()
+    iter_products = repository.iter_products
+
+    def slow_snapshot(batch_size):
+        yield from iter_products(batch_size)
+        # Llega una edicion mientras la recarga esta en curso
+        cache.update_product(1, {"price": 99})
+
+    repository.iter_products = slow_snapshot
+    cache.refresh()
+
+    assert cache.get_product(1)["price"] == 99
+
+
+def test_catalog_is_loaded_by_pages_past_the_row_cap(repository):
+    # PostgREST corta un select("*") en max-rows: el cache no debe usarlo
+    repository.all_products = lambda: list(repository.products.values())[:2]
+    cache = catalog.CatalogCache(repository, max_products=100, refresh_interval=0, batch_size=2)
+
+    assert cache.get_product(4)["name"] == "Cable HDMI"
+    assert cache.complete and len(cache) == 4
+    assert len(cache.all_products()) == 4
+
+
+def test_reading_stops_past_max_products_without_marking_complete(repository):
+    pages = []
+    iter_products = repository.iter_products
+
+    def counted(batch_size):
+        for batch in iter_products(batch_size):
+            pages.append(batch)
+            yield batch
+
+    repository.iter_products = counted
+    cache = catalog.CatalogCache(repository, max_products=2, refresh_interval=0, batch_size=3)
+    cache.refresh()
+
+    assert len(pages) == 1
+    assert not cache.complete
+
+
+def test_large_catalogs_only_cache_by_id(repository):
+    cache = catalog.CatalogCache(repository, max_products=2, refresh_interval=0)
+
+    assert cache.get_product(3)["name"] == "Monitor"
+    assert cache.get_product(3)["name"] == "Monitor"
+    cache.get_product(1)
+    cache.get_product(2)
+    cache.search(None, None, None, None, 0, 10)
+
+    assert not cache.complete
+    assert len(cache) == 2
+    assert cache.stats["detail_hit"] == 1
+    assert cache.stats["search_miss"] == 1
+    assert repository.calls == ["iter_products", "get_product", "get_product", "get_product", "search"]
+
+
+def test_failed_reload_does_not_fail_the_write(cache, repository):
+    cache.all_products()
+
+    def broken(ids, fields=None):
+        raise ConnectionError("db down")
+
+    repository.get_products = broken
+    result = cache.reduce_stock([{"product_id": 2, "quantity": 1}])
+
+    assert result["ok"] is True
+    # Sin copia fiable: el producto se vuelve a leer de la base
+    assert cache.get_product(2)["stock"] == 9
+
+
+def test_writes_reach_the_other_workers_through_the_invalidation_log(repository, tmp_path):
+    path = str(tmp_path / "catalog.log")
+    workers = []
+    for pid in (101, 102):
+        sync = InvalidationLog(path, interval=0)
+        sync.pid = pid
+        workers.append(catalog.CatalogCache(repository, max_products=100, refresh_interval=0, sync=sync))
+    writer, reader = workers
+    reader.get_product(1)
+    reader.sync.poll()
+
+    writer.update_product(1, {"price": 70})
+    writer.reduce_stock([{"product_id": 2, "quantity": 3}])
+    writer.delete_product(3)
+    # Sin la invalidacion el otro worker seguiria sirviendo su copia
+    assert reader.get_product(1)["price"] == 80
+
+    reader._reload(reader.sync.poll())
+
+    assert reader.get_product(1)["price"] == 70
+    assert reader.get_product(2)["stock"] == 7
+    assert reader.get_product(3) is None
+    # Lo que publico el mismo worker no se relee
+    assert writer.sync.poll() == []
@@ -0,0 +1,66 @@
+"""
+Fichero de invalidaciones entre workers de ProductMsvc (invalidation.py).
+"""
+import pytest
+
+import invalidation
+from invalidation import InvalidationLog
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.log")
+
+
+def worker(path, pid, **kwargs):
+    log = InvalidationLog(path, interval=0, **kwargs)
+    log.pid = pid
+    return log
+
+
+def test_workers_receive_the_ids_published_by_the_others(path):
+    first, second = worker(path, 101), worker(path, 102)
+    first.poll()
+    second.poll()
+
+    first.publish([1, 2, 2])
+    second.publish([3])
+
+    assert first.poll() == [3]
+    assert second.poll() == [1, 2]
+    assert first.poll() == second.poll() == []
+
+
+def test_lines_before_the_worker_started_are_skipped(path):
+    worker(path, 101).publish([1])
+    late = worker(path, 102)
+
+    assert late.poll() == []
+    worker(path, 101).publish([2])
+    assert late.poll() == [2]
+
+
+def test_long_id_lists_are_split_into_bounded_lines(path, monkeypatch):
+    monkeypatch.setattr(invalidation, "MAX_LINE_BYTES", 16)
+    reader = worker(path, 102)
+    reader.poll()
+
+    worker(path, 101).publish(range(100, 120))
+
+    with open(path) as log:
+        lines = log.read().splitlines()
+    assert len(lines) > 1
+    assert all(len(line) + 1 <= 16 for line in lines)
+    assert reader.poll() == list(range(100, 120))
+
+
+def test_readers_follow_the_log_across_a_rotation(path):
+    writer, reader = worker(path, 101, max_bytes=16), worker(path, 102)
+    reader.poll()
+
+    # La segunda linea pasa de max_bytes: el fichero se borra tras escribirla
+    writer.publish([1, 2, 3])
+    writer.publish([4, 5, 6, 7, 8, 9])
+    writer.publish([10])
+
+    assert reader.poll() == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
@@ -0,0 +1,65 @@
+"""
+Metricas, trazas y logs de la app real de ProductMsvc (app.py).
+"""
+from prometheus_client.parser import text_string_to_metric_families
+
+import log
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def scraped(client, name, **labels):
+    """Valor de una serie tal como la expone /metrics (0 si no existe)."""
+    body = client.get("/metrics").get_data(as_text=True)
+    for family in text_string_to_metric_families(body):
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return 0
+
+
+def test_metrics_endpoint_counts_product_requests(service):
+    client, repository = service
+    repository.products[1] = {"id": 1, "name": "Zapatilla", "stock": 3}
+    labels = {"method": "GET", "route": "/products/<int:id>", "status": "200"}
+    before = scraped(client, "http_requests_total", **labels)
+
+    assert client.get("/products/1").status_code == 200
+
+    assert scraped(client, "http_requests_total", **labels) == before + 1
+    assert scraped(client, "http_request_duration_seconds_count", method="GET", route="/products/<int:id>") >= 1
+
+
+def test_products_requests_continue_the_gateway_trace(service, monkeypatch):
+    client, repository = service
+    repository.products[1] = {"id": 1, "name": "Zapatilla", "stock": 3}
+    spans = []
+    monkeypatch.setattr(tracing.exporter, "export", spans.append)
+
+    response = client.get("/products/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    trace_id, span_id, sampled = tracing.parse_traceparent(response.headers["traceparent"])
+    assert (trace_id, sampled) == (TRACE_ID, True)
+    assert span_id != PARENT_ID
+    # El span SERVER de la peticion es hijo del span del gateway
+    (span,) = [span for span in spans if span.kind == "SERVER"]
+    assert span.service == "product-service"
+    assert span.name == "GET /products/<int:id>"
+    assert (span.trace_id, span.parent_id, span.span_id) == (TRACE_ID, PARENT_ID, span_id)
+
+
+def test_products_access_log_carries_the_trace_id(service, monkeypatch):
+    client, repository = service
+    repository.products[1] = {"id": 1, "name": "Zapatilla", "stock": 3}
+    # Registros ya preparados por el handler de la app, antes del hilo que escribe
+    records = []
+    monkeypatch.setattr(log._handler, "enqueue", records.append)
+
+    client.get("/products/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    (access,) = [record for record in records if record.name == "access"]
+    assert access.route == "/products/<int:id>"
+    assert access.status == 200
+    assert access.trace_id == TRACE_ID
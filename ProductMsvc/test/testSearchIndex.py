@@ -0,0 +1,89 @@
+"""
+Indice de busqueda del catalogo de ProductMsvc (search_index.py).
+"""
+import pytest
+
+from search_index import SearchIndex, fold
+
+PRODUCTS = [
+    {"id": 1, "name": "Mouse inalámbrico", "description": "Receptor USB", "category": "Periféricos"},
+    {"id": 2, "name": "Teclado", "description": "Incluye mouse inalambrico de regalo",
+     "category": "Periféricos"},
+    {"id": 3, "name": "Mousepad XL", "description": None, "category": "Accesorios"},
+    {"id": 4, "name": "Monitor 27", "description": "Panel IPS", "category": "Pantallas"},
+]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex.build(PRODUCTS)
+
+
+def test_fold_removes_accents_and_case():
+    assert fold("Periféricos ÁÉÍÓÚ Ñandú") == "perifericos aeiou nandu"
+
+
+def test_keyword_matches_name_or_description_ignoring_accents(index):
+    assert index.search(keyword="INALAMBRICO") == [1, 2]
+    assert index.search(keyword="usb") == [1]
+    assert index.search(keyword="teclado inexistente") == []
+
+
+def test_every_word_must_match_and_name_matches_rank_first(index):
+    # El campo pesa mas que el tipo de coincidencia: palabra en el nombre >
+    # inicio de palabra en el nombre > palabra en la descripcion
+    assert index.search(keyword="mouse") == [1, 3, 2]
+    assert index.search(keyword="mouse inalambrico") == [1, 2]
+
+
+def test_short_terms_fall_back_to_a_scan(index):
+    assert index.search(keyword="xl") == [3]
+    assert index.search(keyword="27") == [4]
+
+
+def test_category_is_a_substring_filter(index):
+    assert index.search(category="perife") == [1, 2]
+    assert index.search(category="periféricos", keyword="teclado") == [2]
+    assert index.search() is None
+
+
+def test_incremental_updates(index):
+    index.add({"id": 2, "name": "Teclado mecánico", "description": None, "category": "Periféricos"})
+    index.add({"id": 5, "name": "Mouse gamer", "description": "", "category": "Periféricos"})
+    index.remove(1)
+    index.remove(99)
+
+    assert index.search(keyword="mouse") == [5, 3]
+    assert index.search(keyword="mecanico") == [2]
+    assert index.search(keyword="regalo") == []
+    assert len(index) == 4
+
+
+def test_facets_ignore_their_own_filter():
+    prices = {1: 20, 2: 80, 3: 15, 4: None}
+    index = SearchIndex.build(
+        [{**product, "price": prices[product["id"]]} for product in PRODUCTS], price_buckets=(0, 25, 50)
+    )
+
+    assert index.facets() == {
+        "category": {"Periféricos": 2, "Accesorios": 1, "Pantallas": 1},
+        "price": [2, 0, 1],
+    }
+    # Categorias: keyword y precio; precios: keyword y categoria
+    assert index.facets(category="perif", keyword="mouse", max_price=30) == {
+        "category": {"Periféricos": 1, "Accesorios": 1},
+        "price": [1, 0, 1],
+    }
+    assert index.facets(keyword="nada") == {"category": {}, "price": [0, 0, 0]}
+
+
+def test_facet_counts_follow_incremental_updates():
+    index = SearchIndex.build(
+        [{**product, "price": 10} for product in PRODUCTS], price_buckets=(0, 25)
+    )
+
+    index.add({"id": 4, "name": "Monitor 27", "category": "Accesorios", "price": 30})
+    index.remove(1)
+    index.add({"id": 5, "name": "Webcam", "category": None, "price": None})
+
+    assert index.facets() == {"category": {"Periféricos": 1, "Accesorios": 2}, "price": [2, 1]}
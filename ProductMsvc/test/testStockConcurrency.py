@@ -0,0 +1,280 @@
+"""
+Funciones de stock y reservas de ProductMsvc (sql/stock.sql,
+sql/reservations.sql) contra un Postgres real.
+
+Usa DATABASE_URL o, si no esta definida, un Postgres temporal de
+`pgserver`. Sin psycopg o sin base de datos los tests se omiten.
+"""
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+from psycopg.conninfo import make_conninfo  # noqa: E402
+from psycopg.types.json import Jsonb  # noqa: E402
+
+SERVICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQL_FILES = [os.path.join(SERVICE, "sql", name) for name in ("stock.sql", "reservations.sql")]
+
+
+@pytest.fixture(scope="module")
+def database_url():
+    url = os.getenv("DATABASE_URL")
+    server = None
+    if not url:
+        pgserver = pytest.importorskip("pgserver")
+        # Su hilo de limpieza escribe al salir, con la captura de pytest ya cerrada
+        logging.getLogger("pgserver").setLevel(logging.WARNING)
+        server = pgserver.get_server(tempfile.mkdtemp(prefix="stock-pg-"), cleanup_mode="stop")
+        url = server.get_uri()
+
+    # Esquema propio con su `products`: las funciones usan public.products,
+    # asi que se cargan con ese nombre reemplazado
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("drop schema if exists stock_test cascade")
+        conn.execute("create schema stock_test")
+        conn.execute(
+            "create table stock_test.products (id bigint primary key, stock int not null)"
+        )
+        for path in SQL_FILES:
+            with open(path, encoding="utf-8") as sql_file:
+                conn.execute(sql_file.read().replace("public.", "stock_test."))
+
+    yield make_conninfo(url, options="-c search_path=stock_test")
+
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("drop schema stock_test cascade")
+    if server is not None:
+        server.cleanup()
+
+
+@pytest.fixture
+def db(database_url):
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("truncate products, stock_reservations")
+        yield conn
+
+
+def set_stock(db, **stock):
+    for product_id, value in stock.items():
+        db.execute("insert into products values (%s, %s)", [int(product_id[1:]), value])
+
+
+def stock_of(db, product_id):
+    return db.execute("select stock from products where id = %s", [product_id]).fetchone()[0]
+
+
+def call(conn, function, items):
+    return conn.execute(f"select {function}(%s)", [Jsonb(items)]).fetchone()[0]
+
+
+def reserve(conn, order_id, items, ttl_seconds=60):
+    return conn.execute(
+        "select reserve_stock(%s, %s, %s)", [order_id, Jsonb(items), ttl_seconds]
+    ).fetchone()[0]
+
+
+def rpc(conn, function, *args):
+    placeholders = ", ".join(["%s"] * len(args))
+    return conn.execute(f"select {function}({placeholders})", args).fetchone()[0]
+
+
+def available(db, product_id):
+    return db.execute(
+        "select available from product_availability where product_id = %s", [product_id]
+    ).fetchone()[0]
+
+
+def test_reduce_is_all_or_nothing(db):
+    set_stock(db, p1=5, p2=1)
+
+    result = call(db, "reduce_stock", [
+        {"product_id": 1, "quantity": 2},
+        {"product_id": 2, "quantity": 3},
+    ])
+
+    assert result == {"ok": False, "missing": [], "insufficient": [2]}
+    assert stock_of(db, 1) == 5
+    assert stock_of(db, 2) == 1
+
+
+def test_reduce_reports_missing_products_without_changes(db):
+    set_stock(db, p1=5)
+
+    result = call(db, "reduce_stock", [
+        {"product_id": 1, "quantity": 1},
+        {"product_id": 99, "quantity": 1},
+    ])
+
+    assert result["missing"] == [99]
+    assert stock_of(db, 1) == 5
+
+
+def test_reduce_sums_repeated_products(db):
+    set_stock(db, p1=3)
+
+    assert call(db, "reduce_stock", [
+        {"product_id": 1, "quantity": 2},
+        {"product_id": 1, "quantity": 2},
+    ])["insufficient"] == [1]
+    assert call(db, "reduce_stock", [
+        {"product_id": 1, "quantity": 1},
+        {"product_id": 1, "quantity": 2},
+    ])["ok"] is True
+    assert stock_of(db, 1) == 0
+
+
+def test_restore_skips_missing_products(db):
+    set_stock(db, p1=0)
+
+    result = call(db, "restore_stock", [
+        {"product_id": 1, "quantity": 4},
+        {"product_id": 99, "quantity": 1},
+    ])
+
+    assert result == {"restored": [1], "missing": [99]}
+    assert stock_of(db, 1) == 4
+
+
+def test_concurrent_checkouts_never_oversell(db, database_url):
+    set_stock(db, p1=10, p2=10)
+    checkouts = 40
+    # Orden inverso en la mitad de los checkouts: sin bloqueo ordenado habria deadlocks
+    carts = [
+        [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 1}]
+        if n % 2 else
+        [{"product_id": 2, "quantity": 1}, {"product_id": 1, "quantity": 1}]
+        for n in range(checkouts)
+    ]
+    barrier = threading.Barrier(checkouts)
+
+    def checkout(items):
+        with psycopg.connect(database_url, autocommit=True) as conn:
+            barrier.wait()
+            return call(conn, "reduce_stock", items)["ok"]
+
+    with ThreadPoolExecutor(checkouts) as executor:
+        results = list(executor.map(checkout, carts))
+
+    assert results.count(True) == 10
+    assert stock_of(db, 1) == 0
+    assert stock_of(db, 2) == 0
+
+
+def test_holds_are_subtracted_from_availability(db):
+    set_stock(db, p1=5)
+
+    assert reserve(db, 1, [{"product_id": 1, "quantity": 3}])["ok"] is True
+    assert available(db, 1) == 2
+    assert stock_of(db, 1) == 5
+    assert reserve(db, 2, [{"product_id": 1, "quantity": 3}])["insufficient"] == [1]
+    # Renovar la reserva de la misma orden no cuenta su hold anterior
+    assert reserve(db, 1, [{"product_id": 1, "quantity": 5}])["ok"] is True
+    assert available(db, 1) == 0
+
+
+def test_reduce_without_reservation_respects_other_holds(db):
+    set_stock(db, p1=5)
+    reserve(db, 1, [{"product_id": 1, "quantity": 3}])
+
+    # Orden sin reserva (legacy): solo puede llevarse lo no apartado
+    assert call(db, "reduce_stock", [{"product_id": 1, "quantity": 3}])["insufficient"] == [1]
+    assert call(db, "reduce_stock", [{"product_id": 1, "quantity": 2}])["ok"] is True
+    assert rpc(db, "confirm_reservation", 1)["ok"] is True
+    assert stock_of(db, 1) == 0
+
+
+def test_confirm_decrements_once_and_release_restocks(db):
+    set_stock(db, p1=5)
+    reserve(db, 1, [{"product_id": 1, "quantity": 2}])
+
+    assert rpc(db, "confirm_reservation", 1)["products"] == [1]
+    # Repetida no descuenta ni informa productos modificados
+    repeated = rpc(db, "confirm_reservation", 1)
+    assert repeated["ok"] is True and "products" not in repeated
+    assert stock_of(db, 1) == 3
+    assert available(db, 1) == 3
+
+    assert rpc(db, "release_reservation", 1) == {"released": 1, "restocked": 1, "products": [1]}
+    assert stock_of(db, 1) == 5
+    assert rpc(db, "confirm_reservation", 99)["ok"] is False
+
+
+def test_released_reservation_is_not_confirmed_again(db):
+    set_stock(db, p1=5)
+    reserve(db, 1, [{"product_id": 1, "quantity": 2}])
+    rpc(db, "confirm_reservation", 1)
+    rpc(db, "release_reservation", 1)
+
+    # La orden cancelada ya devolvio su stock: no se vuelve a descontar
+    result = rpc(db, "confirm_reservation", 1)
+    assert result["ok"] is False and result["released"] is True
+    assert stock_of(db, 1) == 5
+
+
+def test_expired_holds_stop_counting_and_are_swept(db):
+    set_stock(db, p1=1)
+    reserve(db, 1, [{"product_id": 1, "quantity": 1}], ttl_seconds=60)
+    db.execute("update stock_reservations set expires_at = now() - interval '1 second'")
+
+    assert available(db, 1) == 1
+    assert reserve(db, 2, [{"product_id": 1, "quantity": 1}])["ok"] is True
+    assert rpc(db, "expire_reservations") == 1
+    # La orden 1 vencio y el stock lo tiene la 2: no puede confirmarse
+    assert rpc(db, "confirm_reservation", 1)["insufficient"] == [1]
+    assert rpc(db, "confirm_reservation", 2)["ok"] is True
+    assert stock_of(db, 1) == 0
+
+
+def test_concurrent_reservations_never_overbook(db, database_url):
+    set_stock(db, p1=10)
+    orders = 40
+    barrier = threading.Barrier(orders)
+    # Solo las 10 que consiguieron reserva llegan a confirmar
+    confirmed = threading.Barrier(10)
+
+    def checkout(order_id):
+        with psycopg.connect(database_url, autocommit=True) as conn:
+            barrier.wait()
+            if not reserve(conn, order_id, [{"product_id": 1, "quantity": 1}])["ok"]:
+                return False
+            confirmed.wait()
+            return rpc(conn, "confirm_reservation", order_id)["ok"]
+
+    with ThreadPoolExecutor(orders) as executor:
+        results = list(executor.map(checkout, range(1, orders + 1)))
+
+    assert results.count(True) == 10
+    assert stock_of(db, 1) == 0
+    assert available(db, 1) == 0
+
+
+def test_concurrent_confirm_and_release_never_deadlock(db, database_url):
+    set_stock(db, p1=10, p2=10)
+    rounds = 20
+    for order_id in range(1, rounds + 1):
+        reserve(db, order_id, [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 1}])
+
+    def run(function, order_id, barrier):
+        with psycopg.connect(database_url, autocommit=True) as conn:
+            barrier.wait()
+            return rpc(conn, function, order_id)
+
+    # Pago y cancelacion de la misma orden a la vez; un deadlock haria
+    # fallar una de las dos con DeadlockDetected
+    with ThreadPoolExecutor(2) as executor:
+        for order_id in range(1, rounds + 1):
+            barrier = threading.Barrier(2)
+            confirm = executor.submit(run, "confirm_reservation", order_id, barrier)
+            release = executor.submit(run, "release_reservation", order_id, barrier)
+            confirm.result()
+            release.result()
+
+    # Gane quien gane, cada orden termina liberada y el stock vuelve entero
+    statuses = db.execute("select distinct status from stock_reservations").fetchall()
+    assert statuses == [("released",)]
+    assert stock_of(db, 1) == stock_of(db, 2) == 10
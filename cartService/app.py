@@ -1,13 +1,24 @@
+import logging
+import os
+
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
-from config import supabase
+from config import repository
+from log import setup_logging
+from metrics import setup_metrics
+from tracing import setup_tracing
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+setup_metrics(app)
+setup_tracing(app, "cart-service")
+setup_logging(app, "cart-service")
+
+logger = logging.getLogger(__name__)
 
 
 @app.route("/health")
@@ -24,11 +35,9 @@ def get_cart():
         if not user_id:
             return jsonify({"exito": False, "error": "Se requiere user_id"}), 400
 
-        response = (
-            supabase.table("cart_items").select("*").eq("user_id", user_id).execute()
-        )
+        items = repository.get_items(user_id)
 
-        return jsonify({"exito": True, "user_id": user_id, "items": response.data}), 200
+        return jsonify({"exito": True, "user_id": user_id, "items": items}), 200
 
     except Exception as e:
         return jsonify({"exito": False, "error": str(e)}), 500
@@ -52,33 +61,16 @@ def add_to_cart():
             return jsonify({"exito": False, "error": "Datos incompletos"}), 400
 
         # Verificar si el producto ya existe en el carrito
-        existing = (
-            supabase.table("cart_items")
-            .select("quantity")
-            .eq("user_id", data["user_id"])
-            .eq("product_id", data["product_id"])
-            .execute()
-        )
+        existing = repository.get_quantity(data["user_id"], data["product_id"])
 
-        if len(existing.data) > 0:
+        if existing is not None:
             # Actualizar cantidad
-            new_qty = existing.data[0]["quantity"] + data["quantity"]
-
-            supabase.table("cart_items").update({"quantity": new_qty}).eq(
-                "user_id", data["user_id"]
-            ).eq("product_id", data["product_id"]).execute()
+            repository.set_quantity(
+                data["user_id"], data["product_id"], existing + data["quantity"]
+            )
         else:
             # Insertar nuevo item
-            supabase.table("cart_items").insert(
-                {
-                    "user_id": data["user_id"],
-                    "product_id": data["product_id"],
-                    "product_name": data["product_name"],
-                    "product_image_url": data["product_image_url"],
-                    "product_price": data["product_price"],
-                    "quantity": data["quantity"],
-                }
-            ).execute()
+            repository.add_item(data)
 
         return jsonify({"exito": True, "mensaje": "Producto agregado al carrito"}), 200
 
@@ -104,15 +96,11 @@ def update_cart_item():
                 {"exito": False, "error": "La cantidad debe ser mayor a cero"}
             ), 400
 
-        response = (
-            supabase.table("cart_items")
-            .update({"quantity": data["quantity"]})
-            .eq("user_id", data["user_id"])
-            .eq("product_id", data["product_id"])
-            .execute()
+        updated = repository.set_quantity(
+            data["user_id"], data["product_id"], data["quantity"]
         )
 
-        if len(response.data) == 0:
+        if len(updated) == 0:
             return jsonify(
                 {"exito": False, "error": "Producto no encontrado en el carrito"}
             ), 404
@@ -129,9 +117,6 @@ def remove_cart_item():
         user_id = request.args.get("user_id")
         product_id = request.args.get("product_id")
 
-        print(f"user_id: {user_id}")
-        print(f"product_id: {product_id}")
-
         if not user_id or not product_id:
             return jsonify(
                 {
@@ -140,16 +125,14 @@ def remove_cart_item():
                 }
             ), 400
 
-        supabase.table("cart_items").delete().eq("user_id", user_id).eq(
-            "product_id", product_id
-        ).execute()
+        repository.remove_item(user_id, product_id)
 
         return jsonify(
             {"exito": True, "mensaje": "Producto eliminado del carrito"}
         ), 200
 
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("error al eliminar del carrito", extra={"product_id": product_id})
         return jsonify({"exito": False, "error": str(e)}), 500
 
 @app.route("/cart/clear", methods=["POST"])
@@ -161,7 +144,7 @@ def clear_cart():
         if not user_id:
             return jsonify({"exito": False, "error": "Se requiere user_id"}), 400
 
-        supabase.table("cart_items").delete().eq("user_id", user_id).execute()
+        repository.clear(user_id)
 
         return jsonify({"exito": True, "mensaje": "Carrito vaciado"}), 200
 
@@ -169,4 +152,4 @@ def clear_cart():
         return jsonify({"exito": False, "error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    app.run(host="0.0.0.0", port=5001, debug=os.getenv("FLASK_DEBUG") == "1")
@@ -1,11 +1,28 @@
 import os
 
 from dotenv import load_dotenv
-from supabase import Client, create_client
+from supabase import create_client
+
+from db import PostgresPool
+from metrics import InstrumentedSupabase
+from repository import PostgresRepository, SupabaseRepository
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+# "supabase" (PostgREST por HTTPS) o "postgres" (conexion directa, ver db.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase")
+
+
+def create_repository(service_name):
+    if DB_BACKEND == "postgres":
+        return PostgresRepository(PostgresPool.from_env(service_name))
+    if DB_BACKEND != "supabase":
+        raise RuntimeError(f"DB_BACKEND desconocido: {DB_BACKEND}")
+    # Todas las consultas pasan por el wrapper que las mide (ver metrics.py)
+    return SupabaseRepository(InstrumentedSupabase(create_client(SUPABASE_URL, SUPABASE_ANON_KEY)))
+
+
+repository = create_repository("cart-service")
@@ -0,0 +1,27 @@
+"""Configuracion de gunicorn para APP_ENV=production (ver start.sh)."""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Hilos por worker: casi todo el tiempo de una peticion es espera a Supabase
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Tras SIGTERM, segundos para terminar las peticiones en curso
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "20"))
+# Reciclar workers acota el crecimiento de memoria; el jitter evita reinicios simultaneos
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+# El log de acceso lo escribe log.py en JSON
+accesslog = None
+errorlog = "-"
+
+
+def child_exit(server, worker):
+    # Descarta los gauges del worker que termina (prometheus_client multiproceso)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
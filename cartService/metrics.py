@@ -0,0 +1,156 @@
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from tracing import start_span
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones por ruta",
+    ["method", "route"],
+)
+REQUESTS_TOTAL = Counter(
+    "http_requests_total",
+    "Peticiones por ruta y codigo de estado",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Peticiones en curso",
+    multiprocess_mode="livesum",
+)
+SUPABASE_LATENCY = Histogram(
+    "supabase_query_duration_seconds",
+    "Latencia de las consultas a la base de datos (Supabase o Postgres directo)",
+    ["table", "operation"],
+)
+SUPABASE_ERRORS = Counter(
+    "supabase_query_errors_total",
+    "Consultas a la base de datos que lanzaron error",
+    ["table", "operation"],
+)
+
+QUERY_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+def _registry():
+    # Con gunicorn (start.sh) cada worker escribe en PROMETHEUS_MULTIPROC_DIR
+    # y el que atiende el scrape agrega los de todos
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def _record(status):
+    # Plantilla de la ruta (/products/<int:id>), no la URL real
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - g.metrics_start)
+    REQUESTS_TOTAL.labels(request.method, route, str(status)).inc()
+    g.metrics_recorded = True
+
+
+def setup_metrics(app):
+    """Registra los hooks de medicion y la ruta /metrics en la app Flask."""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request(response):
+        if "metrics_start" in g:
+            _record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if "metrics_start" not in g:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        # Excepcion no controlada: after_request no llego a ejecutarse
+        if not g.get("metrics_recorded"):
+            _record(500)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+@contextmanager
+def timed_query(table, operation, backend="supabase"):
+    """Mide una consulta (histograma + errores) dentro de un span CLIENT."""
+    start = time.perf_counter()
+    with start_span(
+        f"{backend} {operation} {table}", "CLIENT",
+        {"db.table": table, "db.operation": operation},
+        remote_service=backend,
+    ):
+        try:
+            yield
+        except Exception:
+            SUPABASE_ERRORS.labels(table, operation).inc()
+            raise
+        finally:
+            SUPABASE_LATENCY.labels(table, operation).observe(time.perf_counter() - start)
+
+
+class TimedQuery:
+    """
+    Envuelve un request builder de postgrest: deja pasar los filtros y mide
+    execute() por tabla y operacion (select, insert, update, upsert, delete, rpc),
+    con un span CLIENT por consulta.
+    """
+
+    def __init__(self, builder, table, operation=None):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            operation = self._operation or (name if name in QUERY_OPERATIONS else None)
+            return TimedQuery(result, self._table, operation)
+
+        return call
+
+    def execute(self):
+        with timed_query(self._table, self._operation or "unknown"):
+            return self._builder.execute()
+
+
+class InstrumentedSupabase:
+    """Cliente de Supabase que mide todas las consultas hechas con table() y rpc()."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return TimedQuery(self._client.table(name), name)
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        return TimedQuery(self._client.rpc(fn, params, *args, **kwargs), fn, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
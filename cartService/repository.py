@@ -0,0 +1,97 @@
+"""
+Acceso a la tabla `cart_items`. Dos implementaciones con la misma interfaz;
+DB_BACKEND (config.py) elige cual usa la app:
+
+- SupabaseRepository ("supabase", por defecto): PostgREST por HTTPS.
+- PostgresRepository ("postgres"): conexion directa con pool y sentencias
+  preparadas (db.py).
+"""
+
+CART_COLUMNS = (
+    "user_id",
+    "product_id",
+    "product_name",
+    "product_image_url",
+    "product_price",
+    "quantity",
+)
+
+
+class SupabaseRepository:
+    def __init__(self, client):
+        self._client = client
+
+    def get_items(self, user_id):
+        return self._client.table("cart_items").select("*").eq("user_id", user_id).execute().data
+
+    def get_quantity(self, user_id, product_id):
+        rows = (
+            self._client.table("cart_items")
+            .select("quantity")
+            .eq("user_id", user_id)
+            .eq("product_id", product_id)
+            .execute()
+            .data
+        )
+        return rows[0]["quantity"] if rows else None
+
+    def set_quantity(self, user_id, product_id, quantity):
+        """Filas actualizadas (vacio si el producto no esta en el carrito)."""
+        return (
+            self._client.table("cart_items")
+            .update({"quantity": quantity})
+            .eq("user_id", user_id)
+            .eq("product_id", product_id)
+            .execute()
+            .data
+        )
+
+    def add_item(self, item):
+        self._client.table("cart_items").insert({column: item[column] for column in CART_COLUMNS}).execute()
+
+    def remove_item(self, user_id, product_id):
+        self._client.table("cart_items").delete().eq("user_id", user_id).eq("product_id", product_id).execute()
+
+    def clear(self, user_id):
+        self._client.table("cart_items").delete().eq("user_id", user_id).execute()
+
+
+class PostgresRepository:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def get_items(self, user_id):
+        return self._pool.fetch("cart_items", "select", "select * from cart_items where user_id = %s", [user_id])
+
+    def get_quantity(self, user_id, product_id):
+        row = self._pool.fetch_one(
+            "cart_items", "select",
+            "select quantity from cart_items where user_id = %s and product_id = %s",
+            [user_id, product_id],
+        )
+        return row["quantity"] if row else None
+
+    def set_quantity(self, user_id, product_id, quantity):
+        return self._pool.fetch(
+            "cart_items", "update",
+            "update cart_items set quantity = %s where user_id = %s and product_id = %s returning *",
+            [quantity, user_id, product_id],
+        )
+
+    def add_item(self, item):
+        self._pool.execute(
+            "cart_items", "insert",
+            f"insert into cart_items ({', '.join(CART_COLUMNS)}) "
+            f"values ({', '.join(['%s'] * len(CART_COLUMNS))})",
+            [item[column] for column in CART_COLUMNS],
+        )
+
+    def remove_item(self, user_id, product_id):
+        self._pool.execute(
+            "cart_items", "delete",
+            "delete from cart_items where user_id = %s and product_id = %s",
+            [user_id, product_id],
+        )
+
+    def clear(self, user_id):
+        self._pool.execute("cart_items", "delete", "delete from cart_items where user_id = %s", [user_id])
@@ -0,0 +1,67 @@
+"""
+Metricas, trazas y logs de la app real de cartService (app.py).
+"""
+from prometheus_client.parser import text_string_to_metric_families
+
+import log
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def scraped(client, name, **labels):
+    """Valor de una serie tal como la expone /metrics (0 si no existe)."""
+    body = client.get("/metrics").get_data(as_text=True)
+    for family in text_string_to_metric_families(body):
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return 0
+
+
+def test_metrics_endpoint_counts_cart_requests(service):
+    client, repository = service
+    repository.carts["user-1"] = [{"product_id": 1, "quantity": 2}]
+    labels = {"method": "POST", "route": "/cart", "status": "200"}
+    before = scraped(client, "http_requests_total", **labels)
+
+    assert client.post("/cart", json={"user_id": "user-1"}).status_code == 200
+
+    assert scraped(client, "http_requests_total", **labels) == before + 1
+    assert scraped(client, "http_request_duration_seconds_count", method="POST", route="/cart") >= 1
+
+
+def test_cart_requests_continue_the_gateway_trace(service, monkeypatch):
+    client, _ = service
+    spans = []
+    monkeypatch.setattr(tracing.exporter, "export", spans.append)
+
+    response = client.post(
+        "/cart", json={"user_id": "user-1"}, headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+    )
+
+    trace_id, span_id, sampled = tracing.parse_traceparent(response.headers["traceparent"])
+    assert (trace_id, sampled) == (TRACE_ID, True)
+    assert span_id != PARENT_ID
+    # El span SERVER de la peticion es hijo del span del gateway
+    (span,) = [span for span in spans if span.kind == "SERVER"]
+    assert span.service == "cart-service"
+    assert span.name == "POST /cart"
+    assert (span.trace_id, span.parent_id, span.span_id) == (TRACE_ID, PARENT_ID, span_id)
+
+
+def test_cart_access_log_carries_the_trace_id(service, monkeypatch):
+    client, _ = service
+    # Registros ya preparados por el handler de la app, antes del hilo que escribe
+    records = []
+    monkeypatch.setattr(log._handler, "enqueue", records.append)
+
+    client.post(
+        "/cart", json={"user_id": "user-1"}, headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+    )
+
+    (access,) = [record for record in records if record.name == "access"]
+    assert access.route == "/cart"
+    assert access.status == 200
+    assert access.trace_id == TRACE_ID